@@ -8,6 +8,7 @@ default_configuration = { "output_directory": "saved_output",
                           "saved_analysis_path": "",
                           "output_created": False,
                           "corr_onClick": True,
+                          "corr_background": True,
                           "ica":{
                             "directory": "",
                             "template": "*",
@@ -19,7 +20,8 @@ default_configuration = { "output_directory": "saved_output",
                             "template": "*",
                             "search_pattern": "([a-zA-Z0-9_\\-\\.]+)(\\.nii\\.gz|\\.nii)$",
                             "extra_items": ["...nontemplate_ICN"],
-                            "labels_file": ""
+                            "labels_file": "",
+                            "bundle": ""
                           },
                           "noise":{
                             "directory": "data_templates/noise_confounders",
@@ -36,7 +38,9 @@ default_configuration = { "output_directory": "saved_output",
                                 "filled": True,
                                 "alpha": 0.6,
                                 "levels": 0.5,
-                                "colors": "w"
+                                "colors": "w",
+                                "overlay_top": 0,
+                                "overlay_colors": ["#ff7f0e", "#2ca02c", "#9467bd"]
                               },
                               "ica":{
                                 "thresh_ica_vol": False,
@@ -56,7 +60,8 @@ default_configuration = { "output_directory": "saved_output",
                                 "show_mapping_name": True,
                                 "show_ica_name": True,
                                 "show_icn_name": True,
-                                "display_text_size": 12
+                                "display_text_size": 12,
+                                "mosaic_compositor": True
                               }
                             },
                             "time_plots" : {
@@ -83,5 +88,30 @@ default_configuration = { "output_directory": "saved_output",
                               "smooth_mask": True,
                               "cutoff_percentile": 99.,
                               "cutoff_fractMax": 0.33
+                          },
+                          "cache":{
+                              "enabled": True,
+                              "directory": "cache",
+                              "max_size_mb": 4096
+                          },
+                          "journal":{
+                              "enabled": True,
+                              "directory": "autosave",
+                              "compact_interval_sec": 120
+                          },
+                          "catalog":{
+                              "enabled": False,
+                              "path": "catalog.sqlite"
+                          },
+                          "memory":{
+                              "enabled": True,
+                              "budget_mb": 2048,
+                              "view_cache_mb": 64
+                          },
+                          "prefetch":{
+                              "enabled": True,
+                              "max_views": 4,
+                              "sweep": True,
+                              "top_k": 3
                           }
                         }
@@ -0,0 +1,164 @@
+"""Saved analysis files for Network Zoo, as JSON manifest + binary arrays"""
+
+# Python Libraries
+import os, json
+
+# Mathematical Libraries
+import numpy as np
+
+# Internal imports
+import zoo_CorrelationStore as cs # correlations stored as labeled matrix
+
+
+FORMAT_VERSION = 2  # legacy files, w/ all info in single JSON document, are version 1
+
+
+class AnalysisBundle(object):
+    """
+    Reads/writes saved analyses as a small JSON manifest (config, file paths, names & classifications),
+    plus a .npz file of arrays stored next to it:
+      corrs:           correlation matrix (ICA x ICN), NaN where not calculated
+      corrs_rows/cols: ICA & ICN lookup keys labeling above
+      <list>_labels, <list>_files, <list>_vol_inds:  lookup keys, index into manifest file list, & vol. indices
+      views, view_coords: slices found for (ICA, ICN or '', display mode, no. of slices) views,
+                          padded w/ NaN to longest row of slices (see zoo_Prefetcher)
+    Arrays are stored uncompressed, so loading is limited by disk/memory speed not parsing.
+    Legacy single JSON files are still read, & are upgraded when saved again.
+    """
+
+    @staticmethod
+    def arrays_path(fname):
+        """Path to arrays stored alongside manifest"""
+        return os.path.splitext(str(fname))[0] + '.npz'
+
+    @staticmethod
+    def write(fname, manifest, corrs, IndstoNames=None, view_coords=None):
+        """Save manifest & arrays.
+        manifest: dict of analysis info w/o corrs or file indices
+        corrs: nested dict, indexed as corrs[ica_lookup][icn_lookup]
+        IndstoNames: {'ica': {file: {vol_ind: lookup}}, 'icn': {...}}
+        view_coords: {(ica_lookup, icn_lookup or None, display_mode, num_slices): coords}, optional
+        """
+
+        IndstoNames = IndstoNames if IndstoNames else {}
+
+        arrays = {}
+        rows, cols, matrix = AnalysisBundle.corrs_to_matrix(corrs)
+        arrays['corrs'] = matrix
+        arrays['corrs_rows'] = np.array(rows, dtype=str)
+        arrays['corrs_cols'] = np.array(cols, dtype=str)
+
+        manifest = dict(manifest)
+        for list_name, file_inds in IndstoNames.items():
+            files = list(file_inds.keys())
+            labels, file_ind, vol_inds = [], [], []
+            for f, file in enumerate(files):
+                for vol_ind, lookup in file_inds[file].items():
+                    labels.append(lookup)
+                    file_ind.append(f)
+                    vol_inds.append(int(float(vol_ind)))
+            manifest[list_name + '_files'] = files
+            arrays[list_name + '_labels'] = np.array(labels, dtype=str)
+            arrays[list_name + '_files'] = np.array(file_ind, dtype=np.int32)
+            arrays[list_name + '_vol_inds'] = np.array(vol_inds, dtype=np.int64)
+
+        if view_coords:
+            views, coords = AnalysisBundle.view_coords_to_arrays(view_coords)
+            arrays['views'], arrays['view_coords'] = views, coords
+
+        arrays_file = AnalysisBundle.arrays_path(fname)
+        manifest['format_version'] = FORMAT_VERSION
+        manifest['arrays_file'] = os.path.basename(arrays_file)
+
+        # write arrays first & replace atomically, so manifest never points to partial arrays
+        tmp = arrays_file + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, arrays_file)
+        tmp = str(fname) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, fname)
+
+    @staticmethod
+    def read(fname):
+        """Load saved analysis, as dict of analysis info w/ 'corrs' (as zoo_CorrelationStore) & '<list>_IndstoNames' restored.
+        Returns legacy files as is, w/ 'format_version' = 1"""
+
+        with open(fname, 'rb') as f:
+            analysisInfo = json.load(f)
+        if 'format_version' not in analysisInfo.keys():
+            analysisInfo['format_version'] = 1
+            return analysisInfo
+        if analysisInfo['format_version'] > FORMAT_VERSION:
+            print('WARNING: saved analysis created by newer version of Network Zoo: ' + str(fname))
+
+        arrays_file = os.path.join(os.path.dirname(os.path.abspath(fname)),
+                                   analysisInfo.get('arrays_file', ''))
+        if not os.path.isfile(arrays_file): # ...if manifest & arrays were renamed together
+            arrays_file = AnalysisBundle.arrays_path(fname)
+        if not os.path.isfile(arrays_file):
+            raise FileNotFoundError('Missing arrays for saved analysis: ' + arrays_file)
+        with np.load(arrays_file, allow_pickle=False) as arrays:
+            analysisInfo['corrs'] = cs.CorrelationStore.from_matrix(arrays['corrs_rows'].tolist(),
+                                                                    arrays['corrs_cols'].tolist(),
+                                                                    arrays['corrs'])
+            for list_name in ['ica', 'icn']:
+                if list_name + '_labels' not in arrays.files: continue
+                files = analysisInfo.get(list_name + '_files', [])
+                labels = arrays[list_name + '_labels'].tolist()
+                file_ind = arrays[list_name + '_files']
+                vol_inds = arrays[list_name + '_vol_inds']
+                IndstoNames = {file: {} for file in files}
+                for lookup, f, vol_ind in zip(labels, file_ind, vol_inds):
+                    IndstoNames[files[f]][str(vol_ind)] = lookup
+                analysisInfo[list_name + '_IndstoNames'] = IndstoNames
+            analysisInfo['view_coords'] = {}
+            if 'views' in arrays.files:
+                analysisInfo['view_coords'] = AnalysisBundle.arrays_to_view_coords(arrays['views'],
+                                                                                   arrays['view_coords'])
+        return analysisInfo
+
+    @staticmethod
+    def corrs_to_matrix(corrs):
+        """Convert nested dict of correlations to labeled matrix, w/ NaN for missing pairs"""
+
+        if hasattr(corrs, 'matrix'): return corrs.matrix() # ...already stored as matrix, see zoo_CorrelationStore
+        rows = list(corrs.keys())
+        cols = []
+        col_inds = {}
+        for row in rows:
+            for col in corrs[row].keys():
+                if col not in col_inds.keys():
+                    col_inds[col] = len(cols)
+                    cols.append(col)
+        matrix = np.full((len(rows), len(cols)), np.nan)
+        for i, row in enumerate(rows):
+            for col, r in corrs[row].items():
+                matrix[i, col_inds[col]] = r
+        return rows, cols, matrix
+
+    @staticmethod
+    def view_coords_to_arrays(view_coords):
+        """Convert dict of slices for views to string array of views & NaN-padded coords."""
+
+        views = list(view_coords.keys())
+        coords = [np.atleast_1d(np.asarray(view_coords[view], dtype=float)) for view in views]
+        matrix = np.full((len(views), max([len(c) for c in coords] + [1])), np.nan)
+        for i, c in enumerate(coords):
+            matrix[i, :len(c)] = c
+        views = np.array([[ica, icn if icn else '', mode, str(n)] for ica, icn, mode, n in views],
+                         dtype=str).reshape(-1, 4)
+        return views, matrix
+
+    @staticmethod
+    def arrays_to_view_coords(views, matrix):
+        """Convert arrays from 'view_coords_to_arrays()' back to dict,
+        w/ ortho. coords. as (x,y,z) & rows of slices as arrays"""
+
+        view_coords = {}
+        for (ica, icn, mode, n), row in zip(views.tolist(), matrix):
+            coords = row[np.isfinite(row)]
+            view = (ica, icn if icn else None, mode, int(n))
+            view_coords[view] = tuple(coords.tolist()) if mode in ['ortho', 'tiled'] else coords
+        return view_coords
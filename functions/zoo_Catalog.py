@@ -0,0 +1,275 @@
+"""SQLite catalog of classifications across subjects/analyses for Network Zoo"""
+
+# Python Libraries
+import os, sys, time, sqlite3, getopt
+
+# Internal imports
+import zoo_AnalysisBundle as ab # saved analyses, as JSON manifest + binary arrays
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    analysis_path TEXT,
+    updated REAL);
+CREATE TABLE IF NOT EXISTS templates (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    filepath TEXT,
+    vol_ind INTEGER,
+    fingerprint TEXT);
+CREATE TABLE IF NOT EXISTS components (
+    id INTEGER PRIMARY KEY,
+    subject_id INTEGER NOT NULL REFERENCES subjects(id) ON DELETE CASCADE,
+    lookup TEXT NOT NULL,
+    label TEXT,
+    filepath TEXT,
+    vol_ind INTEGER,
+    fingerprint TEXT,
+    UNIQUE (subject_id, lookup));
+CREATE TABLE IF NOT EXISTS correlations (
+    component_id INTEGER NOT NULL REFERENCES components(id) ON DELETE CASCADE,
+    template_id INTEGER NOT NULL REFERENCES templates(id),
+    r REAL NOT NULL,
+    PRIMARY KEY (component_id, template_id));
+CREATE TABLE IF NOT EXISTS classifications (
+    subject_id INTEGER NOT NULL REFERENCES subjects(id) ON DELETE CASCADE,
+    component_id INTEGER NOT NULL REFERENCES components(id) ON DELETE CASCADE,
+    template_id INTEGER REFERENCES templates(id),
+    label TEXT,
+    component_label TEXT);
+CREATE INDEX IF NOT EXISTS idx_correlations_template_r ON correlations (template_id, r);
+CREATE INDEX IF NOT EXISTS idx_classifications_subject_label ON classifications (subject_id, label);
+CREATE INDEX IF NOT EXISTS idx_classifications_label ON classifications (label);
+"""
+
+
+class ClassificationCatalog(object):
+    """
+    Optional database of saved analyses, one subject per analysis:
+    ICA components, ICN templates, correlations, classifications & content fingerprints.
+    Each subject is replaced as a whole when re-added, w/ all rows inserted in a single transaction.
+    Indexed by (template, r) & (subject, label), for queries across many subjects.
+    """
+
+    def __init__(self, db_file):
+        super().__init__()
+
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    @classmethod
+    def from_config(cls, config):
+        """Open catalog from 'catalog' field in config.json, if enabled"""
+
+        if 'catalog' not in config.keys(): return None
+        if not config['catalog'].get('enabled', False): return None
+        if not config['catalog'].get('path'): return None
+        try:
+            return cls(config['catalog']['path'])
+        except sqlite3.Error as e:
+            print('WARNING: could not open classification catalog: ' + str(config['catalog']['path']) + '\n  ' + str(e))
+            return None
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def subject_name(fname):
+        """Default subject name, from saved analysis file name"""
+        return os.path.splitext(os.path.basename(str(fname)))[0]
+
+    def add_file(self, fname, subject=None):
+        """Add saved analysis file to catalog"""
+
+        analysisInfo = ab.AnalysisBundle.read(fname)
+        IndstoNames = {'ica': analysisInfo.get('ica_IndstoNames', {}),
+                       'icn': analysisInfo.get('icn_IndstoNames', {})}
+        if subject is None: subject = self.subject_name(fname)
+        self.add_analysis(subject, analysisInfo, analysisInfo.get('corrs', {}), IndstoNames,
+                          analysis_path=os.path.abspath(fname))
+
+    def add_files(self, fnames):
+        """Bulk import of saved analyses, skipping unreadable files. Returns number added"""
+
+        n_added = 0
+        for fname in fnames:
+            try:
+                self.add_file(fname)
+                n_added += 1
+            except (OSError, ValueError, KeyError) as e:
+                print('WARNING: could not add saved analysis to catalog: ' + str(fname) + '\n  ' + str(e))
+        return n_added
+
+    def add_analysis(self, subject, analysisInfo, corrs, IndstoNames, analysis_path=None):
+        """Replace all catalog rows for subject w/ info from analysis,
+        inputs as from InputHandling.analysis_info()"""
+
+        ica_names = analysisInfo.get('ica_customNames') or {}
+        icn_names = analysisInfo.get('icn_customNames') or {}
+        ica_fps = analysisInfo.get('ica_fingerprints') or {}
+        icn_fps = analysisInfo.get('icn_fingerprints') or {}
+        mapped = analysisInfo.get('ica_icn_mapped') or {}
+        ica_mapped_names = analysisInfo.get('ica_mapped_customNames') or {}
+        icn_mapped_names = analysisInfo.get('icn_mapped_customNames') or {}
+
+        with self.conn: # single transaction, rolled back on error
+            cur = self.conn.cursor()
+            cur.execute('DELETE FROM subjects WHERE name = ?', (subject,))
+            cur.execute('INSERT INTO subjects (name, analysis_path, updated) VALUES (?, ?, ?)',
+                        (subject, analysis_path, time.time()))
+            subject_id = cur.lastrowid
+
+            # Templates are shared by all subjects, indexed by name
+            templates = {}
+            for file, inds in IndstoNames.get('icn', {}).items():
+                for vol_ind, lookup in inds.items():
+                    templates[lookup] = (file, int(float(vol_ind)), icn_fps.get(lookup))
+            extra_templates = set(mapped.values())
+            for ica_corrs in corrs.values():
+                extra_templates.update(ica_corrs.keys())
+            for lookup in extra_templates:
+                if lookup and (lookup not in templates.keys()):
+                    templates[lookup] = (None, None, icn_fps.get(lookup))
+            cur.executemany('INSERT INTO templates (name, filepath, vol_ind, fingerprint) VALUES (?, ?, ?, ?) '
+                            'ON CONFLICT(name) DO UPDATE SET '
+                            'filepath = COALESCE(excluded.filepath, filepath), '
+                            'vol_ind = COALESCE(excluded.vol_ind, vol_ind), '
+                            'fingerprint = COALESCE(excluded.fingerprint, fingerprint)',
+                            [(lookup,) + info for lookup, info in templates.items()])
+            template_ids = self._ids('templates', 'name', list(templates.keys()))
+
+            components = []
+            for file, inds in IndstoNames.get('ica', {}).items():
+                for vol_ind, lookup in inds.items():
+                    components.append((subject_id, lookup, ica_names.get(lookup, lookup),
+                                       file, int(float(vol_ind)), ica_fps.get(lookup)))
+            cur.executemany('INSERT INTO components (subject_id, lookup, label, filepath, vol_ind, fingerprint) '
+                            'VALUES (?, ?, ?, ?, ?, ?)', components)
+            component_ids = dict(cur.execute('SELECT lookup, id FROM components WHERE subject_id = ?',
+                                             (subject_id,)).fetchall())
+
+            cur.executemany('INSERT OR REPLACE INTO correlations (component_id, template_id, r) VALUES (?, ?, ?)',
+                            [(component_ids[ica_lookup], template_ids[icn_lookup], float(r))
+                             for ica_lookup, ica_corrs in corrs.items() if ica_lookup in component_ids.keys()
+                             for icn_lookup, r in ica_corrs.items() if icn_lookup in template_ids.keys()])
+            cur.executemany('INSERT INTO classifications (subject_id, component_id, template_id, label, component_label) '
+                            'VALUES (?, ?, ?, ?, ?)',
+                            [(subject_id, component_ids[ica_lookup], template_ids.get(icn_lookup),
+                              icn_mapped_names.get(ica_lookup, icn_lookup), ica_mapped_names.get(ica_lookup, ica_lookup))
+                             for ica_lookup, icn_lookup in mapped.items() if ica_lookup in component_ids.keys()])
+        return subject_id
+
+    def _ids(self, table, column, names):
+        """Get row ids for names, in batches below sqlite's limit on query parameters"""
+
+        ids = {}
+        for i in range(0, len(names), 500):
+            batch = names[i:i+500]
+            query = 'SELECT %s, id FROM %s WHERE %s IN (%s)' %(column, table, column, ','.join('?'*len(batch)))
+            ids.update(self.conn.execute(query, batch).fetchall())
+        return ids
+
+    def remove_subject(self, subject):
+        with self.conn:
+            self.conn.execute('DELETE FROM subjects WHERE name = ?', (subject,))
+
+    def subjects(self):
+        return [row[0] for row in self.conn.execute('SELECT name FROM subjects ORDER BY name')]
+
+    def find_correlated(self, template, min_r=0.):
+        """Components correlated w/ template above min_r, as (subject, component, label, r), highest r first"""
+
+        return self.conn.execute('SELECT s.name, c.lookup, c.label, r.r FROM correlations r '
+                                 'JOIN templates t ON t.id = r.template_id '
+                                 'JOIN components c ON c.id = r.component_id '
+                                 'JOIN subjects s ON s.id = c.subject_id '
+                                 'WHERE t.name = ? AND r.r > ? ORDER BY r.r DESC',
+                                 (template, min_r)).fetchall()
+
+    def find_classified(self, label, min_r=None, subject=None):
+        """Components classified as label (ICN name), as (subject, component, component label, template, r),
+        optionally only those w/ correlation to mapped template above min_r"""
+
+        query = ('SELECT s.name, c.lookup, m.component_label, t.name, r.r FROM classifications m '
+                 'JOIN subjects s ON s.id = m.subject_id '
+                 'JOIN components c ON c.id = m.component_id '
+                 'LEFT JOIN templates t ON t.id = m.template_id '
+                 'LEFT JOIN correlations r ON r.component_id = m.component_id AND r.template_id = m.template_id '
+                 'WHERE m.label = ?')
+        params = [label]
+        if subject is not None:
+            query += ' AND m.subject_id = (SELECT id FROM subjects WHERE name = ?)'
+            params.append(subject)
+        if min_r is not None:
+            query += ' AND r.r > ?'
+            params.append(min_r)
+        return self.conn.execute(query + ' ORDER BY s.name', params).fetchall()
+
+    def subject_classifications(self, subject):
+        """All classifications for subject, as (component, component label, label, template)"""
+
+        return self.conn.execute('SELECT c.lookup, m.component_label, m.label, t.name FROM classifications m '
+                                 'JOIN components c ON c.id = m.component_id '
+                                 'LEFT JOIN templates t ON t.id = m.template_id '
+                                 'WHERE m.subject_id = (SELECT id FROM subjects WHERE name = ?) '
+                                 'ORDER BY m.label', (subject,)).fetchall()
+
+    def find_fingerprint(self, fingerprint):
+        """Subjects & components w/ identical voxel data"""
+
+        return self.conn.execute('SELECT s.name, c.lookup FROM components c '
+                                 'JOIN subjects s ON s.id = c.subject_id WHERE c.fingerprint = ?',
+                                 (fingerprint,)).fetchall()
+
+
+def main(argv):
+    """Command-line bulk import & queries:
+      python zoo_Catalog.py -d catalog.sqlite saved_analysis1.json saved_analysis2.json ...
+      python zoo_Catalog.py -d catalog.sqlite -l DMN -r 0.5
+    """
+
+    usage = main.__doc__
+    try:
+        opts, args = getopt.getopt(argv, "hd:l:t:r:", ["help", "db=", "label=", "template=", "min_r="])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    db_file, label, template, min_r = None, None, None, None
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print(usage)
+            sys.exit()
+        elif opt in ('-d', '--db'):
+            db_file = arg
+        elif opt in ('-l', '--label'):
+            label = arg
+        elif opt in ('-t', '--template'):
+            template = arg
+        elif opt in ('-r', '--min_r'):
+            min_r = float(arg)
+    if not db_file:
+        print(usage)
+        sys.exit(2)
+
+    catalog = ClassificationCatalog(db_file)
+    if args:
+        n_added = catalog.add_files(args)
+        print('Added %d of %d saved analyses to %s' %(n_added, len(args), db_file))
+    if label:
+        for row in catalog.find_classified(label, min_r=min_r):
+            print('\t'.join([str(v) for v in row]))
+    if template:
+        for row in catalog.find_correlated(template, min_r=min_r if min_r is not None else 0.):
+            print('\t'.join([str(v) for v in row]))
+    catalog.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,140 @@
+"""Template outlines for Network Zoo displays, traced once per slice & redrawn as matplotlib paths"""
+
+# Mathematical/Plotting Libraries
+import numpy as np
+import matplotlib as mpl
+import contourpy
+from scipy.ndimage import find_objects
+from matplotlib.path import Path
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba
+
+THRESHOLD = 1e-6  # nilearn's threshold for filled contours
+
+
+class ContourPaths(object):
+    """
+    Outlines (& fillings) of template on each slice, as traced by matplotlib's 'contour()' & 'contourf()'
+    on nilearn cuts (see nilearn CutAxes.draw_2d), but traced once per slice & level w/ contourpy
+    (marching squares, same algorithm as matplotlib) & kept as paths in world coords.
+    Vol. is prepared template from zoo_SliceCache, so paths are dropped w/ prepared vol.
+    Outlines of several templates on a cut are drawn as single PathCollection (see 'draw()'),
+    so overlaying more templates adds paths, not contour tracing or artists.
+    """
+
+    AXES_2D = {'x': (1, 2), 'y': (0, 2), 'z': (0, 1)} # vol. axes shown horizontally & vertically in cut
+
+    def __init__(self, vol):
+        super().__init__()
+
+        self.vol = vol      # zoo_SliceCache.VolumeSlices
+        self.paths = {}     # (direction, slice index, level, filled, masked) : Path, or None if nothing to outline
+        self.bounds = {}    # level : bounds of vol. above level, as nilearn's tight bounding box
+
+    @property
+    def nbytes(self):
+        return sum(path.vertices.nbytes + (path.codes.nbytes if path.codes is not None else 0)
+                   for path in self.paths.values() if path is not None)
+
+    def extent(self, direction):
+        """Extent of cut in world coords. (left, right, bottom, top)"""
+
+        h, v = self.AXES_2D[direction]
+        return tuple(self.vol.bounds[h]) + tuple(self.vol.bounds[v])
+
+    def object_bounds(self, direction, level):
+        """Extent of template above 0.9 * level on cut, as nilearn adds to axes limits"""
+
+        if level not in self.bounds.keys():
+            bounds = [tuple(b) for b in self.vol.bounds]
+            found = find_objects((np.abs(self.vol.data) > 0.9 * abs(level)).astype(int))
+            if found: # ...as nilearn's 'get_mask_bounds()'
+                bounds = [(lo + s.start * (hi - lo) / n, lo + s.stop * (hi - lo) / n)
+                          for (lo, hi), s, n in zip(bounds, found[0], self.vol.data.shape)]
+            self.bounds[level] = bounds
+        h, v = self.AXES_2D[direction]
+        return tuple(self.bounds[level][h]) + tuple(self.bounds[level][v])
+
+    def has_cut(self, direction, coord):
+        """If cut at world coord. is w/n vol., as nilearn draws template only on such cuts"""
+
+        try:
+            self.vol.slice(direction, coord)
+        except IndexError:
+            return False
+        return True
+
+    def path(self, direction, coord, level=0.5, filled=False, masked=False):
+        """Outline (or filling above level) on cut at world coord., None if cut is outside vol. or empty.
+        If masked, voxels near 0 are left out, as nilearn thresholds templates drawn w/ fillings"""
+
+        try:
+            index = self.vol.index(direction, coord)
+            data_2d = self.vol.stack(direction)[index]
+        except IndexError:
+            return None
+        key = (direction, index, float(level), filled, masked)
+        if key not in self.paths.keys():
+            self.paths[key] = self.trace(data_2d, self.extent(direction), level, filled, masked)
+        return self.paths[key]
+
+    @staticmethod
+    def trace(data_2d, extent, level=0.5, filled=False, masked=False):
+        """Contour of 2D slice drawn w/ origin='upper' & extent, as matplotlib would trace it"""
+
+        z = np.asarray(data_2d, dtype=np.float64)
+        if np.ptp(z) == 0: return None
+        mask = (np.abs(z) <= THRESHOLD) if masked else None
+        if (mask is not None) and np.all(mask): return None
+        ny, nx = z.shape
+        x0, x1, y0, y1 = extent
+        x = x0 + (np.arange(nx) + 0.5) * (x1 - x0) / nx
+        y = (y0 + (np.arange(ny) + 0.5) * (y1 - y0) / ny)[::-1]
+        x, y = np.meshgrid(x, y)
+        generator = contourpy.contour_generator(x, y, np.ma.array(z, mask=mask), name=mpl.rcParams['contour.algorithm'],
+                                                corner_mask=mpl.rcParams['contour.corner_mask'],
+                                                line_type=contourpy.LineType.SeparateCode,
+                                                fill_type=contourpy.FillType.OuterCode)
+        if filled:
+            vertices, codes = generator.filled(level, np.inf)
+        else:
+            vertices, codes = generator.lines(level)
+        if len(vertices) == 0: return None
+        return Path(np.concatenate(vertices), np.concatenate(codes))
+
+    @staticmethod
+    def draw(cut_ax, outlines, add_bounds=True):
+        """Draw outlines on nilearn cut axes as PathCollections (lines over fillings),
+        outlines: [(ContourPaths, {'levels', 'colors', 'alpha', 'filled'})], as passed to nilearn's 'add_contours()'.
+        Returns collections added"""
+
+        lines, line_colors, fills, fill_colors = [], [], [], []
+        for contours, opts in outlines:
+            level = np.atleast_1d(opts.get('levels', 0.5))[0]
+            color = to_rgba(opts.get('colors', 'w'), opts.get('alpha', None))
+            if add_bounds and contours.has_cut(cut_ax.direction, cut_ax.coord):
+                # ...axes limits as if nilearn had drawn template
+                cut_ax.add_object_bounds(contours.object_bounds(cut_ax.direction, level))
+            filled = opts.get('filled', False)
+            path = contours.path(cut_ax.direction, cut_ax.coord, level, masked=filled)
+            if path is not None:
+                lines.append(path)
+                line_colors.append(color)
+            if filled:
+                path = contours.path(cut_ax.direction, cut_ax.coord, level, filled=True, masked=True)
+                if path is not None:
+                    fills.append(path)
+                    fill_colors.append(color)
+
+        collections = []
+        if fills: # ...as contourf(), w/o edges or antialiasing
+            collections.append(PathCollection(fills, facecolors=fill_colors, edgecolors='none',
+                                              linewidths=0, antialiaseds=False, zorder=1))
+        if lines:
+            collections.append(PathCollection(lines, facecolors='none', edgecolors=line_colors,
+                                              linewidths=mpl.rcParams['contour.linewidth'] or mpl.rcParams['lines.linewidth'],
+                                              zorder=2))
+        for collection in collections:
+            collection.set_transform(cut_ax.ax.transData)
+            cut_ax.ax.add_collection(collection, autolim=False)
+        return collections
@@ -0,0 +1,229 @@
+"""Correlations between ICA comps. & ICN templates for Network Zoo, stored as labeled matrix"""
+
+# Python Libraries
+from collections.abc import MutableMapping
+
+# Mathematical Libraries
+import numpy as np
+
+
+class CorrelationStore(MutableMapping):
+    """
+    Correlations indexed as corrs[ica_lookup][icn_lookup], as in nested dict used previously,
+    stored in 2D array w/ row & col. indices kept in dicts.
+    Removing ICs (rows) or templates (cols.) only drops index entries, freed slots are cleared when reused.
+    Blocks of new rows/cols. are added w/ 'set_block()', ex. from matrix product of prepared vols.
+    Only written in GUI thread, but safe to read from other threads.
+    """
+
+    def __init__(self, corrs=None):
+        super().__init__()
+
+        self._rows, self._cols = {}, {}  # lookup name : index in matrix
+        self._free_rows, self._free_cols = [], []
+        self._r = np.full((0, 0), np.nan)
+        self._set = np.zeros((0, 0), dtype=bool) # distinguishes calculated NaN from missing
+        if corrs:
+            for row, row_corrs in corrs.items():
+                self[row] = row_corrs
+
+    @classmethod
+    def from_corrs(cls, corrs):
+        """Return corrs as store, copying nested dicts"""
+
+        if isinstance(corrs, cls): return corrs
+        return cls(corrs)
+
+    @classmethod
+    def from_matrix(cls, rows, cols, matrix):
+        """Return labeled matrix as store, w/ NaN as missing pairs (see 'matrix()')"""
+
+        store = cls()
+        store.set_block(rows, cols, matrix)
+        return store
+
+    def _grow(self, n_rows, n_cols):
+        """Enlarge matrix to at least n_rows x n_cols, doubling size to limit copies"""
+
+        shape = self._r.shape
+        if (n_rows <= shape[0]) and (n_cols <= shape[1]): return
+        new_shape = (max(n_rows, 2*shape[0], 8) if n_rows > shape[0] else shape[0],
+                     max(n_cols, 2*shape[1], 8) if n_cols > shape[1] else shape[1])
+        r = np.full(new_shape, np.nan)
+        is_set = np.zeros(new_shape, dtype=bool)
+        r[:shape[0], :shape[1]] = self._r
+        is_set[:shape[0], :shape[1]] = self._set
+        self._r, self._set = r, is_set
+
+    def _row_index(self, row):
+        """Index of row, creating empty row if needed"""
+
+        if row in self._rows.keys(): return self._rows[row]
+        if self._free_rows:
+            i = self._free_rows.pop()
+            self._set[i, :] = False
+        else:
+            i = len(self._rows)
+            self._grow(i + 1, self._r.shape[1])
+        self._rows[row] = i
+        return i
+
+    def _col_index(self, col):
+        """Index of col., creating empty col. if needed"""
+
+        if col in self._cols.keys(): return self._cols[col]
+        if self._free_cols:
+            j = self._free_cols.pop()
+            self._set[:, j] = False
+        else:
+            j = len(self._cols)
+            self._grow(self._r.shape[0], j + 1)
+        self._cols[col] = j
+        return j
+
+    # Mapping of ICs to rows
+    def __getitem__(self, row):
+        if row not in self._rows.keys(): raise KeyError(row)
+        return CorrelationRow(self, row)
+
+    def __setitem__(self, row, row_corrs):
+        i = self._row_index(row)
+        self._set[i, :] = False
+        for col, r in dict(row_corrs).items():
+            self.set_value(row, col, r)
+
+    def __delitem__(self, row):
+        i = self._rows.pop(row)
+        self._free_rows.append(i)
+
+    def __contains__(self, row):
+        return row in self._rows.keys()
+
+    def __iter__(self):
+        return iter(list(self._rows.keys()))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return 'CorrelationStore(%d ICs x %d templates)' %(len(self._rows), len(self._cols))
+
+    @property
+    def nbytes(self):
+        return self._r.nbytes + self._set.nbytes
+
+    # Single values
+    def get_value(self, row, col, default=None):
+        i, j = self._rows.get(row), self._cols.get(col)
+        if (i is None) or (j is None) or not self._set[i, j]: return default
+        return float(self._r[i, j])
+
+    def set_value(self, row, col, r):
+        i, j = self._row_index(row), self._col_index(col)
+        self._r[i, j] = r
+        self._set[i, j] = True
+
+    def del_value(self, row, col):
+        i, j = self._rows.get(row), self._cols.get(col)
+        if (i is None) or (j is None) or not self._set[i, j]: raise KeyError(col)
+        self._set[i, j] = False
+
+    def row_keys(self, row):
+        """Templates w/ corrs. for IC"""
+
+        i = self._rows[row]
+        return [col for col, j in list(self._cols.items()) if self._set[i, j]]
+
+    # Blocks
+    def drop_columns(self, cols):
+        """Remove templates from all rows"""
+
+        cols = [cols] if isinstance(cols, str) else cols
+        for col in cols:
+            if col in self._cols.keys():
+                self._free_cols.append(self._cols.pop(col))
+
+    def drop_rows(self, rows):
+        """Remove ICs"""
+
+        rows = [rows] if isinstance(rows, str) else rows
+        for row in rows:
+            if row in self._rows.keys():
+                del self[row]
+
+    def set_block(self, rows, cols, block):
+        """Set corrs. for all pairs of rows & cols., skipping NaN in block (~not calculated)"""
+
+        block = np.asarray(block, dtype=float)
+        ri = np.array([self._row_index(row) for row in rows], dtype=int)
+        ci = np.array([self._col_index(col) for col in cols], dtype=int)
+        if (len(ri) == 0) or (len(ci) == 0): return
+        valid = np.isfinite(block)
+        r = self._r[np.ix_(ri, ci)]
+        r[valid] = block[valid]
+        self._r[np.ix_(ri, ci)] = r
+        self._set[np.ix_(ri, ci)] |= valid
+
+    def missing_pairs(self, rows, cols):
+        """All (row, col) pairs w/o corrs., checked as block"""
+
+        rows, cols = list(rows), list(cols)
+        ri = np.array([self._rows.get(row, -1) for row in rows], dtype=int)
+        ci = np.array([self._cols.get(col, -1) for col in cols], dtype=int)
+        known = np.zeros((len(ri), len(ci)), dtype=bool)
+        rv, cv = np.flatnonzero(ri >= 0), np.flatnonzero(ci >= 0)
+        if len(rv) and len(cv):
+            known[np.ix_(rv, cv)] = self._set[np.ix_(ri[rv], ci[cv])]
+        return [(rows[i], cols[j]) for i, j in zip(*np.nonzero(~known))]
+
+    def matrix(self):
+        """Corrs. as labeled matrix (rows, cols, matrix), w/ NaN for missing pairs"""
+
+        rows, cols = list(self._rows.keys()), list(self._cols.keys())
+        ri = np.array([self._rows[row] for row in rows], dtype=int)
+        ci = np.array([self._cols[col] for col in cols], dtype=int)
+        matrix = self._r[np.ix_(ri, ci)] if (len(ri) and len(ci)) else np.full((len(ri), len(ci)), np.nan)
+        if len(ri) and len(ci):
+            matrix = np.where(self._set[np.ix_(ri, ci)], matrix, np.nan)
+        return rows, cols, matrix
+
+    def to_dict(self):
+        """Copy as nested dict"""
+        return {row: dict(self[row].items()) for row in self}
+
+
+class CorrelationRow(MutableMapping):
+    """View of corrs. for single IC, as dict of {icn_lookup: r}"""
+
+    def __init__(self, store, row):
+        super().__init__()
+
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, col):
+        r = self.store.get_value(self.row, col, default=KeyError)
+        if r is KeyError: raise KeyError(col)
+        return r
+
+    def __setitem__(self, col, r):
+        self.store.set_value(self.row, col, r)
+
+    def __delitem__(self, col):
+        self.store.del_value(self.row, col)
+
+    def __contains__(self, col):
+        return self.store.get_value(self.row, col, default=KeyError) is not KeyError
+
+    def __iter__(self):
+        return iter(self.store.row_keys(self.row))
+
+    def __len__(self):
+        return len(self.store.row_keys(self.row))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def copy(self):
+        """Copy as dict"""
+        return dict(self.items())
@@ -0,0 +1,234 @@
+"""Cut coords. at overlap of ICs & templates for Network Zoo, found w/ numpy on prepared arrays"""
+
+# Python Libraries
+import threading
+from collections import OrderedDict
+
+# Mathematical/Neuroimaging Libraries
+import numpy as np
+from scipy.ndimage import label, find_objects, center_of_mass
+from nibabel.nifti1 import Nifti1Image
+from nilearn import image, plotting
+
+
+class CutCoordsEngine(object):
+    """
+    Finds slices shown for IC & template, as nilearn's 'find_xyz_cut_coords' (ortho. peak)
+    & 'find_cut_slices' (rows of slices) would on IC masked by template
+    (template resampled to IC & thresholded at its mean),
+    but on arrays instead of nifti imgs:
+      template masks are resampled to grid of ICs once & kept as boolean arrays,
+      so all ICs on same grid (ex. from single 4D file) share mask,
+      IC arrays are prepared once (float32, non-finite values zeroed) & reused for all templates,
+      overlap is product of IC & mask arrays, w/o resampling, masking & unmasking imgs for each view.
+    Thresholds, connected components & centers of mass then follow nilearn's steps on arrays,
+    w/o copying imgs or forcing garbage collection for each call.
+    Safe to call from background threads.
+    """
+
+    LAYOUTS = {'ortho': 'ortho', 'tiled': 'ortho', 'axial': 'z', 'coronal': 'y', 'sagittal': 'x'}
+    MAX_MASKS = 64  # template masks kept, per template & grid
+    MAX_PREPARED = 8  # IC arrays kept
+
+    def __init__(self):
+        super().__init__()
+
+        self.masks = OrderedDict()     # (icn_lookup, grid) : boolean array
+        self.prepared = OrderedDict()  # (ica_lookup, id(img)) : float32 array
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def grid(img):
+        """Shape & affine of vol., as hashable key"""
+        return (tuple(img.shape[:3]), tuple(np.round(np.asarray(img.affine), 6).ravel()))
+
+    @staticmethod
+    def get_data(img):
+        """Voxel data of 3D vol. as stored, w/o copying img"""
+
+        data = np.asanyarray(img.dataobj)
+        if (data.ndim == 4) and (data.shape[3] == 1):  # ...pseudo-4D, as 'check_niimg_3d()'
+            data = data[..., 0]
+        return data
+
+    def _cached(self, cache, key, limit, fn):
+        with self._lock:
+            if key in cache.keys():
+                cache.move_to_end(key)
+                return cache[key]
+        value = fn()
+        with self._lock:
+            cache[key] = value
+            while len(cache) > limit:
+                cache.popitem(last=False)
+        return value
+
+    def template_mask(self, map_img, grid_img, icn_lookup=None):
+        """Template resampled to grid of IC & binarized at its mean, as 'img > img.mean()'"""
+
+        def make_mask():
+            resampled = image.resample_to_img(source_img=map_img, target_img=grid_img)
+            data = self.get_data(resampled)
+            return data > data.mean()
+        key = (icn_lookup if icn_lookup else id(map_img), self.grid(grid_img))
+        return self._cached(self.masks, key, self.MAX_MASKS, make_mask)
+
+    def prepared_ic(self, ica_img, ica_lookup=None):
+        """IC as float32 w/ non-finite values zeroed, as masked by nilearn"""
+
+        def prepare():
+            return np.nan_to_num(self.get_data(ica_img).astype(np.float32), nan=0., posinf=0., neginf=0.)
+        return self._cached(self.prepared, (ica_lookup, id(ica_img)), self.MAX_PREPARED, prepare)
+
+    def overlap(self, ica_img=None, map_img=None, ica_lookup=None, icn_lookup=None):
+        """IC masked by template as (data, affine), or either vol. alone if other is not given"""
+
+        if (ica_img is not None) and (map_img is not None):
+            mask = self.template_mask(map_img, ica_img, icn_lookup)
+            return self.prepared_ic(ica_img, ica_lookup) * mask, np.asarray(ica_img.affine)
+        for img in [ica_img, map_img]:
+            if img is not None:
+                return self.get_data(img), np.asarray(img.affine)
+        return None, None
+
+    def discard(self, ica_lookup=None, icn_lookup=None):
+        """Drop prepared arrays for removed ICs/templates, or all arrays if neither is input"""
+
+        with self._lock:
+            if (ica_lookup is None) and (icn_lookup is None):
+                self.masks, self.prepared = OrderedDict(), OrderedDict()
+            for key in [key for key in self.masks.keys() if (icn_lookup is not None) and (key[0] == icn_lookup)]:
+                self.masks.pop(key)
+            for key in [key for key in self.prepared.keys() if (ica_lookup is not None) and (key[0] == ica_lookup)]:
+                self.prepared.pop(key)
+
+    def find(self, ica_img=None, map_img=None, display_mode='ortho', num_slices=1,
+             ica_lookup=None, icn_lookup=None):
+        """Cut coords. at peak of overlap (ortho), or spread across overlap (other modes), None if no vol."""
+
+        data, affine = self.overlap(ica_img, map_img, ica_lookup, icn_lookup)
+        if data is None: return None
+        layout = self.LAYOUTS.get(display_mode, 'ortho')
+        if layout == 'ortho':
+            return self.peak(data, affine)
+        if not np.all(np.diag(affine)[:3]): # ...nilearn reorders vol. first
+            return plotting.find_cut_slices(Nifti1Image(np.asarray(data), affine),
+                                            direction=layout, n_cuts=num_slices)
+        return self.spread(data, affine, layout, num_slices)
+
+    # Array versions of nilearn fns.
+    @staticmethod
+    def abs_percentile(values, percentile=80):
+        """Value at percentile of abs. values, by partial sort (nilearn's 'fast_abs_percentile')"""
+
+        values = np.abs(values).ravel()
+        index = int(values.size * 0.01 * percentile)
+        return np.partition(values, index)[index]
+
+    @staticmethod
+    def largest_component(mask):
+        """Largest connected component of binary mask"""
+
+        labels, n_labels = label(mask)
+        if n_labels <= 1: return mask.astype(bool)
+        counts = np.bincount(labels.ravel())
+        counts[0] = 0
+        return labels == counts.argmax()
+
+    @staticmethod
+    def to_world(ijk, affine):
+        return (affine[:3, :3] @ np.asarray(ijk, dtype=float) + affine[:3, 3]).tolist()
+
+    @staticmethod
+    def peak(data, affine):
+        """Center of largest cluster of overlap, as (x,y,z) world coords. (see 'find_xyz_cut_coords()')"""
+
+        data = np.asarray(data)
+        if np.all(data == 0):
+            return tuple(CutCoordsEngine.to_world((0, 0, 0), affine))
+        offset = np.zeros(3)
+        my_map = data.copy()
+        threshold = CutCoordsEngine.abs_percentile(my_map[my_map != 0], 80)
+        try:
+            eps = 2 * np.finfo(threshold).eps
+        except ValueError: # ...integer data
+            eps = 1e-15
+        mask = np.abs(my_map) > (threshold - eps)
+        if mask.max() == 0:
+            return tuple(CutCoordsEngine.to_world(center_of_mass(np.abs(my_map)) + offset, affine))
+
+        # Crop to largest cluster
+        mask = CutCoordsEngine.largest_component(mask)
+        crop = find_objects(mask.astype(int))[0]
+        my_map, mask = my_map[crop], mask[crop]
+        my_map *= mask
+        offset += [s.start for s in crop]
+
+        # Second threshold at mean of cluster, as nilearn
+        second_mask = np.abs(my_map) > np.abs(np.mean(my_map[mask]))
+        if second_mask.sum() > 50:
+            my_map *= CutCoordsEngine.largest_component(second_mask)
+        return tuple(CutCoordsEngine.to_world(center_of_mass(np.abs(my_map)) + offset, affine))
+
+    @staticmethod
+    def smooth(data):
+        """Weighted avg. w/ 6 nearest neighbors, as nilearn's 'fast' smoothing"""
+
+        weight = 0.2
+        smoothed, weighted = data.copy(), weight * data
+        for axis in range(3):
+            lo = [slice(None)] * 3
+            hi = [slice(None)] * 3
+            lo[axis], hi[axis] = slice(None, -1), slice(1, None)
+            smoothed[tuple(lo)] += weighted[tuple(hi)]
+            smoothed[tuple(hi)] += weighted[tuple(lo)]
+        smoothed /= 1 + 6 * weight
+        return smoothed
+
+    @staticmethod
+    def spread(data, affine, direction='z', n_cuts=7):
+        """Slices through peaks of smoothed overlap along one axis, in world coords. (see 'find_cut_slices()')"""
+
+        axis = 'xyz'.index(direction)
+        orig_data = np.abs(np.asarray(data))
+        this_shape = orig_data.shape[axis]
+        to_world = lambda inds: np.atleast_1d(affine[axis, axis] * np.asarray(inds, dtype=float) + affine[axis, 3])
+        if n_cuts > this_shape:
+            return to_world(np.arange(this_shape))
+        n_cuts = int(round(n_cuts))
+        if n_cuts < 1:
+            raise ValueError('Number of cuts must be between 1 & %d, got %d' %(this_shape, n_cuts))
+
+        smoothed = orig_data.astype(np.float64) if orig_data.dtype.kind in 'iu' else orig_data.copy()
+        smoothed[~np.isfinite(smoothed)] = 0
+        smoothed = CutCoordsEngine.smooth(smoothed)
+
+        # Peaks along axis, w/ surroundings of each peak suppressed
+        spacing = max(int(0.5 / n_cuts * this_shape), 1)
+        around = [slice(None)] * 3
+        cut_coords = []
+        for _ in range(n_cuts):
+            peak = np.unravel_index(np.abs(smoothed).argmax(), smoothed.shape)[axis]
+            around[axis] = slice(max(0, peak - spacing), peak + spacing)
+            smoothed[tuple(around)] *= 1.0e-3
+            cut_coords.append(peak)
+
+        # Fill duplicated cuts from either end, or biggest gap
+        cut_coords = np.unique(cut_coords).tolist()
+        slice_sums = np.moveaxis(orig_data, axis, 0)
+        while len(cut_coords) < n_cuts:
+            candidates = [max(cut_coords) + 2]
+            if len(cut_coords) > 1:
+                middle = np.argmax(np.diff(cut_coords))
+                slice_middle = int(0.5 * (cut_coords[middle] + cut_coords[middle + 1]))
+                if slice_middle not in cut_coords:
+                    candidates.append(slice_middle)
+            if min(cut_coords) - 2 >= 0:
+                candidates.append(min(cut_coords) - 2)
+            best_weight = -10
+            for candidate in candidates:
+                weight = 0 if candidate >= this_shape else np.sum(slice_sums[candidate])
+                if weight > best_weight:
+                    best_candidate, best_weight = candidate, weight
+            cut_coords = np.unique(cut_coords + [best_candidate]).tolist()
+        return to_world(np.sort(cut_coords))
@@ -0,0 +1,189 @@
+"""Background loading of nifti volumes for Network Zoo"""
+
+# Python Libraries
+import os, threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+# Qt GUI Libraries
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Mathematical/Neuroimaging Libraries
+import numpy as np
+from nilearn import image
+
+# Internal imports
+import zoo_VolumeCache as vc # decompressed, memory-mapped copies of .nii.gz files
+import zoo_Fingerprints as fp # content hashes of vols.
+
+
+class FileLoader(QObject):
+    """
+    Thread pool to decompress & prepare voxel data, after list items are created from headers.
+    Results are passed back to the GUI thread w/ Qt signals,
+    all changes to NetworkZooGUI.gd are made by the receiving slot(s).
+    """
+
+    file_loaded = pyqtSignal(str, object) # filepath, {'imgs': {vol_ind: img}, 'atlas': bool, 'fingerprints': list}
+    file_failed = pyqtSignal(str, str)    # filepath, error message
+    progress = pyqtSignal(int, int)       # files done, files submitted
+    finished = pyqtSignal()
+    cancelled = pyqtSignal()
+
+    def __init__(self, max_workers=None):
+        super().__init__()
+
+        if not max_workers:
+            max_workers = min(4, os.cpu_count() or 1)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._futures = {}  # pending/running loads, indexed by filepath
+        self._args = {}     # (vol_inds, check_atlas) submitted, indexed by filepath
+        self._results = {}  # loads sent w/ 'file_loaded' but not yet claimed by GUI thread, see 'claim()'
+        self.n_submitted = 0
+        self.n_done = 0
+
+    def submit(self, filepath, vol_inds=None, check_atlas=False):
+        """Queue file to load in background"""
+
+        with self._lock:
+            if filepath in self._futures.keys(): return # already queued
+            future = self.pool.submit(self.load_file, filepath, vol_inds, check_atlas)
+            self._futures[filepath] = future
+            self._args[filepath] = (vol_inds, check_atlas)
+            self.n_submitted += 1
+        future.add_done_callback(lambda f, filepath=filepath: self._done(filepath, f))
+        self.progress.emit(self.n_done, self.n_submitted)
+
+    def _done(self, filepath, future):
+        """Called from worker thread when load is finished, cancelled or failed"""
+
+        try:
+            result, error = future.result(), None
+        except CancelledError:
+            result, error = None, None
+        except Exception as e:
+            result, error = None, str(e)
+        with self._lock:
+            if self._futures.get(filepath) is not future: return # taken by GUI thread or cancelled
+            self._futures.pop(filepath)
+            self._args.pop(filepath, None)
+            if result is not None:
+                self._results[filepath] = result  # ...until claimed by GUI thread, or taken first
+            self.n_done += 1
+            n_done, n_submitted = self.n_done, self.n_submitted
+            all_done = len(self._futures) == 0
+        if result is not None:
+            self.file_loaded.emit(filepath, result)
+        elif error is not None:
+            self.file_failed.emit(filepath, error)
+        self.progress.emit(n_done, n_submitted)
+        if all_done:
+            self._reset_counts()
+            self.finished.emit()
+
+    def _reset_counts(self):
+        with self._lock:
+            if len(self._futures) == 0:
+                self.n_submitted, self.n_done = 0, 0
+
+    def is_loading(self, filepath=None):
+        """Check if specific file, or any file, is queued or loading, or loaded but not yet received by GUI thread"""
+        with self._lock:
+            if filepath is None:
+                return (len(self._futures) > 0) or (len(self._results) > 0)
+            return (filepath in self._futures.keys()) or (filepath in self._results.keys())
+
+    def claim(self, filepath):
+        """Mark result sent w/ 'file_loaded' as received, returns False if already taken by GUI thread"""
+
+        with self._lock:
+            return self._results.pop(filepath, None) is not None
+
+    def take(self, filepath):
+        """Get results for file needed immediately by GUI thread,
+        waits if already loading, otherwise loads w/o waiting for queue.
+        Results already sent w/ 'file_loaded' but not yet received are taken instead, see 'claim()'"""
+
+        with self._lock:
+            if filepath in self._results.keys():
+                return self._results.pop(filepath)
+            future = self._futures.pop(filepath, None)
+            vol_inds, check_atlas = self._args.pop(filepath, (None, False))
+            if future is not None:
+                self.n_done += 1
+            all_done = len(self._futures) == 0
+        if future is None: return None
+        if future.cancel(): # not started yet, skip queue
+            result = self.load_file(filepath, vol_inds, check_atlas)
+        else:
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+        self.progress.emit(self.n_done, self.n_submitted)
+        if all_done:
+            self._reset_counts()
+            self.finished.emit()
+        return result
+
+    def cancel(self):
+        """Cancel all queued loads, loads already running are discarded"""
+
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures, self._args, self._results = {}, {}, {}
+            self.n_submitted, self.n_done = 0, 0
+        for future in futures:
+            future.cancel()
+        if len(futures) > 0:
+            self.cancelled.emit()
+            self.finished.emit()
+        return len(futures)
+
+    def shutdown(self):
+        """Stop thread pool, w/o waiting for running loads"""
+        self.cancel()
+        self.pool.shutdown(wait=False)
+
+    @staticmethod
+    def load_file(filepath, vol_inds=None, check_atlas=False):
+        """Decompress & load voxel data for all (or selected) vols. in file"""
+
+        img_vol = vc.VolumeCache.load(filepath)
+        imgs = {}
+        atlas = False
+        if len(img_vol.shape) > 3:
+            # iter_img() preferred over index_img() for repeated img indexing
+            for k, img in enumerate(image.iter_img(img_vol)):
+                if (vol_inds is not None) and (k not in vol_inds): continue
+                imgs[k] = img
+        else:
+            img_vol.get_fdata()  # decompress & cache voxel data
+            imgs[0] = img_vol
+            if check_atlas:
+                atlas = FileLoader.is_atlas_vol(img_vol)
+        fingerprints = None
+        if fp.FingerprintIndex.default is not None: # hash while file is in page cache
+            fingerprints = fp.FingerprintIndex.default.get(filepath)
+        return {'imgs': imgs, 'atlas': atlas, 'fingerprints': fingerprints}
+
+    @staticmethod
+    def load_vol(filepath, vol_ind=0, fourD=False):
+        """Load single vol., repeating original loading as part of NetworkZoo"""
+
+        if fourD and (vol_ind is not None):
+            return image.index_img(vc.VolumeCache.load(filepath), int(vol_ind))
+        elif not fourD and (vol_ind > 0): # ROI w/n atlas, indexed by intensity
+            img = vc.VolumeCache.load(filepath)
+            return image.new_img_like(img, img.get_fdata(caching='unchanged')==vol_ind,
+                                      copy_header=True)
+        else:
+            return vc.VolumeCache.load(filepath)
+
+    @staticmethod
+    def is_atlas_vol(img):
+        """Checks if all intensities in img are integers w/ few unique values"""
+
+        v_unique = np.unique(img.get_fdata(caching='unchanged'))
+        return bool(all(v_unique >= 0) and (2 < len(v_unique) < 1000) and
+                    (np.mod(v_unique,1) == 0).all())
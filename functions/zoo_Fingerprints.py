@@ -0,0 +1,150 @@
+"""Content fingerprints of nifti volumes for Network Zoo"""
+
+# Python Libraries
+import os, json, gzip, hashlib, threading
+
+# Mathematical/Neuroimaging Libraries
+import numpy as np
+import nibabel as nib
+
+# Internal imports
+import zoo_VolumeCache as vc # decompressed, memory-mapped copies of .nii.gz files
+
+
+class FingerprintIndex(object):
+    """
+    Fast hashes of voxel data, one per vol. w/n 3D/4D files,
+    used to tell if vols. are identical (~duplicate list items) or if files have changed.
+
+    Vols. are hashed in chunks straight from the (decompressed) file, w/o creating nifti objects,
+    & hashes include vol. geometry (shape, dtype, scaling, affine).
+    Fingerprints are stored in a small index keyed by path + size + mtime, so each file is hashed once.
+    """
+
+    default = None  # index shared by all loaders, set w/ FingerprintIndex.set_default()
+    CHUNK_BYTES = 4 * 1024**2
+
+    def __init__(self, index_file=None):
+        super().__init__()
+
+        self.index_file = index_file
+        self._index = {}
+        self._lock = threading.Lock()
+        self._modified = False
+        if index_file and os.path.isfile(index_file):
+            try:
+                with open(index_file) as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+
+    @classmethod
+    def from_config(cls, config):
+        """Create index saved in cache directory, if enabled"""
+
+        index_file = None
+        if 'cache' in config.keys():
+            if config['cache'].get('enabled', True) and config['cache'].get('directory'):
+                index_file = os.path.join(config['cache']['directory'], 'fingerprint_index.json')
+        return cls(index_file)
+
+    @classmethod
+    def set_default(cls, index):
+        cls.default = index
+
+    def lookup(self, filepath):
+        """Fingerprints for all vols. in file if already known, otherwise None"""
+
+        if (not filepath) or (not os.path.isfile(str(filepath))): return None
+        key = vc.VolumeCache.file_key(filepath)
+        with self._lock:
+            return self._index.get(key)
+
+    def get(self, filepath):
+        """Fingerprints for all vols. in file, hashing file if needed"""
+
+        if (not filepath) or (not os.path.isfile(str(filepath))): return None
+        key = vc.VolumeCache.file_key(filepath)
+        with self._lock:
+            if key in self._index.keys():
+                return self._index[key]
+        try:
+            fingerprints = self.compute(filepath)
+        except Exception as e:
+            print('WARNING: could not fingerprint file: ' + str(filepath) + '\n  ' + str(e))
+            return None
+        with self._lock:
+            self._index[key] = fingerprints
+            self._modified = True
+        return fingerprints
+
+    def get_vol(self, filepath, vol_ind=0, fourD=False):
+        """Fingerprint for single vol., or for ROI w/n atlas (3D vol. indexed by intensity)"""
+
+        fingerprints = self.get(filepath)
+        return self.vol_fingerprint(fingerprints, vol_ind, fourD)
+
+    @staticmethod
+    def vol_fingerprint(fingerprints, vol_ind=0, fourD=False):
+        """Select vol. fingerprint from all fingerprints for file"""
+
+        if not fingerprints: return None
+        if fourD:
+            k = int(vol_ind)
+            return fingerprints[k] if 0 <= k < len(fingerprints) else None
+        elif vol_ind and (float(vol_ind) > 0): # ROI label w/n atlas
+            return fingerprints[0] + ':' + str(int(float(vol_ind)))
+        return fingerprints[0]
+
+    def save(self):
+        """Write index file, if updated"""
+
+        if (not self.index_file) or (not self._modified): return
+        with self._lock:
+            index = dict(self._index)
+            self._modified = False
+        # drop entries for files that have been moved or deleted
+        index = {key: fps for key, fps in index.items()
+                 if os.path.isfile(key.rsplit('|', 2)[0])}
+        try:
+            tmp = self.index_file + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp, self.index_file)
+        except OSError as e:
+            print('WARNING: could not save fingerprint index: ' + str(e))
+
+    @staticmethod
+    def compute(filepath):
+        """Hash voxel data for each vol. in file, reading file in chunks"""
+
+        img = nib.load(str(filepath))
+        shape = img.shape
+        dtype = img.get_data_dtype()
+        n_vols = int(np.prod(shape[3:])) if len(shape) > 3 else 1
+        vol_bytes = int(np.prod(shape[:3])) * dtype.itemsize
+        geometry = repr((tuple(shape[:3]), dtype.str,
+                         float(img.dataobj.slope), float(img.dataobj.inter),
+                         np.round(img.affine, 4).tolist())).encode()
+
+        data_file = img.file_map['image'].filename
+        offset = int(img.dataobj.offset)
+        if vc.VolumeCache.default is not None: # read decompressed copy, if available
+            cached = vc.VolumeCache.default.existing_path(data_file)
+            if cached is not None:
+                data_file = cached
+        opener = gzip.open if str(data_file).endswith('.gz') else open
+
+        fingerprints = []
+        with opener(data_file, 'rb') as f:
+            f.seek(offset)
+            for k in range(n_vols):
+                h = hashlib.blake2b(geometry, digest_size=16)
+                remaining = vol_bytes
+                while remaining > 0:
+                    buf = f.read(min(FingerprintIndex.CHUNK_BYTES, remaining))
+                    if not buf: break
+                    h.update(buf)
+                    remaining -= len(buf)
+                fingerprints.append(h.hexdigest())
+        return fingerprints
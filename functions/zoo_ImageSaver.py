@@ -12,13 +12,12 @@ from PyQt5.QtCore import QObject, pyqtSignal, Qt, QThread, QRectF
 from PyQt5.QtWidgets import QDialog
 from PyQt5.QtGui import QColor, QPixmap, QPainter  #Qt fns. needed to draw png
 
-from nilearn import image  # library for neuroimaging
-
 # Output imports
 import csv
 
 # Internal imports
 import zoo_ProgressBarWin as prbr    # PyQt widget in ../gui
+import zoo_FileLoader as fl         # loads vols. from cached, decompressed copies
 
 
 class ImageSaver(QObject):
@@ -99,16 +98,7 @@ class ImageSaver(QObject):
     def reload_img(self, filepath, vol_ind=0, fourD=False):
         """Reloads img, repeating original loading as part of NetworkZoo"""
         
-        r_img = None
-        if fourD and (vol_ind is not None):
-            r_img = image.index_img(filepath, vol_ind)
-        elif not fourD and (vol_ind > 0):
-            img = image.load_img(filepath)
-            r_img = image.new_img_like(img, img.get_fdata(caching='unchanged')==vol_ind, 
-                                       copy_header=True)
-        else:
-            r_img = image.load_img(filepath)
-        return r_img
+        return fl.FileLoader.load_vol(filepath, vol_ind=vol_ind, fourD=fourD)
 
     
     def reload_imgs(self):
@@ -342,7 +332,7 @@ class ImageSaver(QObject):
             
             # Save time/freq. info & spatial map, skip if time not displayed
             save_timefreq_plot =  False
-            if (len(figure_t.get_axes())) > 0:
+            if (len(figure_t.get_axes()) > 0) or (len(figure_t.images) > 0): # ...plots, or cached bitmap of plots
                 save_timefreq_plot =  True
 
             # Save figures 
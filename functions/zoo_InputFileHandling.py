@@ -1,6 +1,7 @@
 # Python Libraries
 from os.path import join as opj  # method to join strings of file paths
 import os, sys, re, json, csv
+from functools import partial
 
 # Qt GUI Libraries
 from PyQt5 import QtWidgets
@@ -13,6 +14,19 @@ from nilearn import plotting, image  # library for neuroimaging
 from nibabel.nifti1 import Nifti1Image, Nifti1Pair
 import nipype.interfaces.io as nio
 
+# Internal imports
+import zoo_TimeSeries as tsm # shared ICA time series matrices
+import zoo_FileLoader as fl   # thread pool to load voxel data in background
+import zoo_VolumeCache as vc  # decompressed, memory-mapped copies of .nii.gz files
+import zoo_VolumeInspector as vi # header-only vol. info, for building lists & validation
+import zoo_Fingerprints as fp    # content hashes of vols., to find duplicates & changed files
+import zoo_AnalysisBundle as ab  # saved analyses, as JSON manifest + binary arrays
+import zoo_Catalog as ct         # optional database of classifications across subjects
+import zoo_TemplateBundle as tb  # precompiled templates, resampled to standard grids
+import zoo_CorrelationStore as cs # correlations stored as labeled matrix
+import zoo_MemoryManager as mm    # memory budget for voxel data, w/ LRU eviction
+import zoo_VolumeStats as vs      # summary stats. of vols., computed once per vol.
+
 
 class InputHandling(object):
     """Fns. to handle input/output, file loading, etc., for Network Zoo"""
@@ -25,11 +39,37 @@ class InputHandling(object):
         self.gd = gd # NetworkZooGUI.gd
         self.config = config # NetworkZooGUI.config
         self.corrs = corrs # NetworkZooGUI.corrs
+        self.prefetcher = None # NetworkZooGUI.prefetcher, w/ cut coords. saved w/ analysis
+        self.view_cache = None # NetworkZooGUI.view_cache, w/ bitmaps of time series displays
         
         # Connections to Qt items in main window
         self.listWidget_ICA = listWidget_ICA # NetworkZooGUI.listWidget_ICAComponents
         self.listWidget_ICN = listWidget_ICN # NetworkZooGUI.listWidget_ICNtemplates
         self.listWidget_mapped = listWidget_mapped # NetwokrZooGUI.listWidget_mappedICANetworks
+        
+        # Cache of decompressed inputs, shared by all loaders
+        vc.VolumeCache.set_default(vc.VolumeCache.from_config(self.config))
+        
+        # Stats. of loaded vols., shared by display, masks & correlations
+        vs.StatsCache.set_default(vs.StatsCache())
+        
+        # Header info, cached per file
+        self.inspector = vi.VolumeInspector.from_config(self.config)
+        
+        # Content fingerprints, cached per file
+        self.fingerprints = fp.FingerprintIndex.from_config(self.config)
+        fp.FingerprintIndex.set_default(self.fingerprints)
+        self.fp_items = {'ica': {}, 'icn': {}}  # fingerprint: {lookup_key: filepath}, for list items, see 'find_duplicate()'
+        
+        # Database of saved analyses, if enabled
+        self.catalog = ct.ClassificationCatalog.from_config(self.config)
+        
+        # Memory budget for voxel data, evicted vols. are reloaded by get_img()
+        self.memory = mm.MemoryManager.from_config(self.config)
+        
+        # Background loading of voxel data
+        self.loader = fl.FileLoader()
+        self.loader.file_loaded.connect(self.receive_loaded_file)
     
     def get_item_prop(self, list_name, list_property):
         """Get item's properties from networkZoo list"""
@@ -45,26 +85,33 @@ class InputHandling(object):
             ica_files = self.find_files(self.config['ica']['directory'], 
                                         self.config['ica']['template'],
                                         self.config['ica']['search_pattern'],
-                                        list_name='ica')
+                                        list_name='ica', background=True)
             self.load_ica_timeseries(ica_files=ica_files,
                                      prompt_fileDialog=False, search_toolbox_output=True)
-        if os.path.exists(self.config['icn']['directory']):
+        bundled = self.load_template_bundle(self.config['icn'].get('bundle'))
+        if bundled:
+            pass # ICN & noise templates loaded from precompiled bundle
+        elif os.path.exists(self.config['icn']['directory']):
             self.find_files(self.config['icn']['directory'], 
                             self.config['icn']['template'], 
                             self.config['icn']['search_pattern'],
                             list_name='icn', 
-                            extra_items=self.config['icn']['extra_items'])
+                            extra_items=self.config['icn']['extra_items'],
+                            background=True)
         else:
             for extra in self.config['icn']['extra_items']:
                 if extra not in self.gd['icn'].keys():
                     self.update_file_info('icn', None, None, self.listWidget_ICN,
                                           lookup_key=extra)
-        if os.path.exists(self.config['noise']['directory']):
+        if bundled:
+            pass
+        elif os.path.exists(self.config['noise']['directory']):
             self.find_files(self.config['noise']['directory'], 
                             self.config['noise']['template'], 
                             self.config['noise']['search_pattern'],
                             list_name='icn', 
-                            extra_items=self.config['noise']['extra_items'])
+                            extra_items=self.config['noise']['extra_items'],
+                            background=True)
         else:
             for extra in self.config['noise']['extra_items']:
                 if extra not in self.gd['icn'].keys():
@@ -72,6 +119,32 @@ class InputHandling(object):
                                           lookup_key=extra)
 
 
+    def load_template_bundle(self, bundle_dir):
+        """Add ICN & noise templates from precompiled bundle (see zoo_TemplateBundle.py),
+        voxel data is read from bundle when needed. Returns False if bundle is missing or outdated"""
+
+        bundle = tb.TemplateBundle.open(bundle_dir)
+        if bundle is None: return False
+        changed = bundle.outdated()
+        if len(changed) > 0:
+            print('WARNING: template files changed since bundle was compiled, loading files instead: ' +
+                  bundle.directory + '\n  ' + '\n  '.join(changed))
+            return False
+        for k, name in enumerate(bundle.names):
+            if self.find_duplicate('icn', bundle.fingerprints[k], bundle.filepaths[k]): continue
+            self.update_file_info('icn', bundle.filepaths[k], None, self.listWidget_ICN,
+                                  lookup_key=name, display_name=bundle.labels[k],
+                                  k=bundle.vol_inds[k], vol_dim=4 if bundle.fourD[k] else 3,
+                                  fingerprint=bundle.fingerprints[k], bundle=(bundle, k))
+        for extra in self.config['icn']['extra_items'] + self.config['noise']['extra_items']:
+            if extra not in self.gd['icn'].keys():
+                self.update_file_info('icn', None, None, self.listWidget_ICN,
+                                      lookup_key=extra)
+        self.listWidget_ICN.clearSelection()
+        self.listWidget_ICN.setCurrentRow(-1)
+        print('Loaded %d templates from bundle: %s' %(len(bundle), bundle.directory))
+        return True
+
     def load_noise_templates(self):
         """Load noise templates"""
         
@@ -111,12 +184,15 @@ class InputHandling(object):
                 if os.path.splitext(file_name2)[-1] in ['.img', '.hdr', '.nii']:
                     ok = True
         if ok and temporary:  # just return img, for temporary display
-            return image.load_img(str(file_name))
+            return vc.VolumeCache.load(file_name)
         elif temporary:
             return None
         elif ok:
             self.gd.update({file_type: {'full_path': file_name, 
-                                        'img': image.load_img(str(file_name))}})
+                                        'img': vc.VolumeCache.load(file_name)}})
+            img = self.gd[file_type]['img']
+            self.memory.touch((file_type, 'img'), partial(mm.MemoryManager.img_nbytes, img), 
+                              evict=img.uncache) # ...only cached copies released
         else:
             self.gd.update({file_type: {'full_path': old_full_path,
                                         'img': old_img}})
@@ -132,7 +208,7 @@ class InputHandling(object):
                 
         
     def find_files(self, directory, template, search_pattern, list_name, 
-                   exclude_pattern=None, extra_items=None):
+                   exclude_pattern=None, extra_items=None, background=False):
         """GUI-less loading of files & find csv w/ custom names"""
         
         if list_name == 'ica':
@@ -149,7 +225,8 @@ class InputHandling(object):
                                 
             self.add_files_to_list(listWidget, list_name, 
                                    found_files, None, 
-                                   search_pattern, exclude_pattern, extra_items)
+                                   search_pattern, exclude_pattern, extra_items,
+                                   background=background)
             
             # Load replacement IC labels stored in csv file, if applicable
             if search_pattern is not None:
@@ -167,12 +244,15 @@ class InputHandling(object):
         
     
     def add_files_to_list(self, listWidget, list_name, files_to_add, file_inds=None, 
-                          search_pattern='*', exclude_pattern=None, extra_items=None, append=True):
-        """Add files to list & format info for parsing w/ networkZoo"""
+                          search_pattern='*', exclude_pattern=None, extra_items=None, append=True,
+                          background=False):
+        """Add files to list & format info for parsing w/ networkZoo,
+        if background, list items are created from headers & voxel data is loaded in thread pool"""
         
         if not append: # Used when loading saved analyses
             listWidget.clear() # ...in case there are any existing elements in the list
             self.gd[list_name] = {}
+            self.fp_items[list_name] = {}
         files_to_add = [f for f in files_to_add if f is not None]
         
         if len(files_to_add) > 1:
@@ -190,36 +270,62 @@ class InputHandling(object):
             
         for file_name in filtered_files:
             if os.path.isfile(file_name):
-                img_vol = image.load_img(file_name)
-                vol_dim = len(img_vol.shape)
+                vol_info = self.inspector.inspect(file_name) # reads header, voxel data read when needed
+                vol_dim = len(vol_info['shape']) if vol_info else 0
                 if vol_dim == 3:
                     k_range = range(1)
                 elif vol_dim > 3:
-                    k_range = range(img_vol.shape[3])
+                    k_range = range(vol_info['n_vols'])
                 if file_inds: #index individual vols w/n 4d vol., or 3d vol. indexed by intensities
                     if file_name in file_inds.keys():
                         k_range = [int(float(k)) for k in file_inds[file_name].keys()]
 
+                # likely ROI atlases are loaded now, to expand contents below
+                is_atlas = vol_info['is_label'] if vol_info else False # None if uncertain
+                load_later = (background and not file_inds and 
+                              ((vol_dim > 3) or ((vol_dim == 3) and (is_atlas is False))))
+
+                if not load_later and (vol_dim >= 3):
+                    img_vol = vc.VolumeCache.load(file_name) # decompressed, memory-mapped copy
+                    file_fps = self.fingerprints.get(file_name)
+                else: # hashed w/ voxel data in background, unless unchanged since last session
+                    file_fps = self.fingerprints.lookup(file_name)
+                dedup = not file_inds # saved analyses are restored as is
+                
                 error_message = None
-                if vol_dim < 3: #if 2D nifti choosen by mistake...
-                    img_vol.uncache()
+                if 0 < vol_dim < 3: #if 2D nifti choosen by mistake...
                     error_message = "2D nifti file or GIFT time series file choosen/entered,"
+                elif load_later and (vol_dim >= 3):
+                    for k in k_range:
+                        fingerprint = fp.FingerprintIndex.vol_fingerprint(file_fps, k, vol_dim > 3)
+                        if dedup and self.find_duplicate(list_name, fingerprint, file_name): continue
+                        self.update_file_info(list_name, file_name, None, listWidget,
+                                              k=k, k_range=k_range, file_inds=file_inds, 
+                                              vol_dim=vol_dim, r_pattern=r_pattern, loading=True,
+                                              fingerprint=fingerprint)
+                    self.loader.submit(file_name, vol_inds=list(k_range))
                 elif vol_dim > 3: 
                     # iter_img() preferred over index_img() for repeated img indexing
                     for k, img in enumerate(image.iter_img(img_vol)):
                         if k not in k_range: continue
+                        fingerprint = fp.FingerprintIndex.vol_fingerprint(file_fps, k, True)
+                        if dedup and self.find_duplicate(list_name, fingerprint, file_name): continue
                         self.update_file_info(list_name, file_name, img, listWidget,
                                               k=k, k_range=k_range, file_inds=file_inds, 
-                                              vol_dim=vol_dim, r_pattern=r_pattern)
+                                              vol_dim=vol_dim, r_pattern=r_pattern,
+                                              fingerprint=fingerprint)
                 elif vol_dim == 3: # iter_img() not applicable to non-4D volumes
+                    fingerprint = fp.FingerprintIndex.vol_fingerprint(file_fps, 0, False)
+                    if dedup and self.find_duplicate(list_name, fingerprint, file_name): continue
                     self.update_file_info(list_name, file_name, img_vol, listWidget,
                                           k=0, k_range=k_range, file_inds=file_inds, 
-                                          vol_dim=vol_dim, r_pattern=r_pattern)
+                                          vol_dim=vol_dim, r_pattern=r_pattern,
+                                          fingerprint=fingerprint)
                     
                     # if all intensities in img are integers w/ few unique values...
-                    v_unique = np.unique(img_vol.get_fdata(caching='unchanged'))
-                    if (all(v_unique >= 0) and (2 < len(v_unique) < 1000) and 
-                        (np.mod(v_unique,1) == 0).all()): # if all integers
+                    if is_atlas is None: # ...check full vol. if sampled voxels were inconclusive
+                        is_atlas = fl.FileLoader.is_atlas_vol(img_vol)
+                    if is_atlas:
                         
                         # ...expand contents of ROI atlas as separate list items
                         self.expand_ROI_atlas_vol(file_name, 
@@ -232,6 +338,9 @@ class InputHandling(object):
                     QtWidgets.QMessageBox.warning(None, title, error_message)
 
         
+        self.inspector.save() # keep header info for next session
+        self.fingerprints.save()
+        
         if extra_items:
             for extra in extra_items:
                 if extra not in self.gd[list_name].keys():
@@ -247,8 +356,10 @@ class InputHandling(object):
         
     def update_file_info(self, list_name, file_name, img, listWidget, 
                          lookup_key=None, widget_item=None, display_name=None,
-                         k=0, k_range=None, file_inds=None, vol_dim=3, r_pattern=None):
-        """Creates/updates lookup_key for Qt widget & self.gd entry for item info"""
+                         k=0, k_range=None, file_inds=None, vol_dim=3, r_pattern=None, loading=False,
+                         fingerprint=None, bundle=None):
+        """Creates/updates lookup_key for Qt widget & self.gd entry for item info,
+        bundle is (TemplateBundle, row) for templates w/ voxel data in precompiled bundle"""
         
         lookup_default = lookup_key # check lookup_key before accepting
         if not lookup_default:
@@ -302,7 +413,198 @@ class InputHandling(object):
                                           'ts_filepath': None,
                                           'display_name': display_name,
                                           'lookup_name': lookup_key, 
-                                          'widget': widget_item}
+                                          'widget': widget_item,
+                                          'loading': loading,
+                                          'fingerprint': fingerprint,
+                                          'bundle': bundle}
+        self.track_fingerprint(list_name, lookup_key)
+        if loading: self.set_loading(list_name, lookup_key, True)
+
+
+    def find_duplicate(self, list_name, fingerprint, file_name=None):
+        """Find list item w/ identical voxel data from another file, returns lookup key or None"""
+
+        if not fingerprint: return None
+        fp_items = self.fp_items.setdefault(list_name, {}).get(fingerprint, {})
+        for lookup_key, filepath in list(fp_items.items()):
+            item = self.gd[list_name].get(lookup_key)
+            if (item is None) or (item.get('fingerprint') != fingerprint) or (item['filepath'] != filepath):
+                fp_items.pop(lookup_key)  # ...outdated, item removed or replaced
+            elif filepath != file_name:
+                print('WARNING: skipping duplicate of ' + lookup_key + ' from file: ' + str(file_name))
+                return lookup_key
+        return None
+
+    def track_fingerprint(self, list_name, lookup_key):
+        """Index list item by fingerprint, for duplicate checks"""
+
+        item = self.gd[list_name][lookup_key]
+        if item.get('fingerprint'):
+            fp_items = self.fp_items.setdefault(list_name, {})
+            fp_items.setdefault(item['fingerprint'], {})[lookup_key] = item['filepath']
+
+    def forget_fingerprint(self, list_name, lookup_key, item=None):
+        """Drop list item from fingerprint index, item is passed if already removed from list"""
+
+        if item is None: item = self.gd[list_name].get(lookup_key)
+        if (item is None) or (not item.get('fingerprint')): return
+        fp_items = self.fp_items.get(list_name, {})
+        if item['fingerprint'] in fp_items.keys():
+            fp_items[item['fingerprint']].pop(lookup_key, None)
+            if len(fp_items[item['fingerprint']]) == 0:
+                fp_items.pop(item['fingerprint'])
+
+
+    def set_loading(self, list_name, lookup_key, loading=True):
+        """Flag item as waiting for voxel data, w/ note in Qt list"""
+
+        item = self.gd[list_name][lookup_key]
+        item['loading'] = loading
+        if item['widget'] is not None:
+            display_name = item['display_name']
+            item['widget'].setText(display_name + ' (loading...)' if loading else display_name)
+
+    def receive_loaded_file(self, filepath, result):
+        """Add voxel data sent by background loader, unless already taken w/ 'get_img()'"""
+
+        if self.loader.claim(filepath):
+            self.apply_loaded_file(filepath, result)
+
+    def apply_loaded_file(self, filepath, result):
+        """Add voxel data loaded in background to list items, called in GUI thread"""
+
+        for list_name in ['ica', 'icn']:
+            lookup_keys = [key for key, item in self.gd[list_name].items()
+                           if (item['filepath'] == filepath) and item.get('loading', False)]
+            for lookup_key in lookup_keys:
+                item = self.gd[list_name][lookup_key]
+                if item['img'] is None:
+                    item['img'] = result['imgs'].get(item['vol_ind'] if item['4d_nii'] else 0)
+                self.set_loading(list_name, lookup_key, False)
+                self.track_img(list_name, lookup_key)
+                if item.get('fingerprint') is None:
+                    item['fingerprint'] = fp.FingerprintIndex.vol_fingerprint(result.get('fingerprints'),
+                                                                              item['vol_ind'], item['4d_nii'])
+                    if self.find_duplicate(list_name, item['fingerprint'], filepath):
+                        self.remove_item(list_name, lookup_key)
+                    else:
+                        self.track_fingerprint(list_name, lookup_key)
+            if result['atlas'] and (len(lookup_keys) > 0):
+                # ...expand contents of ROI atlas as separate list items
+                self.expand_ROI_atlas_vol(filepath, list_name=list_name)
+        if not self.loader.is_loading():
+            self.fingerprints.save()
+
+    def remove_item(self, list_name, lookup_key):
+        """Remove unmapped item from list, used for duplicates found after loading"""
+
+        mapped_name = 'mapped_' + list_name
+        if (mapped_name in self.gd.keys()) and (lookup_key in self.gd[mapped_name].keys()): return
+        item = self.gd[list_name].pop(lookup_key)
+        self.forget_fingerprint(list_name, lookup_key, item)
+        self.memory.forget((list_name, lookup_key))
+        listWidget = self.listWidget_ICA if list_name == 'ica' else self.listWidget_ICN
+        if item['widget'] is not None:
+            listWidget.takeItem(listWidget.row(item['widget']))
+
+    def get_img(self, list_name, lookup_key):
+        """Get item's nifti vol., loading voxel data first if not yet available"""
+
+        if (not lookup_key) or (lookup_key not in self.gd[list_name].keys()): return None
+        item = self.gd[list_name][lookup_key]
+        if item.get('loading', False):
+            result = self.loader.take(item['filepath']) # skips queue, or waits if already loading
+            if result is not None:
+                self.apply_loaded_file(item['filepath'], result)
+            if lookup_key not in self.gd[list_name].keys(): return None # expanded ROI atlas
+            self.set_loading(list_name, lookup_key, False)
+        if (item['img'] is None) and item.get('bundle'):
+            bundle, k = item['bundle'] # precompiled template, read from memory-mapped bundle
+            item['img'] = bundle.img(k)
+        elif (item['img'] is None) and item['filepath'] and os.path.isfile(item['filepath']):
+            try:
+                item['img'] = fl.FileLoader.load_vol(item['filepath'],
+                                                     vol_ind=item['vol_ind'], fourD=item['4d_nii'])
+            except Exception as e:
+                print('ERROR: could not load file: ' + item['filepath'] + '\n  ' + str(e))
+        self.track_img(list_name, lookup_key)
+        return item['img']
+
+    def track_img(self, list_name, lookup_key):
+        """Update memory used by item's vol., as most recently used"""
+
+        item = self.gd[list_name].get(lookup_key)
+        if (item is None) or (item['img'] is None):
+            self.memory.forget((list_name, lookup_key))
+        else:
+            self.memory.touch((list_name, lookup_key), partial(mm.MemoryManager.img_nbytes, item['img']),
+                              evict=partial(self.evict_img, list_name, lookup_key))
+
+    def evict_img(self, list_name, lookup_key):
+        """Release item's voxel data, to be reloaded from file or template bundle by get_img()"""
+
+        item = self.gd[list_name].get(lookup_key)
+        if (item is None) or (item['img'] is None) or item.get('loading', False): return
+        if item.get('bundle') or (item['filepath'] and os.path.isfile(item['filepath'])):
+            item['img'] = None
+        else:
+            item['img'].uncache()
+
+    def peek_img(self, list_name, lookup_key):
+        """Get item's nifti vol. w/o changing list items, safe to call outside GUI thread.
+        Vols. still loading in background are skipped, evicted vols. are read again but not kept"""
+
+        item = self.gd[list_name].get(lookup_key)
+        if (item is None) or item.get('loading', False): return None
+        img = item['img']
+        if img is not None: return img
+        if item.get('bundle'):
+            bundle, k = item['bundle'] # read-only, from memory-mapped bundle
+            return bundle.img(k)
+        if item['filepath'] and os.path.isfile(item['filepath']):
+            try:
+                return fl.FileLoader.load_vol(item['filepath'], vol_ind=item['vol_ind'], fourD=item['4d_nii'])
+            except Exception as e:
+                print('WARNING: could not load file: ' + item['filepath'] + '\n  ' + str(e))
+        return None
+
+    def get_bundle(self, list_name, lookup_key):
+        """Get (TemplateBundle, row) for item w/ voxel data in precompiled bundle, or None.
+        Safe to call outside GUI thread"""
+
+        item = self.gd[list_name].get(lookup_key)
+        return item.get('bundle') if item is not None else None
+
+    def has_img(self, list_name, lookup_key):
+        """Check if item's voxel data is loaded, or can be reloaded w/o waiting for background loading"""
+
+        item = self.gd[list_name].get(lookup_key)
+        if item is None: return False
+        if item['img'] is not None: return True
+        if item.get('loading', False): return False
+        return bool(item.get('bundle') or (item['filepath'] and os.path.isfile(item['filepath'])))
+
+    def load_pending(self, list_name=None, queued_only=False):
+        """Load all items still waiting for voxel data, in GUI thread,
+        incl. items restored from saved analyses but not yet displayed or evicted from memory, 
+        unless queued_only"""
+
+        list_names = [list_name] if list_name else ['ica', 'icn']
+        for list_name in list_names:
+            for lookup_key in [key for key, item in self.gd[list_name].items()
+                               if item.get('loading', False) or ((not queued_only) and
+                               (item['img'] is None) and (item['filepath'] or item.get('bundle')))]:
+                self.get_img(list_name, lookup_key)
+
+    def cancel_loading(self):
+        """Stop background loading, remaining vols. are loaded when needed"""
+
+        self.loader.cancel()
+        for list_name in ['ica', 'icn']:
+            if list_name not in self.gd.keys(): continue
+            for lookup_key in [key for key, item in self.gd[list_name].items()
+                               if item.get('loading', False)]:
+                self.set_loading(list_name, lookup_key, False)
 
 
     def browse_ica_files(self, state=None):
@@ -450,21 +752,28 @@ class InputHandling(object):
         else:
             ica_dict = dict(zip(ica_files, ts_files))
         
-        # load time series & find which file is associated with which self.gd['ica'] key
+        # index ICs by spatial map file once, instead of searching all ICs for every file
+        ica_by_file = {}
+        for lookup_key, ic in self.gd['ica'].items():
+            ica_by_file.setdefault(ic['filepath'], []).append(lookup_key)
+        
+        # load time series as single shared [time x ICs] matrix per file, ICs hold column views
         for ica_file, ts_file in ica_dict.items():
-            ica_ts = image.load_img(ts_file)
-            vol_dim = len(ica_ts.shape)
-            if vol_dim != 2: # expect [time x ICs] vol.
-                continue # skip if 3D/4D nifti vol. loaded by mistake
-                # next # skip if 3D/4D nifti vol. loaded by mistake  # 6/10/2022 --kw-- next not a python keyword
+            if ts_file in self.gd['ica_ts'].keys():
+                ica_ts = self.gd['ica_ts'][ts_file]
             else:
-                for lookup_key in self.gd['ica'].keys():
-                    if ica_file == self.gd['ica'][lookup_key]['filepath']:
-                        k = self.gd['ica'][lookup_key]['vol_ind']
-                        if (ica_ts is not None) and (k is not None):
-                            self.gd['ica'][lookup_key]['timeseries'] = ica_ts.dataobj[:,k]
-                            self.gd['ica'][lookup_key]['ts_filepath'] = ts_file
-            ica_ts.uncache()
+                ica_ts = tsm.TimeSeriesMatrix(ts_file)
+            if ica_ts.matrix is None: # expect [time x ICs] vol.
+                continue # skip if 3D/4D nifti vol. loaded by mistake
+            self.gd['ica_ts'][ts_file] = ica_ts
+            for lookup_key in ica_by_file.get(ica_file, []):
+                k = self.gd['ica'][lookup_key]['vol_ind']
+                timeseries = ica_ts.column(k)
+                if timeseries is not None:
+                    self.gd['ica'][lookup_key]['timeseries'] = timeseries
+                    self.gd['ica'][lookup_key]['ts_filepath'] = ts_file
+                    if self.view_cache is not None: # ...drop displays w/o time series, or from other file
+                        self.view_cache.invalidate(ica_lookup=lookup_key, figure='t')
             
                     
                                                     
@@ -698,10 +1007,12 @@ class InputHandling(object):
                     listWidget.addItem(new_item)
                     new_item.setData(Qt.UserRole, new_name)
                     new_item.setText(new_name)
+                    self.forget_fingerprint(list_name, old_name)
                     self.gd[list_name][new_name] = self.gd[list_name].pop(old_name)
                     self.gd[list_name][new_name]['display_name'] = new_name
                     self.gd[list_name][new_name]['lookup_name'] = new_name
                     self.gd[list_name][new_name]['widget'] = new_item
+                    self.track_fingerprint(list_name, new_name)
         
         return fail_flag
         
@@ -743,10 +1054,12 @@ class InputHandling(object):
             outdated_img = self.gd[list_name][outdated_lookup]['img']
             vol_filename = self.gd[list_name][outdated_lookup]['filepath']
             vol_dim = len(outdated_img.shape)
+            file_fps = self.fingerprints.lookup(vol_filename)
             roi_array = outdated_img.get_fdata(caching='unchanged')
             roi_inds = np.unique(roi_array).tolist()
             if 0 in roi_inds: roi_inds.remove(0)
             listWidget.takeItem(listWidget.row(outdated_item))
+            self.forget_fingerprint(list_name, outdated_lookup)
             self.gd[list_name].pop(outdated_lookup)
             
             for ind in roi_inds:                    
@@ -769,12 +1082,43 @@ class InputHandling(object):
                                                   'ts_filepath': None,
                                                   'lookup_name': roi_lookup,
                                                   'display_name': roi_lookup,
-                                                  'widget': item}
+                                                  'widget': item,
+                                                  'loading': False,
+                                                  'fingerprint': fp.FingerprintIndex.vol_fingerprint(file_fps, ind),
+                                                  'bundle': None}
+                self.track_img(list_name, roi_lookup)
         return(roi_dict)
             
     
     def save_analysis_json(self, fname):
-        """Save info needed for analysis (but not loaded ICA/ICN volumes), for 'load_analysis()' fn."""
+        """Save info needed for analysis (but not loaded ICA/ICN volumes), for 'load_analysis()' fn.
+        Correlations & vol. indices are saved as arrays in .npz file next to fname"""
+        
+        analysisInfo, corrs, IndstoNames = self.analysis_info()
+        view_coords = None
+        if self.prefetcher is not None:
+            view_coords = self.prefetcher.export_coords(ica_lookups=self.gd['ica'].keys(),
+                                                        icn_lookups=self.gd['icn'].keys())
+        try:
+            ab.AnalysisBundle.write(fname, analysisInfo, corrs, IndstoNames=IndstoNames,
+                                    view_coords=view_coords)
+        except OSError as e:
+            title = "Error saving analysis"
+            message = "Could not write saved analysis to: " + str(fname) + "\n\n" + str(e)
+            QtWidgets.QMessageBox.warning(None, title, message)
+            return
+        if self.catalog is not None: # add/update subject in catalog, named after saved file
+            try:
+                self.catalog.add_analysis(ct.ClassificationCatalog.subject_name(fname), 
+                                          analysisInfo, corrs, IndstoNames, 
+                                          analysis_path=os.path.abspath(fname))
+            except Exception as e:
+                print('WARNING: could not add analysis to catalog: ' + str(e))
+                
+
+    def analysis_info(self, corrs=None, hash_files=True):
+        """Collect info needed to save analysis, as (analysisInfo, corrs, IndstoNames),
+        if not hash_files, fingerprints not yet known are left out (ex. for autosave)"""
             
         config = self.config
         ica_files = [self.gd['ica'][lookup_key]['filepath'] for lookup_key in self.gd['ica'].keys()]
@@ -801,7 +1145,17 @@ class InputHandling(object):
                 icn_IndstoNames[file].update([(self.gd['icn'][lookup_key]['vol_ind'], lookup_key)])        
         icn_customNames = {lookup_key : self.gd['icn'][lookup_key]['display_name'] for lookup_key in self.gd['icn'].keys()}  # 6/8/2022 --kw-- adding save & loading for custom ICN names
         
-        corrs = self.corrs
+        if corrs is None: corrs = self.corrs
+        
+        # content hashes, to check if files have changed when analysis is loaded
+        if hash_files:
+            ica_fingerprints = {lookup_key : self.get_fingerprint('ica', lookup_key) for lookup_key in self.gd['ica'].keys()}
+            icn_fingerprints = {lookup_key : self.get_fingerprint('icn', lookup_key) for lookup_key in self.gd['icn'].keys()}
+            self.fingerprints.save()
+        else:
+            ica_fingerprints = {lookup_key : self.gd['ica'][lookup_key].get('fingerprint') for lookup_key in self.gd['ica'].keys()}
+            icn_fingerprints = {lookup_key : self.gd['icn'][lookup_key].get('fingerprint') for lookup_key in self.gd['icn'].keys()}
+        file_keys = {file : vc.VolumeCache.file_key(file) for file in ica_files + icn_files if os.path.isfile(file)}
         
         ica_icn_mapped = {self.gd['mapped'][mapping_key]['ica_lookup'] : self.gd['mapped'][mapping_key]['icn_lookup'] for mapping_key in self.gd['mapped'].keys()}
         ica_mapped_customNames = {self.gd['mapped'][mapping_key]['ica_lookup'] : self.gd['mapped'][mapping_key]['ica_custom_name'] for mapping_key in self.gd['mapped'].keys()}
@@ -811,28 +1165,32 @@ class InputHandling(object):
                         'config' : config, 
                         'ica_files' : ica_files, 
                         'ica_ts_files' : ica_ts_files,
-                        'ica_IndstoNames' : ica_IndstoNames, 
                         'ica_customNames' : ica_customNames,  # 6/8/2022 --kw-- added save & load custom names feature
                         'icn_files' : icn_files,
-                        'icn_IndstoNames' : icn_IndstoNames, 
                         'icn_customNames' : icn_customNames,  # 6/8/2022 --kw-- added save & load custom names feature
-                        'corrs' : corrs, 
+                        'ica_fingerprints' : ica_fingerprints,
+                        'icn_fingerprints' : icn_fingerprints,
+                        'file_keys' : file_keys,
                         'ica_icn_mapped' :ica_icn_mapped, 
                         'ica_mapped_customNames' : ica_mapped_customNames, 
                         'icn_mapped_customNames' : icn_mapped_customNames}
         
-        with open(fname, 'w') as f:
-            json.dump(analysisInfo, f)
-                
+        return analysisInfo, corrs, {'ica': ica_IndstoNames, 'icn': icn_IndstoNames}
+        
 
     def load_analysis_json(self, fname):
-        """Load info from file created by 'save_analysis()' fn."""
+        """Load info from file created by 'save_analysis()' fn., 
+        legacy JSON-only files are upgraded when analysis is saved again"""
         
-        with open(fname, 'rb') as f:
-            analysisInfo = json.load(f)
+        title = "Error loading analysis"
+        try:
+            analysisInfo = ab.AnalysisBundle.read(fname)
+        except (OSError, ValueError, KeyError) as e:
+            message = "Could not read saved analysis:\n\n" + str(e)
+            QtWidgets.QMessageBox.warning(None, title, message)
+            return
             
         load_analysis_error = False
-        title = "Error loading analysis"
         if 'info' not in analysisInfo.keys():
             load_analysis_error = True
             message = "Selected file does not appear to contain saved Network Zoo analysis"
@@ -861,6 +1219,9 @@ class InputHandling(object):
             ica_icn_mapped         = analysisInfo['ica_icn_mapped'] # dict of ICA > ICN mappings
             ica_mapped_customNames = analysisInfo['ica_mapped_customNames'] # custom ICA names for above
             icn_mapped_customNames = analysisInfo['icn_mapped_customNames'] # custom ICN names for above
+            ica_fingerprints       = analysisInfo.get('ica_fingerprints', {}) # content hashes, not in older files
+            icn_fingerprints       = analysisInfo.get('icn_fingerprints', {})
+            file_keys              = analysisInfo.get('file_keys', {}) # path, size & mtime of above files
             
             # Sanity checks
             message = ""
@@ -887,6 +1248,21 @@ class InputHandling(object):
                         message += "\n"+f
                 else:
                     message += " Could not find: "+ opj(os.path.commonpath(missing_files), "*")
+            
+            # Check headers of remaining files, w/o loading voxel data
+            invalid_files = [f for f in ica_files 
+                             if not self.inspector.check_vol_inds(f, ica_IndstoNames.get(f, {}).keys())]
+            invalid_files += [f for f in icn_files 
+                              if not self.inspector.check_vol_inds(f, icn_IndstoNames.get(f, {}).keys())]
+            if len(invalid_files) > 0:
+                load_analysis_error = True
+                message += "\n\nSaved file(s) could not be read, or no longer contain saved volumes:"
+                for f in invalid_files:
+                    message += "\n"+f
+                ica_files = [f for f in ica_files if f not in invalid_files]
+                icn_files = [f for f in icn_files if f not in invalid_files]
+            self.inspector.save()
+                
             if load_analysis_error:
                 if (len(ica_files)==0) and (len(icn_files)==0):
                     message += "Unable to load saved analysis"
@@ -897,10 +1273,7 @@ class InputHandling(object):
                     QtWidgets.QMessageBox.warning(None, title, message)
                     
             self.config = InputHandling.config_check_defaults(config)
-            self.add_files_to_list(self.listWidget_ICA, 'ica', 
-                                   ica_files, file_inds=ica_IndstoNames,
-                                   search_pattern=self.config['ica']['search_pattern'], 
-                                   append=False)
+            self.restore_list(self.listWidget_ICA, 'ica', ica_files, ica_IndstoNames)
             if ica_ts_files is not None:
                 self.load_ica_timeseries(ica_files=ica_ts_files, 
                                          prompt_fileDialog=False, 
@@ -911,17 +1284,24 @@ class InputHandling(object):
             
             extra_template_items = self.config['icn']['extra_items'].copy()
             extra_template_items += self.config['noise']['extra_items'].copy()
-            self.add_files_to_list(self.listWidget_ICN, 'icn', 
-                                   icn_files, file_inds=icn_IndstoNames,
-                                   search_pattern=self.config['icn']['search_pattern'],
-                                   extra_items=extra_template_items,
-                                   append=False)
+            self.restore_list(self.listWidget_ICN, 'icn', icn_files, icn_IndstoNames,
+                              extra_items=extra_template_items)
             if icn_customNames is not None:                          # 6/8/2022 --kw-- new feature, save/load custom display names
                 for icn_lookup in icn_customNames.keys():
                     self.gd['icn'][icn_lookup]['display_name'] = icn_customNames[icn_lookup]
 
+            ica_changed = self.check_fingerprints('ica', ica_fingerprints, file_keys, title=title)
+            icn_changed = self.check_fingerprints('icn', icn_fingerprints, file_keys, title=title)
+            
+            if self.prefetcher is not None: # slices found for unchanged vols.
+                view_coords = analysisInfo.get('view_coords', {})
+                self.prefetcher.import_coords({view: coords for view, coords in view_coords.items()
+                                               if (view[0] in self.gd['ica'].keys()) and (view[0] not in ica_changed)
+                                               and ((view[1] is None) or ((view[1] in self.gd['icn'].keys())
+                                                                          and (view[1] not in icn_changed)))})
+            
             if corrs is not None:
-                self.corrs = corrs
+                self.corrs = cs.CorrelationStore.from_corrs(corrs)
                 
             for ica_lookup, icn_lookup in ica_icn_mapped.items():
                 self.add_saved_Classification(ica_icn_pair=(ica_lookup, icn_lookup),
@@ -929,6 +1309,68 @@ class InputHandling(object):
                                               icn_custom_name=icn_mapped_customNames[ica_lookup])
                 
             
+    def restore_list(self, listWidget, list_name, files, file_inds, extra_items=None):
+        """Rebuild list from saved analysis, using headers only,
+        voxel data is loaded when item is first displayed, correlated or exported (see get_img())"""
+        
+        listWidget.clear()
+        self.gd[list_name] = {}
+        for file_name in files:
+            vol_info = self.inspector.inspect(file_name)
+            if vol_info is None: continue
+            vol_dim = len(vol_info['shape'])
+            for vol_ind, lookup_key in file_inds.get(file_name, {}).items():
+                # 4D vols. indexed by vol., 3D atlases indexed by ROI label (0 for entire vol.)
+                self.update_file_info(list_name, file_name, None, listWidget,
+                                      lookup_key=lookup_key, k=int(float(vol_ind)), vol_dim=vol_dim)
+        self.inspector.save()
+        
+        if extra_items:
+            for extra in extra_items:
+                if extra not in self.gd[list_name].keys():
+                    self.update_file_info(list_name, None, None, listWidget,
+                                          lookup_key=extra)
+        listWidget.clearSelection()
+        listWidget.setCurrentRow(-1)
+    
+    
+    def get_fingerprint(self, list_name, lookup_key):
+        """Get item's content fingerprint, hashing file if not yet known"""
+
+        item = self.gd[list_name][lookup_key]
+        if (item.get('fingerprint') is None) and item['filepath']:
+            item['fingerprint'] = self.fingerprints.get_vol(item['filepath'], 
+                                                            vol_ind=item['vol_ind'], fourD=item['4d_nii'])
+        return item.get('fingerprint')
+    
+    
+    def check_fingerprints(self, list_name, saved_fingerprints, file_keys=None, title="Error loading analysis"):
+        """Warn if vols. have changed since analysis was saved,
+        only files w/ new size or mtime since saving are re-hashed"""
+
+        if not saved_fingerprints: return []
+        file_keys = file_keys if file_keys else {}
+        changed = []
+        for lookup_key, saved in saved_fingerprints.items():
+            if (not saved) or (lookup_key not in self.gd[list_name].keys()): continue
+            file_name = self.gd[list_name][lookup_key]['filepath']
+            if (file_name in file_keys.keys()) and os.path.isfile(file_name):
+                if file_keys[file_name] == vc.VolumeCache.file_key(file_name):
+                    self.gd[list_name][lookup_key]['fingerprint'] = saved # unchanged file
+                    continue
+            current = self.get_fingerprint(list_name, lookup_key)
+            if current and (current != saved):
+                changed.append(lookup_key)
+        self.fingerprints.save()
+        if len(changed) > 0:
+            message = "Contents of saved volume(s) have changed since analysis was saved,"
+            message += " saved correlations & classifications may be outdated:"
+            for lookup_key in changed:
+                message += "\n" + lookup_key + " (" + str(self.gd[list_name][lookup_key]['filepath']) + ")"
+            QtWidgets.QMessageBox.warning(None, title, message)
+        return changed
+    
+            
     def add_saved_Classification(self, ica_icn_pair=None, ica_custom_name=None, 
                                  icn_custom_name=None, updateGUI=True):
         """Add ICA > ICN mapping to Qt list, customized for 'load_analysis_json()'"""
@@ -1080,9 +1522,40 @@ class InputHandling(object):
             configData['output_directory'] = opj(configData['base_directory'], 
                                                  configData['output_directory'])
         if 'corr_onClick' not in configData.keys(): configData['corr_onClick'] = True
+        if 'corr_background' not in configData.keys(): configData['corr_background'] = True
         if 'saved_analysis' not in configData.keys(): configData['saved_analysis'] = False
         if 'saved_analysis_path' not in configData.keys(): configData['saved_analysis_path'] = ""
         if 'output_created' not in configData.keys(): configData['output_created'] = False
+        if 'cache' not in configData.keys(): configData['cache'] = {}
+        for key, value in [('enabled', True), ('directory', 'cache'), ('max_size_mb', 4096)]:
+            if key not in configData['cache'].keys():
+                configData['cache'][key] = value
+        if not os.path.isabs(configData['cache']['directory']):
+            configData['cache']['directory'] = opj(configData['base_directory'], 
+                                                   configData['cache']['directory'])
+        if 'bundle' not in configData['icn'].keys(): configData['icn']['bundle'] = ""
+        if configData['icn']['bundle'] and not os.path.isabs(configData['icn']['bundle']):
+            configData['icn']['bundle'] = opj(configData['base_directory'], 
+                                              configData['icn']['bundle'])
+        if 'journal' not in configData.keys():
+            configData['journal'] = {'enabled': True, 'directory': 'autosave', 'compact_interval_sec': 120}
+        if not os.path.isabs(configData['journal']['directory']):
+            configData['journal']['directory'] = opj(configData['base_directory'], 
+                                                     configData['journal']['directory'])
+        if 'catalog' not in configData.keys():
+            configData['catalog'] = {'enabled': False, 'path': 'catalog.sqlite'}
+        if not os.path.isabs(configData['catalog']['path']):
+            configData['catalog']['path'] = opj(configData['base_directory'], 
+                                                configData['catalog']['path'])
+        if 'memory' not in configData.keys():
+            configData['memory'] = {'enabled': True, 'budget_mb': 2048, 'view_cache_mb': 64}
+        elif 'view_cache_mb' not in configData['memory'].keys():
+            configData['memory']['view_cache_mb'] = 64
+        if 'prefetch' not in configData.keys():
+            configData['prefetch'] = {'enabled': True, 'max_views': 4, 'sweep': True, 'top_k': 3}
+        for key, value in [('sweep', True), ('top_k', 3)]:
+            if key not in configData['prefetch'].keys():
+                configData['prefetch'][key] = value
 
         # Load display settings
         warning_flag = False
@@ -1091,6 +1564,11 @@ class InputHandling(object):
         if 'mri_plots' not in configData['display']:
             configData['display']['mri_plots'] = config_backup['display']['mri_plots']
             warning_flag = True
+        elif 'mosaic_compositor' not in configData['display']['mri_plots'].get('global', {}).keys():
+            configData['display']['mri_plots'].setdefault('global', {})['mosaic_compositor'] = True
+        for key, value in [('overlay_top', 0), ('overlay_colors', ['#ff7f0e', '#2ca02c', '#9467bd'])]:
+            if key not in configData['display']['mri_plots'].get('icn', {}).keys():
+                configData['display']['mri_plots'].setdefault('icn', {})[key] = value
         if 'time_plots' not in configData['display']:
             configData['display']['time_plots'] = config_backup['display']['time_plots']
             warning_flag = True
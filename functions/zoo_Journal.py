@@ -0,0 +1,168 @@
+"""Append-only journal of classification changes, for autosave & recovery in Network Zoo"""
+
+# Python Libraries
+import os, json, time, queue, threading
+
+# Internal imports
+import zoo_AnalysisBundle as ab # saved analyses, as JSON manifest + binary arrays
+
+
+class AnalysisJournal(object):
+    """
+    Records changes to current analysis as single JSON lines appended to a journal file,
+    written by a background thread so GUI never waits on disk.
+    Snapshots of the full analysis (compaction) are written in the same thread, in saved analysis format,
+    after which journal restarts empty. Session is recovered by loading snapshot & replaying journal.
+
+    Journal entries are dicts w/ 'op' & 't' (time) fields, plus:
+      'classify':   ica, icn, ica_name, icn_name
+      'unclassify': ica, icn
+      'rename':     list, lookup, name
+      'remove':     list, lookups (ICs or templates removed from lists)
+      'corrs':      corrs (nested dict, as in NetworkZooGUI.corrs)
+    Replaying any entry more than once gives same result.
+    """
+
+    JOURNAL_NAME = 'journal.jsonl'
+    SNAPSHOT_NAME = 'autosave.json'
+
+    def __init__(self, directory):
+        super().__init__()
+
+        self.directory = directory
+        self.journal_file = os.path.join(directory, self.JOURNAL_NAME)
+        self.snapshot_file = os.path.join(directory, self.SNAPSHOT_NAME)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.n_events = 0    # entries since last snapshot
+        self.has_snapshot = False # snapshot written in current session
+        self.unsaved = False # changes since analysis was saved/loaded by user
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Create journal from 'journal' field in config.json, if enabled"""
+
+        if 'journal' not in config.keys(): return None
+        if not config['journal'].get('enabled', True): return None
+        if not config['journal'].get('directory'): return None
+        try:
+            return cls(config['journal']['directory'])
+        except OSError:
+            print('WARNING: could not create autosave directory: ' + str(config['journal']['directory']))
+            return None
+
+    def start(self):
+        """Start background writer"""
+
+        if (self._thread is not None) and self._thread.is_alive(): return
+        self._thread = threading.Thread(target=self._write_loop, name='zoo_journal', daemon=True)
+        self._thread.start()
+
+    def log(self, op, **fields):
+        """Queue entry to append to journal"""
+
+        entry = {'op': op, 't': time.time()}
+        entry.update(fields)
+        self.n_events += 1
+        self.unsaved = True
+        self.start()
+        self._queue.put(('entry', entry))
+
+    def snapshot(self, manifest, corrs, IndstoNames):
+        """Queue full snapshot of analysis, replacing current journal.
+        Inputs should be copies, not modified by GUI after call"""
+
+        self.n_events = 0
+        self.has_snapshot = True
+        self.start()
+        self._queue.put(('snapshot', (manifest, corrs, IndstoNames)))
+
+    def discard(self):
+        """Remove journal & snapshot, ex. after analysis is saved by user"""
+
+        self.n_events = 0
+        self.has_snapshot = False
+        self.unsaved = False
+        self.start()
+        self._queue.put(('discard', None))
+
+    def flush(self):
+        """Wait until all queued entries are written"""
+
+        if (self._thread is not None) and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, discard=False):
+        """Write remaining entries & stop writer"""
+
+        if discard: self.discard()
+        if (self._thread is not None) and self._thread.is_alive():
+            self._queue.put(('stop', None))
+            self._thread.join()
+        self._thread = None
+
+    def _write_loop(self):
+        """Writer thread, appends entries in batches & writes snapshots in order queued"""
+
+        while True:
+            task, data = self._queue.get()
+            batch = [(task, data)]
+            while task == 'entry': # collect all entries queued so far, for a single write
+                try:
+                    task, data = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append((task, data))
+
+            entries = [data for task, data in batch if task == 'entry']
+            try:
+                if len(entries) > 0:
+                    self._append(entries)
+                if batch[-1][0] == 'snapshot':
+                    self._write_snapshot(*batch[-1][1])
+                elif batch[-1][0] == 'discard':
+                    self._remove_files()
+            except (OSError, TypeError, ValueError) as e:
+                print('WARNING: could not write autosave: ' + str(e))
+            for _ in batch:
+                self._queue.task_done()
+            if batch[-1][0] == 'stop': return
+
+    def _append(self, entries):
+        with open(self.journal_file, 'a') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_snapshot(self, manifest, corrs, IndstoNames):
+        ab.AnalysisBundle.write(self.snapshot_file, manifest, corrs, IndstoNames=IndstoNames)
+        open(self.journal_file, 'w').close() # snapshot includes all previous entries
+
+    def _remove_files(self):
+        for fname in [self.journal_file, self.snapshot_file,
+                      ab.AnalysisBundle.arrays_path(self.snapshot_file)]:
+            if os.path.isfile(fname):
+                os.remove(fname)
+
+    def has_recovery(self):
+        """Check if previous session left a snapshot or journal entries"""
+
+        if os.path.isfile(self.snapshot_file): return True
+        return os.path.isfile(self.journal_file) and (os.path.getsize(self.journal_file) > 0)
+
+    def read_entries(self):
+        """Read journal entries, skipping incomplete last line left by crash"""
+
+        entries = []
+        if not os.path.isfile(self.journal_file): return entries
+        with open(self.journal_file) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+        return entries
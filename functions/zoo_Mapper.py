@@ -1,3 +1,4 @@
+import time, heapq, itertools, threading
 import numpy as np
 from nilearn import image
 from nibabel.nifti1 import Nifti1Image, Nifti1Pair
@@ -10,6 +11,8 @@ from PyQt5.QtWidgets import QDialog, QPushButton
 
 # Internal imports
 import zoo_ProgressBarWin as prbr    # PyQt widget in ../gui
+import zoo_VolumeCache as vc        # decompressed, memory-mapped copies of .nii.gz files
+import zoo_VolumeStats as vs        # summary stats. of vols., computed once per vol.
 
 class Mapper(QObject):
     """
@@ -34,7 +37,7 @@ class Mapper(QObject):
                  in_files=None, in_filenames=None,
                  map_files=None, map_filenames=None, 
                  bin_inFiles=False, bin_mapFiles=False,
-                 waitBar=False, corrs=None):
+                 waitBar=False, corrs=None, session=None):
         super().__init__()
         
         # in_files & map files
@@ -63,6 +66,9 @@ class Mapper(QObject):
         else:
             self.corrs = {}
         
+        # long-lived cache of prepared vols., shared w/ main window
+        self.session = session
+        
         # switch for progress bar 
         self.waitBar = waitBar
         self.stopMapper = False  # called from outside fn., interrupts loop
@@ -96,10 +102,10 @@ class Mapper(QObject):
     def _load_files(self):
         """Initializes fn. by loading all images"""
         if self.in_files:
-            self.in_imgs = [i if isinstance(i, (Nifti1Image, Nifti1Pair)) else image.load_img(i)
+            self.in_imgs = [i if isinstance(i, (Nifti1Image, Nifti1Pair)) else vc.VolumeCache.load(i)
                             for i in self.in_files]
         if self.map_files:
-            self.map_imgs = [i if isinstance(i, (Nifti1Image, Nifti1Pair)) else image.load_img(i)
+            self.map_imgs = [i if isinstance(i, (Nifti1Image, Nifti1Pair)) else vc.VolumeCache.load(i)
                              for i in self.map_files]
         
     def set_ref_vol(self, img=None, map_img=None):
@@ -114,13 +120,13 @@ class Mapper(QObject):
                 if isinstance(self.in_imgs[0], (Nifti1Image, Nifti1Pair)):
                     img = self.in_imgs[0]
                 else:
-                    img = image.load_img(self.in_imgs[0])
+                    img = vc.VolumeCache.load(self.in_imgs[0])
         if not isinstance(map_img, (Nifti1Image, Nifti1Pair)):
             if hasattr(self, 'map_imgs'):
                 if isinstance(self.map_imgs[0], (Nifti1Image, Nifti1Pair)):
                     map_img = self.map_imgs[0]
                 else:
-                    map_img = image.load_img(self.map_imgs[0])
+                    map_img = vc.VolumeCache.load(self.map_imgs[0])
                     
         if img and map_img:
             if img.shape[0:3] > map_img.shape[0:3]:
@@ -257,7 +263,9 @@ class Mapper(QObject):
             new_corrs[img_names[i]] = {}
             if ref_img is None:  #default to rescaling to dimensions of img, if not input
                 ref_img = img
-            if bin_imgs:         #binarize w/o scaling or thresholding
+            if self.session is not None: #vols. prepared once & cached in session
+                img_arr = None
+            elif bin_imgs:       #binarize w/o scaling or thresholding
                 img_arr = Mapper.prep_tmap(img, reference=ref_img, binary=True)
             else:                #treats imgs as array of real numbers, threshold & scale appropriately
                 img_arr = Mapper.prep_tmap(img, reference=ref_img)
@@ -277,6 +285,10 @@ class Mapper(QObject):
                     self.templ_changed.emit(map_names[ii])
                     ij += 1
                     self.ij_changed.emit(ij)
+                if self.session is not None:
+                    new_corrs[img_names[i]][map_names[ii]] = self.session.correlate(img_names[i], map_names[ii],
+                                                                                    in_img=img, map_img=mimg)
+                    continue
                 if bin_maps: #treats mimgs as binary ICNs templates, binarize w/o scaling or thresholding
                     mimg_arr = Mapper.prep_tmap(mimg, reference=ref_img, binary=True)
                 else:        #treats mimgs as array of real numbers, threshold & scale appropriately
@@ -287,31 +299,40 @@ class Mapper(QObject):
     
     @staticmethod
     def prep_tmap(img, reference=None, center=False, scale=False, 
-                  threshold=None, quantile=None, binary=False):
-        """Quick transforms to speed corr. calc. for spatial maps"""
+                  threshold=None, quantile=None, binary=False, stats=None):
+        """Quick transforms to speed corr. calc. for spatial maps.
+        Stats. of unresampled vols. are read from zoo_VolumeStats, instead of recalculated from array"""
         
         if isinstance(img, (Nifti1Image, Nifti1Pair)):
             img = img
         elif img is None and isinstance(reference, (Nifti1Image, Nifti1Pair)):
             img = reference
         else:
-            image.load_img(img)
+            img = vc.VolumeCache.load(img)
         if isinstance(reference, (str, (Nifti1Image, Nifti1Pair))):
             if img.shape != reference.shape:
                 img = image.resample_to_img(source_img=img, target_img=reference)
+                stats = None # ...stats. of input vol. do not apply
         dat = img.get_fdata(caching='unchanged').flatten()
         
-        dat[np.logical_not(np.isfinite(dat))] = 0   # zero out all NaN, indexing syntax required by numpy
+        if (stats is None) or (stats.n_finite < dat.size):
+            dat[np.logical_not(np.isfinite(dat))] = 0   # zero out all NaN, indexing syntax required by numpy
         if center:
-            dat[dat.nonzero()] = dat[dat.nonzero()] - dat[dat.nonzero()].mean()
+            nz_mean = stats.nz_mean if stats else dat[dat.nonzero()].mean()
+            dat[dat.nonzero()] = dat[dat.nonzero()] - nz_mean
         if scale:
-            if dat[dat.nonzero()].std(ddof=1) != 0:
-                dat[dat.nonzero()] = dat[dat.nonzero()] / dat[dat.nonzero()].std(ddof=1)
+            nz_std = stats.nz_std if (stats and not center) else dat[dat.nonzero()].std(ddof=1)
+            if nz_std != 0:
+                dat[dat.nonzero()] = dat[dat.nonzero()] / nz_std
         if quantile:
-            dat[dat < np.percentile(dat[dat.nonzero()], quantile)] = 0.
+            if stats and not (center or scale):
+                dat[dat < stats.percentile(quantile, nonzero=True, data=dat)] = 0.
+            else:
+                dat[dat < np.percentile(dat[dat.nonzero()], quantile)] = 0.
         if threshold: # if threshold appears to be fraction, threshold vol. based on fraction of maximum
-            if (0 < threshold < 1 < dat.max()): 
-                threshold = dat.max() * threshold 
+            vmax = stats.max if (stats and not (center or scale or quantile)) else dat.max()
+            if (0 < threshold < 1 < vmax): 
+                threshold = vmax * threshold 
             dat[dat < threshold] = 0.
         if binary:    # note that prev. centering, quantiles, scaling will create 0 or neg. values
             dat[dat < 0] = 0.
@@ -354,6 +375,484 @@ class Mapper(QObject):
 
         
         
+class VectorStack(object):
+    """
+    Prepared vectors stored as rows of single growable matrix, indexed by lookup name, 
+    so blocks of correlations are matrix products w/o copying vectors.  Removed rows are reused.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        
+        self.rows = {}      # lookup name : row in matrix, None if vol. is constant
+        self._free = []
+        self._n = 0         # rows used, incl. freed rows
+        self._mat = None
+        
+    def __contains__(self, name):
+        return name in self.rows.keys()
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    @property
+    def nbytes(self):
+        return self._mat.nbytes if self._mat is not None else 0
+    
+    @property
+    def matrix(self):
+        """Used rows of matrix, incl. freed rows (not indexed)"""
+        return self._mat[:self._n] if self._mat is not None else np.zeros((0,0), dtype=np.float32)
+    
+    def get(self, name):
+        """Copy of prepared vector, as rows are reused once removed"""
+        i = self.rows.get(name)
+        return None if i is None else self._mat[i].copy()
+    
+    def take(self, inds):
+        """Copy of matrix rows"""
+        return self.matrix[inds]
+    
+    def add(self, name, vec):
+        if vec is None:
+            self.rows[name] = None
+            return
+        if self._free:
+            i = self._free.pop()
+        else:
+            if self._mat is None:
+                self._mat = np.zeros((16, vec.size), dtype=np.float32)
+            elif self._n == self._mat.shape[0]:
+                mat = np.zeros((2 * self._mat.shape[0], self._mat.shape[1]), dtype=np.float32)
+                mat[:self._n] = self._mat
+                self._mat = mat
+            i = self._n
+            self._n += 1
+        self._mat[i] = vec
+        self.rows[name] = i
+        
+    def remove(self, name):
+        i = self.rows.pop(name, None)
+        if i is not None: self._free.append(i)
+    
+    def indices(self, names):
+        """Positions in names & matrix rows, for names w/ prepared non-constant vectors"""
+        
+        pos, inds = [], []
+        for p, name in enumerate(names):
+            i = self.rows.get(name)
+            if i is not None:
+                pos.append(p)
+                inds.append(i)
+        return np.array(pos, dtype=int), np.array(inds, dtype=int)
+    
+    
+class CorrelationSession(object):
+    """
+    Long-lived correlation state for Network Zoo GUI, kept by main window across clicks & analyses.
+    
+    Each IC & template is resampled to a shared reference vol. once, then stored as a mean-centered, 
+    unit-length vector, so each pair's correlation is a single dot product, & blocks of pairs 
+    (ex. new templates vs. all prepared ICs) are a single matrix product.  Reference is the smaller 
+    of the 1st IC & template correlated, as in Mapper.set_ref_vol().  Vectors are prepared when first 
+    needed, from input imgs or from 'get_in_img' & 'get_map_img' fns. (called w/ lookup name), 
+    & are dropped when items are removed from GUI lists.  Vols. are resampled w/o holding lock, 
+    so other threads can read prepared vectors meanwhile; lock is held only to read & update caches.
+    Templates from precompiled bundles (see zoo_TemplateBundle) are read as prepared vectors w/o 
+    resampling, if reference is on bundle grid; 'get_map_bundle' fn. returns (TemplateBundle, row) or None.
+    """
+    
+    def __init__(self, get_in_img=None, get_map_img=None, bin_inFiles=False, bin_mapFiles=False,
+                 get_map_bundle=None):
+        super().__init__()
+        
+        self.get_in_img, self.get_map_img = get_in_img, get_map_img
+        self.get_map_bundle = get_map_bundle
+        self.bin_inFiles, self.bin_mapFiles = bin_inFiles, bin_mapFiles
+        self.reference_img = None
+        self.in_vecs = VectorStack()  # prepared ICs, by lookup name
+        self.map_vecs = VectorStack() # prepared templates, by lookup name
+        self._lock = threading.RLock() # shared w/ Mapper threads
+        
+    def set_ref_vol(self, img, map_img):
+        """Set reference to smaller of img & map_img, in terms of vol. dimensions"""
+        
+        with self._lock:
+            if img.shape[0:3] > map_img.shape[0:3]:
+                self.reference_img = map_img
+            else:
+                self.reference_img = img
+            
+    def prepare(self, img, binary=False, reference=None):
+        """Resample to reference (session reference by default) & scale to mean-centered unit vector, 
+        None if vol. is constant"""
+        
+        reference = self.reference_img if reference is None else reference
+        stats = vs.StatsCache.get(img) if isinstance(img, (Nifti1Image, Nifti1Pair)) else None
+        dat = Mapper.prep_tmap(img, reference=reference, binary=binary, stats=stats)
+        resampled = (reference is not None) and (img.shape != reference.shape)
+        if (stats is not None) and not (binary or resampled):
+            dat = dat - stats.mean # ...mean & std. of vol. as prepared
+            norm = stats.std * np.sqrt(dat.size)
+        else:
+            dat = dat - dat.mean()
+            norm = np.linalg.norm(dat)
+        if norm == 0: return None
+        return (dat / norm).astype(np.float32)
+    
+    def in_vector(self, name, img=None, load=True):
+        """Prepared IC, from cache if available"""
+        
+        with self._lock:
+            if name in self.in_vecs: return self.in_vecs.get(name)
+            reference = self.reference_img
+        if img is None and self.get_in_img and load: img = self.get_in_img(name)
+        if img is None: return None
+        vec = self.prepare(img, binary=self.bin_inFiles, reference=reference)
+        return self._add_vector('in_vecs', name, vec, reference)
+        
+    def bundled(self, name, reference=None):
+        """Template's (TemplateBundle, row), if template can be read from bundle w/o resampling 
+        to reference (session reference by default), or None"""
+        
+        if (self.get_map_bundle is None) or self.bin_mapFiles: return None
+        bundled = self.get_map_bundle(name)
+        reference = self.reference_img if reference is None else reference
+        if (bundled is None) or (not bundled[0].on_grid(reference)): return None
+        return bundled
+    
+    def map_vector(self, name, img=None, load=True):
+        """Prepared template, from cache if available"""
+        
+        with self._lock:
+            if name in self.map_vecs: return self.map_vecs.get(name)
+            reference = self.reference_img
+        bundled = self.bundled(name, reference)
+        if bundled is not None:
+            vec = bundled[0].prepared_vector(bundled[1])
+        else:
+            if img is None and self.get_map_img and load: img = self.get_map_img(name)
+            if img is None: return None
+            vec = self.prepare(img, binary=self.bin_mapFiles, reference=reference)
+        return self._add_vector('map_vecs', name, vec, reference)
+    
+    def _add_vector(self, stack_name, name, vec, reference):
+        """Cache vector prepared w/o lock, unless reference was reset meanwhile (ex. analysis cleared).
+        If prepared by several threads at once, 1st vector cached is kept"""
+        
+        with self._lock:
+            if self.reference_img is not reference: return None
+            vecs = getattr(self, stack_name)
+            if name not in vecs: vecs.add(name, vec)
+            return vecs.get(name)
+        
+    def correlate(self, in_name, map_name, in_img=None, map_img=None, load=True):
+        """Correlation of single IC & template, NaN if either is missing or constant.
+        If not load, imgs not input or already prepared are not requested from GUI (for use outside GUI thread)"""
+        
+        if self.reference_img is None:
+            if in_img is None and self.get_in_img and load: in_img = self.get_in_img(in_name)
+            if map_img is None and self.get_map_img and load: map_img = self.get_map_img(map_name)
+            if (in_img is None) or (map_img is None): return np.nan
+            with self._lock:
+                if self.reference_img is None: self.set_ref_vol(in_img, map_img)
+        in_vec = self.in_vector(in_name, in_img, load=load)
+        map_vec = self.map_vector(map_name, map_img, load=load)
+        if (in_vec is None) or (map_vec is None): return np.nan
+        return float(np.clip(np.dot(in_vec, map_vec), -1., 1.))
+    
+    def correlate_block(self, in_names, map_names, load=True):
+        """Correlations of all pairs of ICs & templates, as array (in_names x map_names) from single 
+        matrix product of requested rows, NaN for pairs w/ missing or constant vols.
+        If not load, only vectors already prepared are used"""
+        
+        block = np.full((len(in_names), len(map_names)), np.nan)
+        if (len(in_names) == 0) or (len(map_names) == 0): return block
+        if load: # ...vols. are prepared w/o holding lock
+            if self.reference_img is None:
+                self.correlate(in_names[0], map_names[0])
+            for name in in_names: 
+                if name not in self.in_vecs: self.in_vector(name)
+            for name in map_names: 
+                if name not in self.map_vecs: self.map_vector(name)
+        with self._lock: # ...rows are copied, as rows of removed vectors are reused
+            in_pos, in_inds = self.in_vecs.indices(in_names)
+            map_pos, map_inds = self.map_vecs.indices(map_names)
+            if (len(in_inds) == 0) or (len(map_inds) == 0): return block
+            in_mat, map_mat = self.in_vecs.take(in_inds), self.map_vecs.take(map_inds)
+        r = np.dot(in_mat, map_mat.T)
+        block[np.ix_(in_pos, map_pos)] = np.clip(r, -1., 1.)
+        return block
+    
+    def remove_in(self, names):
+        """Drop prepared ICs"""
+        
+        names = [names] if isinstance(names, str) else names
+        with self._lock:
+            for name in names: self.in_vecs.remove(name)
+            
+    def remove_map(self, names):
+        """Drop prepared templates"""
+        
+        names = [names] if isinstance(names, str) else names
+        with self._lock:
+            for name in names: self.map_vecs.remove(name)
+            
+    def clear(self):
+        """Drop all prepared vols. & reference, ex. when analysis is reset"""
+        
+        with self._lock:
+            self.in_vecs, self.map_vecs = VectorStack(), VectorStack()
+            self.reference_img = None
+    
+    def is_prepared(self, in_name=None, map_name=None):
+        """Check if IC and/or template vectors are cached"""
+        
+        if (in_name is not None) and (in_name not in self.in_vecs): return False
+        if (map_name is not None) and (map_name not in self.map_vecs): return False
+        return True
+        
+        
+class CorrelationScheduler(QObject):
+    """
+    Priority queue of IC & template pairs, correlated in a background thread w/ prepared vols. 
+    from a CorrelationSession.  Once a pair's vols. are prepared, other queued pairs in its row & col. 
+    w/ prepared vols. are correlated together as a single matrix product, ex. new templates vs. all ICs.
+    
+    Pairs requested again are kept once, at the highest (lowest number) priority requested.
+    Pairs shown in GUI are correlated first, then the rest of selected IC's row, then analyses
+    requested by user.  Speculative sweeps of all pairs wait until GUI has been idle for IDLE_SEC.
+    Results are sent in batches w/ 'corrs_ready', to be added to shared corrs. in GUI thread.
+    Imgs are read w/ 'get_in_img' & 'get_map_img' fns., which must be safe to call outside GUI thread
+    & return None for vols. not yet loaded.  Pairs w/ vols. not yet loaded are kept waiting while 
+    'is_loading' fn. returns True, & queued again w/ 'retry_waiting()' (ex. once files are loaded), 
+    otherwise are skipped.
+    """
+    
+    PRIORITY_VISIBLE = 0  # pairs displayed in GUI
+    PRIORITY_SELECTED = 1 # remaining pairs for selected IC
+    PRIORITY_ANALYSIS = 2 # all pairs, requested w/ 'Run Analysis'
+    PRIORITY_SWEEP = 3    # all pairs, in idle time after files load
+    IDLE_SEC = 0.5
+    BATCH_SEC = 0.1
+    
+    corrs_ready = pyqtSignal(object)  # {in_name: {map_name: r}}
+    progress = pyqtSignal(int, int)   # pairs done, pairs requested since queue was last empty
+    finished = pyqtSignal()           # queue empty
+    
+    def __init__(self, session, corrs=None, get_in_img=None, get_map_img=None, is_loading=None):
+        super().__init__()
+        
+        self.session = session
+        self.corrs = corrs if corrs is not None else {} # existing corrs., skipped
+        self.get_in_img, self.get_map_img = get_in_img, get_map_img
+        self.is_loading = is_loading if is_loading else (lambda: False)
+        
+        self._heap = []     # (priority, order, (in_name, map_name))
+        self._pending = {}  # (in_name, map_name) : priority, entries in heap w/ other priorities are skipped
+        self._waiting = set() # pending pairs w/o entry in heap, waiting for vols. to load
+        self._pending_in, self._pending_map = {}, {} # queued pairs by IC & by template
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self.last_interaction = 0.
+        self.n_done, self.n_requested = 0, 0
+        
+    def start(self):
+        """Start background worker"""
+        
+        if (self._thread is not None) and self._thread.is_alive(): return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='zoo_correlations', daemon=True)
+        self._thread.start()
+        
+    def stop(self):
+        """Stop worker after current pair"""
+        
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+        
+    def request(self, pairs, priority=PRIORITY_SWEEP):
+        """Queue (in_name, map_name) pairs, returns no. of pairs newly queued or moved forward"""
+        
+        n_new = 0
+        with self._cond:
+            if priority < self.PRIORITY_SWEEP:
+                self.last_interaction = time.time()
+            for pair in pairs:
+                if (pair[0] in self.corrs.keys()) and (pair[1] in self.corrs[pair[0]].keys()): continue
+                if pair in self._pending.keys():
+                    if self._pending[pair] <= priority: continue
+                else:
+                    self.n_requested += 1
+                self._push(pair, priority)
+                n_new += 1
+            if n_new > 0: self._cond.notify()
+        if n_new > 0: self.start()
+        return n_new
+    
+    def request_row(self, in_name, map_names, priority=PRIORITY_SELECTED):
+        """Queue all pairs for single IC"""
+        return self.request([(in_name, map_name) for map_name in map_names], priority)
+    
+    def request_all(self, in_names, map_names, priority=PRIORITY_SWEEP):
+        """Queue all pairs of ICs & templates w/o corrs."""
+        
+        if hasattr(self.corrs, 'missing_pairs'): # ...w/o checking each pair, see zoo_CorrelationStore
+            return self.request(self.corrs.missing_pairs(in_names, map_names), priority)
+        return self.request([(in_name, map_name) for in_name in in_names 
+                             for map_name in map_names], priority)
+    
+    def discard(self, in_names=None, map_names=None):
+        """Drop queued pairs for removed ICs/templates, or all pairs if neither is input"""
+        
+        with self._cond:
+            if (in_names is None) and (map_names is None):
+                self._heap, self._pending, self._waiting = [], {}, set()
+                self._pending_in, self._pending_map = {}, {}
+                self.n_done, self.n_requested = 0, 0
+                return
+            in_names = [in_names] if isinstance(in_names, str) else (in_names or [])
+            map_names = [map_names] if isinstance(map_names, str) else (map_names or [])
+            pairs = set()
+            for in_name in in_names:
+                pairs.update((in_name, map_name) for map_name in self._pending_in.get(in_name, ()))
+            for map_name in map_names:
+                pairs.update((in_name, map_name) for in_name in self._pending_map.get(map_name, ()))
+            for pair in pairs:
+                self._pop(pair) # heap entry skipped when popped
+                self.n_requested -= 1
+                
+    def is_busy(self):
+        return len(self._pending) > 0
+    
+    def retry_waiting(self):
+        """Queue pairs waiting for vols. to load again, at priority requested"""
+        
+        with self._cond:
+            waiting, self._waiting = self._waiting, set()
+            for pair in waiting:
+                if pair in self._pending.keys():
+                    self._push(pair, self._pending[pair])
+            if waiting: self._cond.notify()
+        if waiting: self.start()
+    
+    def _wait(self, pair, priority):
+        """Keep pair w/ vols. not yet loaded as pending, until 'retry_waiting()'.
+        Returns False if nothing is loading (pair is skipped)"""
+        
+        if not self.is_loading(): return False
+        with self._cond:
+            if pair in self._pending.keys(): return True # ...requested again meanwhile
+            self._push(pair, priority, queue=False)
+            self._waiting.add(pair)
+        return True
+    
+    def _push(self, pair, priority, queue=True):
+        """Add pair to queue, or to pending pairs only if not queue, called w/ lock held"""
+        
+        self._waiting.discard(pair)
+        self._pending[pair] = priority
+        self._pending_in.setdefault(pair[0], set()).add(pair[1])
+        self._pending_map.setdefault(pair[1], set()).add(pair[0])
+        if queue: heapq.heappush(self._heap, (priority, next(self._order), pair))
+        
+    def _pop(self, pair):
+        """Remove pair from queue, called w/ lock held"""
+        
+        self._waiting.discard(pair)
+        self._pending.pop(pair)
+        for index, key, other in [(self._pending_in, pair[0], pair[1]), 
+                                  (self._pending_map, pair[1], pair[0])]:
+            index[key].discard(other)
+            if not index[key]: del index[key]
+            
+    def _take_prepared(self, in_name, map_name):
+        """Remove & return queued pairs in IC's row & template's col. w/ prepared vols.,
+        as (in_names for map_name, map_names for in_name)"""
+        
+        with self._cond:
+            col = [other for other in self._pending_map.get(map_name, ()) 
+                   if self.session.is_prepared(in_name=other)]
+            row = [other for other in self._pending_in.get(in_name, ()) 
+                   if self.session.is_prepared(map_name=other) and (other != map_name)] # ...if requested again, in col.
+            for other in col: self._pop((other, map_name))
+            for other in row: self._pop((in_name, other))
+        return col, row
+    
+    def _next(self, timeout):
+        """Pop highest priority pair & its priority, waiting up to timeout, or (None, None)"""
+        
+        with self._cond:
+            while not self._stop:
+                while self._heap:
+                    priority, _, pair = self._heap[0]
+                    if self._pending.get(pair) != priority: # requested again at higher priority, or discarded
+                        heapq.heappop(self._heap)
+                        continue
+                    idle = time.time() - self.last_interaction
+                    if (priority >= self.PRIORITY_SWEEP) and (idle < self.IDLE_SEC):
+                        break # wait for GUI to be idle
+                    heapq.heappop(self._heap)
+                    self._pop(pair)
+                    return pair, priority
+                if timeout <= 0: return None, None
+                self._cond.wait(timeout)
+                timeout = 0
+            return None, None
+    
+    def _run(self):
+        """Worker loop, correlates queued pairs & sends results in batches"""
+        
+        batch, t_batch = {}, time.time()
+        while not self._stop:
+            pair, priority = self._next(self.BATCH_SEC if batch else 1.)
+            if pair is not None:
+                in_name, map_name = pair
+                r, waiting = None, False
+                if not ((in_name in self.corrs.keys()) and (map_name in self.corrs[in_name].keys())):
+                    map_ready = self.session.is_prepared(map_name=map_name) or \
+                                (self.session.bundled(map_name) is not None) # ...read from bundle as is
+                    in_img = None if self.session.is_prepared(in_name=in_name) else self.get_in_img(in_name)
+                    map_img = None if map_ready else self.get_map_img(map_name)
+                    if (in_img is not None or self.session.is_prepared(in_name=in_name)) and \
+                       (map_img is not None or map_ready):
+                        try:
+                            r = self.session.correlate(in_name, map_name, in_img, map_img, load=False)
+                        except Exception as e:
+                            print('WARNING: could not correlate ' + in_name + ' & ' + map_name + ': ' + str(e))
+                    else:
+                        waiting = self._wait(pair, priority)
+                if r is not None:
+                    if in_name not in batch.keys(): batch[in_name] = {}
+                    batch[in_name][map_name] = r
+                if not waiting: self.n_done += 1
+                if (not waiting) and self.session.is_prepared(in_name=in_name, map_name=map_name):
+                    col, row = self._take_prepared(in_name, map_name)
+                    for in_names, map_names in [(col, [map_name]), ([in_name], row)]:
+                        if not (in_names and map_names): continue
+                        block = self.session.correlate_block(in_names, map_names, load=False)
+                        for i, block_in in enumerate(in_names):
+                            for j, block_map in enumerate(map_names):
+                                if block_in not in batch.keys(): batch[block_in] = {}
+                                batch[block_in][block_map] = float(block[i, j])
+                        self.n_done += block.size
+            if batch and ((pair is None) or (time.time() - t_batch > self.BATCH_SEC)):
+                self.corrs_ready.emit(batch)
+                batch, t_batch = {}, time.time()
+            if (pair is not None) or (self.n_done > 0):
+                self.progress.emit(self.n_done, self.n_requested)
+            if (pair is None) and not self.is_busy() and (self.n_done > 0):
+                with self._cond:
+                    self.n_done, self.n_requested = 0, 0
+                self.finished.emit()
+        
+        
 class newDialogMod(QDialog):
     """Modification of QDialog, to close mapper thread when window is closed"""
         
@@ -8,6 +8,9 @@ from scipy.ndimage import binary_dilation #used to smooth edges of binary masks
 from nibabel.nifti1 import Nifti1Image, Nifti1Pair
 from nibabel.affines import apply_affine
 
+# Internal imports
+import zoo_VolumeStats as vs # summary stats. of vols., computed once per vol.
+
 # Qt GUI Libraries
 from PyQt5 import QtWidgets
 
@@ -96,7 +99,11 @@ class MaskMaker(object):
             ica_dat = ica_img.get_fdata(caching='unchanged')
             ica_dat[np.isnan(ica_dat)] = 0
             if self.mask_specs['thresh_percentile']:
-                threshold = np.percentile(ica_dat, self.mask_specs['cutoff_percentile'])
+                if np.isinf(ica_dat).any(): # ...cached stats. zero +/-inf, which would shift percentile
+                    threshold = np.percentile(ica_dat, self.mask_specs['cutoff_percentile'])
+                else:
+                    stats = vs.StatsCache.get(self.gd['ica'][ica_lookup]['img'])
+                    threshold = stats.percentile(self.mask_specs['cutoff_percentile'], data=ica_dat)
                 ica_dat[ica_dat < threshold] = 0
             if self.mask_specs['thresh_max']:
                 threshold = ica_dat.max() * self.mask_specs['cutoff_fractMax']
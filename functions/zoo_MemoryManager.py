@@ -0,0 +1,140 @@
+"""Memory budget for voxel data held by Network Zoo"""
+
+# Python Libraries
+import mmap
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Mathematical Libraries
+import numpy as np
+
+
+class MemoryManager(object):
+    """
+    Tracks bytes of voxel data held in memory by list items & other vols., evicting least recently
+    used data once total exceeds budget.  Items are registered w/ 'touch()' each time they are accessed,
+    along w/ their size (or fn. to measure it, since nibabel caches data after access)
+    & fn. to evict data (ex. dropping nifti img, reloaded from file when next needed).
+    Pinned items, ex. vols. currently displayed, are never evicted.
+    Memory-mapped arrays are not counted, since OS releases those pages as needed.
+    Used only from GUI thread.
+    """
+
+    def __init__(self, budget_mb=2048):
+        super().__init__()
+
+        self.budget_bytes = int(budget_mb * 1024**2) if budget_mb else 0  # 0 ~ track only, no eviction
+        self.entries = OrderedDict()  # key : {'size', 'evict', 'category'}, least recently used first
+        self.pins = {}                # pin group : set of pinned keys
+        self._paused = 0
+        self.n_evicted, self.bytes_evicted = 0, 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Create manager from 'memory' field in config.json, tracking w/o eviction if disabled"""
+
+        if 'memory' not in config.keys(): return cls(budget_mb=0)
+        if not config['memory'].get('enabled', True): return cls(budget_mb=0)
+        return cls(budget_mb=config['memory'].get('budget_mb', 2048))
+
+    @staticmethod
+    def nbytes(entry):
+        return int(entry['size']() if callable(entry['size']) else entry['size'])
+
+    @property
+    def total_bytes(self):
+        return sum(self.nbytes(entry) for entry in self.entries.values())
+
+    def touch(self, key, size, evict=None, category=None):
+        """Register or update data held for key as most recently used, then evict others if over budget.
+        size: bytes, or fn. returning current bytes"""
+
+        entry = self.entries.pop(key, {'category': category if category else str(key[0])})
+        entry['size'] = size
+        if evict is not None: entry['evict'] = evict
+        self.entries[key] = entry
+        self.enforce(protect=key)
+
+    def forget(self, keys):
+        """Stop tracking data, ex. for removed list items"""
+
+        keys = [keys] if isinstance(keys, tuple) else keys
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.pins = {}
+
+    def pin(self, group, keys):
+        """Protect keys from eviction, replacing previous keys pinned for group"""
+        self.pins[group] = set(keys)
+
+    def unpin(self, group):
+        self.pins.pop(group, None)
+        self.enforce()
+
+    def is_pinned(self, key):
+        return any(key in keys for keys in self.pins.values())
+
+    @contextmanager
+    def paused(self):
+        """Suspend eviction, ex. while all vols. are needed at once for output"""
+
+        self._paused += 1
+        try:
+            yield self
+        finally:
+            self._paused -= 1
+            self.enforce()
+
+    def enforce(self, protect=None):
+        """Evict least recently used, unpinned data until total is w/n budget, returns bytes evicted"""
+
+        if (not self.budget_bytes) or self._paused: return 0
+        total = self.total_bytes
+        evicted = 0
+        for key in list(self.entries.keys()):
+            if total <= self.budget_bytes: break
+            entry = self.entries[key]
+            if (key == protect) or ('evict' not in entry.keys()) or self.is_pinned(key): continue
+            nbytes = self.nbytes(entry)
+            if nbytes == 0: continue
+            try:
+                entry['evict']()
+            except Exception as e:
+                print('WARNING: could not release memory for ' + str(key) + ': ' + str(e))
+                continue
+            del self.entries[key]
+            total -= nbytes
+            evicted += nbytes
+            self.n_evicted += 1
+        self.bytes_evicted += evicted
+        return evicted
+
+    @staticmethod
+    def is_memmap(arr):
+        """Check if array, or array it views, is memory-mapped"""
+
+        while isinstance(arr, np.ndarray):
+            if isinstance(arr, np.memmap): # ...copies of memory-mapped arrays keep class, w/o file
+                return getattr(arr, '_mmap', None) is not None
+            if isinstance(arr.base, mmap.mmap): return True
+            arr = arr.base
+        return False
+
+    @staticmethod
+    def array_nbytes(arr):
+        """Bytes held in memory by array, 0 if memory-mapped or not an array"""
+
+        if not isinstance(arr, np.ndarray) or MemoryManager.is_memmap(arr): return 0
+        return arr.nbytes
+
+    @staticmethod
+    def img_nbytes(img):
+        """Bytes of voxel data held in memory by nibabel img, incl. cached floating point copy"""
+
+        if img is None: return 0
+        nbytes = MemoryManager.array_nbytes(getattr(img, '_dataobj', None))
+        nbytes += MemoryManager.array_nbytes(getattr(img, '_fdata_cache', None))
+        return nbytes
@@ -0,0 +1,197 @@
+"""Memory accounting for Network Zoo, by category & item"""
+
+# Python Libraries
+import os, json, time, tracemalloc
+
+# Qt GUI Libraries
+from PyQt5 import QtWidgets
+from PyQt5.QtWidgets import QDialog
+
+# Mathematical Libraries
+import numpy as np
+
+# Internal imports
+import zoo_MemoryManager as mm  # memory budget for voxel data, w/ LRU eviction
+
+
+class MemoryReport(object):
+    """
+    Bytes held in memory by Network Zoo, as dict w/:
+      categories:   {category: bytes}
+      items:        [{'category', 'name', 'bytes'}], largest first
+      budget_bytes, n_evicted, bytes_evicted:  from MemoryManager
+      tracemalloc:  top allocations by source line, if tracing
+    Vols. are listed by list item (ica, icn, smri), along w/ downsampled display reference,
+    figures, nilearn displays & cached bitmaps of views, prepared correlation vectors, correlations & time series.
+    Memory-mapped arrays are not counted.
+    """
+
+    @staticmethod
+    def collect(memory, reference_img=None, session=None, corrs=None,
+                time_series=None, figures=None, displays=None, view_cache=None, trace_limit=15):
+        """Build report from Network Zoo containers, see NetworkZooGUI.memory_report()"""
+
+        items = []
+        for key, entry in memory.entries.items():
+            items.append({'category': entry['category'], 'name': str(key[1]),
+                          'bytes': mm.MemoryManager.nbytes(entry)})
+        if reference_img is not None:
+            items.append({'category': 'reference_img', 'name': 'display reference vol.',
+                          'bytes': mm.MemoryManager.img_nbytes(reference_img)})
+        for name, fig in (figures or {}).items():
+            items.append({'category': 'display', 'name': name, 'bytes': MemoryReport.figure_nbytes(fig)})
+        if displays:
+            items.append({'category': 'display', 'name': 'nilearn displays (%d open)' %len(displays),
+                          'bytes': sum(MemoryReport.display_nbytes(d) for d in displays)})
+        if view_cache is not None:
+            items.append({'category': 'display', 'name': 'cached views (%d bitmaps)' %len(view_cache.entries),
+                          'bytes': view_cache.nbytes})
+        if session is not None:
+            for name, vecs in [('prepared ICs', session.in_vecs), ('prepared templates', session.map_vecs)]:
+                items.append({'category': 'correlation_vectors', 'name': name + ' (%d)' %len(vecs),
+                              'bytes': vecs.nbytes})
+        if corrs is not None and hasattr(corrs, 'nbytes'):
+            items.append({'category': 'correlations', 'name': repr(corrs), 'bytes': corrs.nbytes})
+        for filepath, ts in (time_series or {}).items():
+            items.append({'category': 'time_series', 'name': os.path.basename(str(filepath)),
+                          'bytes': mm.MemoryManager.array_nbytes(getattr(ts, 'matrix', None))})
+
+        items.sort(key=lambda item: item['bytes'], reverse=True)
+        categories = {}
+        for item in items:
+            categories[item['category']] = categories.get(item['category'], 0) + item['bytes']
+        report = {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                  'total_bytes': sum(categories.values()),
+                  'categories': categories,
+                  'items': items,
+                  'budget_bytes': memory.budget_bytes,
+                  'n_evicted': memory.n_evicted,
+                  'bytes_evicted': memory.bytes_evicted,
+                  'tracemalloc': MemoryReport.top_allocations(trace_limit)}
+        return report
+
+    @staticmethod
+    def figure_nbytes(fig):
+        """Bytes of image arrays drawn on matplotlib figure, plus its render buffer"""
+
+        nbytes = 0
+        for ax in fig.get_axes():
+            for im in ax.get_images():
+                nbytes += mm.MemoryManager.array_nbytes(np.ma.getdata(im.get_array()))
+        width, height = fig.canvas.get_width_height()
+        return nbytes + 4 * width * height
+
+    @staticmethod
+    def display_nbytes(display):
+        """Bytes of image arrays held by nilearn display"""
+
+        nbytes = 0
+        for cut_ax in getattr(display, 'axes', {}).values():
+            for im in cut_ax.ax.get_images():
+                nbytes += mm.MemoryManager.array_nbytes(np.ma.getdata(im.get_array()))
+        return nbytes
+
+    @staticmethod
+    def top_allocations(limit=15):
+        """Largest allocations by source line since tracing started, [] if not tracing"""
+
+        if not tracemalloc.is_tracing(): return []
+        stats = tracemalloc.take_snapshot().statistics('lineno')
+        return [{'where': str(stat.traceback), 'bytes': stat.size, 'count': stat.count}
+                for stat in stats[:limit]]
+
+    @staticmethod
+    def save(report, fname):
+        with open(fname, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    @staticmethod
+    def format_bytes(nbytes):
+        for unit in ['B', 'KB', 'MB']:
+            if abs(nbytes) < 1024: return '%0.1f %s' %(nbytes, unit)
+            nbytes /= 1024.
+        return '%0.2f GB' %nbytes
+
+
+class newMemoryReportWin(QDialog):
+    """Dialog showing memory used by Network Zoo, by category & item,
+    w/ top allocations traced by tracemalloc on request"""
+
+    def __init__(self, get_report, parent=None, directory='.'):
+        super().__init__(parent)
+
+        self.get_report = get_report  # fn. returning MemoryReport dict
+        self.directory = directory
+        self.report = None
+        self.setWindowTitle('Memory Usage')
+        self.resize(640, 520)
+
+        self.label_total = QtWidgets.QLabel(self)
+        self.treeWidget = QtWidgets.QTreeWidget(self)
+        self.treeWidget.setHeaderLabels(['Category / item', 'Memory'])
+        self.treeWidget.setColumnWidth(0, 440)
+        self.textBrowser_trace = QtWidgets.QPlainTextEdit(self)
+        self.textBrowser_trace.setReadOnly(True)
+        self.textBrowser_trace.setMaximumHeight(150)
+        self.pushButton_refresh = QtWidgets.QPushButton('Refresh', self)
+        self.pushButton_trace = QtWidgets.QPushButton('Trace allocations', self)
+        self.pushButton_save = QtWidgets.QPushButton('Save JSON...', self)
+        self.pushButton_close = QtWidgets.QPushButton('Close', self)
+
+        buttons = QtWidgets.QHBoxLayout()
+        for button in [self.pushButton_refresh, self.pushButton_trace,
+                       self.pushButton_save, self.pushButton_close]:
+            buttons.addWidget(button)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.label_total)
+        layout.addWidget(self.treeWidget)
+        layout.addWidget(QtWidgets.QLabel('Top allocations (tracemalloc):', self))
+        layout.addWidget(self.textBrowser_trace)
+        layout.addLayout(buttons)
+
+        self.pushButton_refresh.clicked.connect(self.refresh)
+        self.pushButton_trace.clicked.connect(self.toggle_tracing)
+        self.pushButton_save.clicked.connect(self.save_report)
+        self.pushButton_close.clicked.connect(self.close)
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild report & tree of categories/items"""
+
+        self.report = self.get_report()
+        fmt = MemoryReport.format_bytes
+        message = 'Total: ' + fmt(self.report['total_bytes'])
+        if self.report['budget_bytes']:
+            message += '   (vol. budget: ' + fmt(self.report['budget_bytes'])
+            message += ', %d vols. evicted)' %self.report['n_evicted']
+        self.label_total.setText(message)
+
+        self.treeWidget.clear()
+        for category, nbytes in sorted(self.report['categories'].items(), key=lambda c: -c[1]):
+            parent = QtWidgets.QTreeWidgetItem(self.treeWidget, [category, fmt(nbytes)])
+            for item in self.report['items']:
+                if item['category'] == category:
+                    QtWidgets.QTreeWidgetItem(parent, [item['name'], fmt(item['bytes'])])
+
+        self.pushButton_trace.setText('Stop tracing' if tracemalloc.is_tracing() else 'Trace allocations')
+        if tracemalloc.is_tracing():
+            lines = [fmt(stat['bytes']).rjust(10) + '  ' + stat['where']
+                     for stat in self.report['tracemalloc']]
+            self.textBrowser_trace.setPlainText('\n'.join(lines))
+        else:
+            self.textBrowser_trace.setPlainText('Not tracing. Allocations are listed after tracing starts, '
+                                                'for objects allocated from then on.')
+
+    def toggle_tracing(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        else:
+            tracemalloc.start()
+        self.refresh()
+
+    def save_report(self):
+        fname, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Save Memory Report As:',
+                                                         os.path.join(self.directory, 'memory_report.json'),
+                                                         filter='JSON files (*.json)')
+        if fname:
+            MemoryReport.save(self.report, fname)
@@ -0,0 +1,110 @@
+"""Views rendered offscreen in background thread in Network Zoo, ex. predicted views cached as bitmaps"""
+
+# Python Libraries
+import time, threading
+
+# Qt GUI Libraries
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Mathematical/Plotting Libraries
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+class OffscreenRenderer(QObject):
+    """
+    Views drawn on private matplotlib figures (Agg canvas) in a background thread,
+    w/ bitmaps passed to GUI thread by 'rendered' signal (see zoo_ViewCache.ViewCache.store_bitmap).
+    Jobs are fns. drawing on figure & canvas, returning state kept w/ bitmap (or None to skip view).
+    Jobs run outside GUI thread, so must only read vols. & options prepared by GUI beforehand,
+    see NetworkZooGUI.prepare_vols.
+
+    Worker yields to foreground work as zoo_Prefetcher.ViewPrefetcher does: 'interrupt()' drops queued jobs,
+    & each job waits until GUI has been idle for IDLE_SEC. Job already started is not stopped,
+    but never blocks GUI thread.
+    """
+
+    IDLE_SEC = 0.3
+
+    rendered = pyqtSignal(object, object, object)  # key, RGBA array, state
+
+    def __init__(self):
+        super().__init__()
+
+        self._queue = []         # (key, draw fn., figure size in inches, dpi)
+        self._running = None     # key of job being drawn
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self.last_interaction = 0.
+
+    def submit(self, key, draw, figsize, dpi):
+        """Queue view, unless already queued or being drawn"""
+
+        with self._cond:
+            if (key == self._running) or (key in [job[0] for job in self._queue]): return
+            self._queue.append((key, draw, tuple(figsize), dpi))
+            self._cond.notify()
+        self.start()
+
+    def interrupt(self):
+        """Drop queued jobs & hold off worker, ex. when GUI starts foreground update"""
+
+        with self._cond:
+            self._queue = []
+            self.last_interaction = time.time()
+
+    def start(self):
+        """Start background worker"""
+
+        if (self._thread is not None) and self._thread.is_alive(): return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='zoo_offscreen', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop worker after current job"""
+
+        with self._cond:
+            self._stop = True
+            self._queue = []
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _next(self):
+        """Pop next job once GUI is idle, or None if stopping"""
+
+        with self._cond:
+            while not self._stop:
+                idle = time.time() - self.last_interaction
+                if self._queue and (idle >= self.IDLE_SEC):
+                    job = self._queue.pop(0)
+                    self._running = job[0]
+                    return job
+                self._cond.wait(max(self.IDLE_SEC - idle, 0.05) if self._queue else 1.)
+            return None
+
+    def _run(self):
+        """Worker loop, draws queued views & copies bitmaps"""
+
+        while not self._stop:
+            job = self._next()
+            if job is None: continue
+            key, draw, figsize, dpi = job
+            fig = Figure(figsize=figsize, dpi=dpi)
+            canvas = FigureCanvasAgg(fig)
+            try:
+                state = draw(fig, canvas)
+                rgba = np.array(canvas.buffer_rgba(), dtype=np.uint8, copy=True) if state is not None else None
+            except Exception as e:
+                print('WARNING: could not render view offscreen: ' + str(e))
+                state, rgba = None, None
+            finally:
+                fig.clear()
+                with self._cond:
+                    self._running = None
+            if state is not None:
+                self.rendered.emit(key, rgba, state)
@@ -0,0 +1,183 @@
+"""Background preparation of views likely shown next in Network Zoo, ex. next IC in list"""
+
+# Python Libraries
+import time, threading
+from collections import OrderedDict
+
+# Qt GUI Libraries
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Mathematical/Neuroimaging Libraries
+import numpy as np
+
+# Network Zoo Libraries
+import zoo_CutCoords as cc # cut coords. found w/ numpy on prepared arrays
+
+
+class ViewPrefetcher(QObject):
+    """
+    Cut coords. for views (IC, template, display mode, no. of slices), found from overlap of IC & template.
+    Coords. are kept for views shown in GUI, & found in a background thread for predicted views
+    (ex. next/previous IC w/ current & top-ranked templates), which are then rendered offscreen
+    in another background thread (see zoo_OffscreenRenderer) while current view is shown.
+
+    Worker yields to foreground work: 'interrupt()' drops predicted views not yet started,
+    & each view waits until GUI has been idle for IDLE_SEC.
+    Once predicted views are done, worker continues w/ views queued by 'sweep()', ex. all ICs w/ top-ranked templates,
+    so coords. are known before views are first shown (& saved w/ analysis, see 'export_coords()').
+    Coords. are found by zoo_CutCoords.CutCoordsEngine, which keeps prepared arrays of ICs & template masks.
+    Imgs are read w/ 'get_in_img' & 'get_map_img' fns., which must be safe to call outside GUI thread
+    & return None for vols. not yet loaded (skipped).
+    """
+
+    LAYOUTS = {'ortho': 'ortho', 'tiled': 'ortho', 'axial': 'z', 'coronal': 'y', 'sagittal': 'x'}
+    IDLE_SEC = 0.3
+    MAX_COORDS = 8192  # views w/ cut coords. kept
+
+    coords_ready = pyqtSignal(object)  # view, w/ cut coords. found in background
+
+    def __init__(self, get_in_img=None, get_map_img=None):
+        super().__init__()
+
+        self.get_in_img, self.get_map_img = get_in_img, get_map_img
+        self.coords = OrderedDict()  # view : cut coords., least recently used first
+        self._queue = []             # predicted views waiting for worker
+        self._sweep = []             # views queued by sweep, found after predicted views
+        self.engine = cc.CutCoordsEngine()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self.last_interaction = 0.
+
+    @staticmethod
+    def view(ica_lookup, icn_lookup, display_mode, num_slices):
+        """View key, w/ no. of slices ignored for ortho. displays"""
+
+        if ViewPrefetcher.LAYOUTS.get(display_mode, 'ortho') == 'ortho': num_slices = 1
+        return (ica_lookup, icn_lookup, display_mode, int(num_slices))
+
+    # Cut coords.
+    def get_coords(self, view):
+        """Cut coords. found for view, or None"""
+
+        with self._cond:
+            if view not in self.coords.keys(): return None
+            self.coords.move_to_end(view)
+            coords = self.coords[view]
+        return coords.copy() if isinstance(coords, np.ndarray) else coords
+
+    def set_coords(self, view, coords):
+        with self._cond:
+            self.coords.pop(view, None)
+            self.coords[view] = coords
+            while len(self.coords) > self.MAX_COORDS:
+                self.coords.popitem(last=False)
+
+    def has_coords(self, view):
+        with self._cond:
+            return view in self.coords.keys()
+
+    def discard(self, ica_lookup=None, icn_lookup=None):
+        """Drop coords. for removed ICs/templates, or all coords. if neither is input"""
+
+        with self._cond:
+            for view in list(self.coords.keys()):
+                if ((ica_lookup is None) and (icn_lookup is None)) or \
+                   ((ica_lookup is not None) and (view[0] == ica_lookup)) or \
+                   ((icn_lookup is not None) and (view[1] == icn_lookup)):
+                    self.coords.pop(view)
+            keep = lambda view: ((ica_lookup is not None) or (icn_lookup is not None)) and \
+                                (ica_lookup is None or view[0] != ica_lookup) and \
+                                (icn_lookup is None or view[1] != icn_lookup)
+            self._queue = [view for view in self._queue if keep(view)]
+            self._sweep = [view for view in self._sweep if keep(view)]
+        self.engine.discard(ica_lookup=ica_lookup, icn_lookup=icn_lookup)
+
+    def export_coords(self, ica_lookups=None, icn_lookups=None):
+        """Coords. for views of listed ICs & templates (or all views), ex. to save w/ analysis"""
+
+        with self._cond:
+            return {view: coords for view, coords in self.coords.items()
+                    if ((ica_lookups is None) or (view[0] in ica_lookups)) and
+                       ((icn_lookups is None) or (view[1] is None) or (view[1] in icn_lookups))}
+
+    def import_coords(self, view_coords):
+        """Add coords. found previously, ex. from saved analysis"""
+
+        for view, coords in view_coords.items():
+            self.set_coords(self.view(*view), coords)
+
+    # Predicted views
+    def request(self, views):
+        """Replace predicted views queued for worker, skipping views w/ coords."""
+
+        with self._cond:
+            self._queue = [view for view in views if view not in self.coords.keys()]
+            if self._queue: self._cond.notify()
+        if views: self.start()
+
+    def sweep(self, views):
+        """Replace views queued after predicted views, skipping views w/ coords."""
+
+        with self._cond:
+            self._sweep = [view for view in views if view not in self.coords.keys()]
+            if self._sweep: self._cond.notify()
+        if views: self.start()
+
+    def interrupt(self):
+        """Drop queued views & hold off worker, ex. when GUI starts foreground update"""
+
+        with self._cond:
+            self._queue = []
+            self.last_interaction = time.time()
+
+    def start(self):
+        """Start background worker"""
+
+        if (self._thread is not None) and self._thread.is_alive(): return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='zoo_prefetch', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop worker after current view"""
+
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _next(self):
+        """Pop next predicted (or swept) view once GUI is idle, or None if stopping"""
+
+        with self._cond:
+            while not self._stop:
+                idle = time.time() - self.last_interaction
+                queue = self._queue if self._queue else self._sweep
+                if queue and (idle >= self.IDLE_SEC):
+                    return queue.pop(0)
+                self._cond.wait(max(self.IDLE_SEC - idle, 0.05) if queue else 1.)
+            return None
+
+    def _run(self):
+        """Worker loop, finds cut coords. for predicted & swept views"""
+
+        while not self._stop:
+            view = self._next()
+            if (view is None) or self.has_coords(view): continue
+            ica_lookup, icn_lookup, display_mode, num_slices = view
+            ica_img = self.get_in_img(ica_lookup) if ica_lookup else None
+            map_img = self.get_map_img(icn_lookup) if icn_lookup else None
+            if (ica_lookup and ica_img is None) or (icn_lookup and map_img is None):
+                continue  # ...vol. not loaded yet
+            try:
+                coords = self.engine.find(ica_img, map_img, display_mode, num_slices,
+                                          ica_lookup=ica_lookup, icn_lookup=icn_lookup)
+            except Exception as e:
+                print('WARNING: could not find slices for ' + str(ica_lookup) + ' & ' + str(icn_lookup) + ': ' + str(e))
+                continue
+            if coords is not None:
+                self.set_coords(view, coords)
+                self.coords_ready.emit(view)
@@ -0,0 +1,143 @@
+"""Scheduling of display updates for Network Zoo, coalescing redundant redraws"""
+
+# Python Libraries
+import time
+from collections import deque
+
+# Qt GUI Libraries
+from PyQt5.QtCore import QObject, QTimer, QThread, pyqtSignal
+
+
+class RenderScheduler(QObject):
+    """
+    Debounced display updates, run on GUI thread:
+      requests arriving w/n debounce window of first request are coalesced into single render,
+      ex. several signals connected to display updates, fired by single click,
+      renders are run as stages (ex. spatial maps, then time series), w/ event loop between stages,
+      so clicks are handled during render & stages made stale by newer requests or changed selection are dropped.
+    Render fn. returns generator over stages (see NetworkZooGUI.render_stages),
+    selection fn. returns what is shown (ex. current IC & template), compared before each stage.
+    Latency from first request to last stage & time spent rendering are kept for each render,
+    & sent w/ 'rendered'.
+    Requests are ignored while suspended, ex. while output thread draws each mapping on display.
+    """
+
+    DEBOUNCE_MS = 30
+    MAX_HISTORY = 100
+
+    rendered = pyqtSignal(float, float)  # latency since first request, render time (sec.)
+
+    def __init__(self, render, get_selection=None, debounce_ms=None):
+        super().__init__()
+
+        self.render = render
+        self.get_selection = get_selection if get_selection else (lambda: None)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(debounce_ms if debounce_ms is not None else self.DEBOUNCE_MS))
+        self.timer.timeout.connect(self.start_render)
+        self.timer_stage = QTimer(self)  # next stage of render in flight, after pending events
+        self.timer_stage.setSingleShot(True)
+        self.timer_stage.setInterval(0)
+        self.timer_stage.timeout.connect(self.run_stage)
+
+        self._stages = None      # generator of render in flight
+        self._selection = None   # selection when render started
+        self._requested = None   # time of first request coalesced into render
+        self._render_time = 0.
+        self.suspended = False   # requests ignored, see 'suspend()'
+        self.history = deque(maxlen=self.MAX_HISTORY)  # (latency, render time) of completed renders
+        self.n_requests, self.n_renders, self.n_coalesced, self.n_cancelled = 0, 0, 0, 0
+
+    def on_gui_thread(self):
+        return QThread.currentThread() is self.thread()
+
+    def request(self, *args):
+        """Queue render, coalesced w/ other requests until debounce window ends.
+        Args. sent by Qt signals are ignored. Supersedes render in flight"""
+
+        self.n_requests += 1
+        if self.suspended: return
+        if self.timer.isActive():
+            self.n_coalesced += 1
+            return
+        self.cancel(keep_pending=True)
+        self._requested = time.perf_counter()
+        self.timer.start()
+
+    def cancel(self, keep_pending=False):
+        """Drop render in flight, & queued request unless keep_pending"""
+
+        if not self.on_gui_thread(): return  # ...timers belong to GUI thread
+        if self._stages is not None:
+            if not self._stages.gi_running: # ...else closed once current stage returns, see 'run_stage()'
+                self._stages.close()
+            self._stages = None
+            self.timer_stage.stop()
+            self.n_cancelled += 1
+        if not keep_pending:
+            self.timer.stop()
+            self._requested = None
+
+    def suspend(self):
+        """Drop render in flight & ignore requests until 'resume()', 
+        ex. while display is drawn w/ NetworkZooGUI.update_plots from another thread"""
+
+        self.cancel()
+        self.suspended = True
+
+    def resume(self):
+        self.suspended = False
+
+    def is_busy(self):
+        """If render is queued or in flight"""
+        return self.timer.isActive() or (self._stages is not None)
+
+    def start_render(self):
+        self._stages = self.render()
+        self._selection = self.get_selection()
+        self._render_time = 0.
+        self.n_renders += 1
+        self.run_stage()
+
+    def run_stage(self):
+        """Run next stage of render in flight, unless selection changed since render started"""
+
+        stages = self._stages
+        if stages is None: return
+        if self.get_selection() != self._selection: # ...stale, render new selection instead
+            self.cancel(keep_pending=True)
+            if not self.timer.isActive(): self.request()
+            return
+        t0 = time.perf_counter()
+        try:
+            next(stages)
+            done = False
+        except StopIteration:
+            done = True
+        except Exception:
+            self._stages = None
+            raise
+        finally:
+            self._render_time += time.perf_counter() - t0
+        if self._stages is not stages: # ...cancelled during stage
+            if not done: stages.close()
+        elif done:
+            self._stages = None
+            self.finish_render()
+        else:
+            self.timer_stage.start()
+
+    def finish_render(self):
+        latency = time.perf_counter() - self._requested if self._requested is not None else self._render_time
+        self._requested = None
+        self.history.append((latency, self._render_time))
+        self.rendered.emit(latency, self._render_time)
+
+    def summary(self):
+        """Counts & median latency (sec.) of recent renders"""
+
+        latencies = [latency for latency, _ in self.history]
+        return {'n_requests': self.n_requests, 'n_renders': self.n_renders,
+                'n_coalesced': self.n_coalesced, 'n_cancelled': self.n_cancelled,
+                'median_latency': float(sorted(latencies)[len(latencies) // 2]) if latencies else None}
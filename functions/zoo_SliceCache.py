@@ -0,0 +1,202 @@
+"""Vols. prepared for display in Network Zoo, w/ slices stacked by axis & multi-resolution anatomical underlay"""
+
+# Python Libraries
+import weakref
+from functools import partial
+
+# Mathematical Libraries
+import numpy as np
+from nibabel.nifti1 import Nifti1Image
+from nilearn.image import reorder_img
+from nilearn.image.resampling import get_bounds
+
+# Internal imports
+import zoo_MemoryManager as mm  # memory budget for voxel data, w/ LRU eviction
+import zoo_ContourPaths as cp   # template outlines traced once per slice
+
+
+class VolumeSlices(object):
+    """
+    Vol. prepared for display as nilearn does before slicing (reoriented, non-finite values zeroed),
+    w/ slices along each axis stacked contiguously on first use.
+    Slices match nilearn cuts (see nilearn CutAxes.transform_to_2d), so moving a cut is array indexing.
+    Outlines of vol. shown as template are traced on first use & kept w/ slices, see 'outlines()'.
+    """
+
+    AXES = {'x': 0, 'y': 1, 'z': 2}
+
+    def __init__(self, img):
+        super().__init__()
+
+        source = img.dataobj
+        data = np.asanyarray(source)
+        binary = (data.dtype == bool) or (np.unique(data[::7, ::7, ::7]).size <= 2)
+        img = reorder_img(img, resample='nearest' if binary else 'continuous')
+        data = np.asanyarray(img.dataobj)
+        if data.ndim > 3:
+            data = data.reshape(data.shape[:3])
+        if not np.isfinite(data).all():
+            data = np.nan_to_num(data, nan=0, posinf=0, neginf=0)
+        self.data, self.affine = data, img.affine
+        self.shares_data = isinstance(source, np.ndarray) and np.shares_memory(data, source)
+        self.inv_affine = np.linalg.inv(self.affine)
+        self.bounds = get_bounds(data.shape, self.affine)
+        self.stacks = {}  # direction : slices, indexed as stack[slice index]
+        self.contours = None  # zoo_ContourPaths.ContourPaths, if vol. is outlined
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory, excl. data shared w/ source vol."""
+
+        nbytes = 0 if self.shares_data else mm.MemoryManager.array_nbytes(self.data)
+        nbytes += self.contours.nbytes if self.contours is not None else 0
+        return nbytes + sum(stack.nbytes for stack in self.stacks.values())
+
+    def index(self, direction, coord):
+        """Index of slice at world coord., rounded as in nilearn, raises IndexError if outside vol."""
+
+        axis = self.AXES[direction]
+        point = np.zeros(3)
+        point[axis] = coord
+        index = int(np.round(self.inv_affine[axis, :3] @ point + self.inv_affine[axis, 3]))
+        if not (0 <= index < self.data.shape[axis]):
+            raise IndexError('%s cut at %s is outside of vol.' %(direction, coord))
+        return index
+
+    def stack(self, direction):
+        """All slices along axis, each rotated for display"""
+
+        if direction not in self.stacks.keys():
+            axis = self.AXES[direction]
+            rotated = np.rot90(self.data, axes=[a for a in range(3) if a != axis])
+            self.stacks[direction] = np.ascontiguousarray(np.moveaxis(rotated, axis, 0))
+        return self.stacks[direction]
+
+    def slice(self, direction, coord):
+        """2D slice at world coord., raises IndexError if outside vol."""
+        return self.stack(direction)[self.index(direction, coord)]
+
+    def outlines(self):
+        """Contour paths of vol., traced per slice as cuts are drawn"""
+
+        if self.contours is None:
+            self.contours = cp.ContourPaths(self)
+        return self.contours
+
+
+class UnderlayPyramid(object):
+    """
+    Anatomical underlay at decreasing resolution, halving voxel count along each axis per level.
+    Levels are averaged from previous level on first use, & coarsest level w/ at least one voxel
+    per display pixel is used for on-screen display.
+    """
+
+    def __init__(self, img, max_levels=3, min_size=64, count_source=True):
+        super().__init__()
+
+        self.levels = [img]   # nifti imgs, full resolution first
+        self.count_source = count_source  # False if full resolution vol. is tracked elsewhere
+        self.slices = {}      # level : VolumeSlices
+        self.max_levels = max_levels
+        self.min_size = min_size  # smallest vol. dimension allowed for coarser levels
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory by downsampled levels & prepared slices"""
+
+        levels = self.levels if self.count_source else self.levels[1:]
+        nbytes = sum(mm.MemoryManager.img_nbytes(img) for img in levels)
+        return nbytes + sum(vol.nbytes for vol in self.slices.values())
+
+    def shape(self, level):
+        return tuple(int(np.ceil(s / 2**level)) for s in self.levels[0].shape[:3])
+
+    def level_for(self, pixels=None):
+        """Coarsest level w/ at least as many voxels as pixels across display, full resolution if None"""
+
+        level = 0
+        if pixels:
+            while ((level + 1 < self.max_levels) and
+                   (min(self.shape(level + 1)) >= self.min_size) and
+                   (max(self.shape(level + 1)) >= pixels)):
+                level += 1
+        return level
+
+    def get(self, level):
+        """Nifti img & prepared slices for level"""
+
+        while len(self.levels) <= level:
+            self.levels.append(self.downsample(self.levels[-1]))
+        if level not in self.slices.keys():
+            self.slices[level] = VolumeSlices(self.levels[level])
+        return self.levels[level], self.slices[level]
+
+    @staticmethod
+    def downsample(img, factor=2):
+        """Average blocks of factor^3 voxels, padding edges w/ zeros"""
+
+        data = np.asanyarray(img.dataobj, dtype=np.float32)
+        if data.ndim > 3:
+            data = data.reshape(data.shape[:3])
+        data = np.pad(data, [(0, (-s) % factor) for s in data.shape])
+        n = [s // factor for s in data.shape]
+        data = data.reshape(n[0], factor, n[1], factor, n[2], factor).mean(axis=(1, 3, 5))
+        scale = np.diag([factor, factor, factor, 1.])
+        scale[:3, 3] = (factor - 1) / 2.  # ...new voxel centered on block
+        return Nifti1Image(data, img.affine @ scale)
+
+
+class SliceCache(object):
+    """
+    Prepared vols. & underlay pyramids for display, by list item (ex. ('ica', lookup)) or underlay file.
+    Entries are rebuilt if vol. changes (ex. after downsampling to display reference),
+    & registered w/ memory manager, which drops least recently used entries when over budget.
+    """
+
+    def __init__(self, memory=None):
+        super().__init__()
+
+        self.memory = memory  # zoo_MemoryManager.MemoryManager, or None to keep all
+        self.vols = {}        # key : (weak ref. to source img, VolumeSlices)
+        self.pyramids = {}    # underlay file : UnderlayPyramid
+
+    def get(self, key, img):
+        """Prepared slices for img shown as list item key"""
+
+        if img is None: return None
+        entry = self.vols.get(key)
+        if (entry is None) or (entry[0]() is not img):
+            entry = (weakref.ref(img), VolumeSlices(img))
+            self.vols[key] = entry
+        self.track(key, entry[1])
+        return entry[1]
+
+    def has_underlay(self, fname):
+        return fname in self.pyramids.keys()
+
+    def get_underlay(self, fname, img=None, pixels=None, shared=False):
+        """Underlay img & prepared slices, at resolution matching pixels across display.
+        img:    full resolution vol., needed only if not cached for fname
+        shared: if img is also kept elsewhere, ex. as default sMRI vol."""
+
+        if fname not in self.pyramids.keys():
+            if img is None: return None, None
+            self.pyramids[fname] = UnderlayPyramid(img, count_source=not shared)
+        pyramid = self.pyramids[fname]
+        self.track(fname, pyramid)
+        return pyramid.get(pyramid.level_for(pixels))
+
+    def track(self, key, item):
+        if self.memory is None: return
+        name = ('%s: %s' %key) if isinstance(key, tuple) else str(key)
+        self.memory.touch(('slice_cache', name), size=lambda: item.nbytes,
+                          evict=partial(self.discard, key), category='slice_cache')
+
+    def discard(self, key):
+        self.vols.pop(key, None)
+        self.pyramids.pop(key, None)
+
+    def clear(self):
+        if self.memory is not None:
+            self.memory.forget([key for key in self.memory.entries.keys() if key[0] == 'slice_cache'])
+        self.vols, self.pyramids = {}, {}
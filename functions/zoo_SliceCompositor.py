@@ -0,0 +1,197 @@
+"""Mosaics of slices for Network Zoo displays, composited as RGBA arrays w/o nilearn plotting"""
+
+# Mathematical Libraries
+import numpy as np
+import matplotlib as mpl
+from matplotlib.colors import to_rgba, Normalize
+from nilearn.plotting.cm import cold_hot
+
+
+class SliceCompositor(object):
+    """
+    Draws rows of axial, coronal or sagittal slices as single RGBA image, w/ vectorized numpy:
+      anatomical underlay & stat. map are mapped through precomputed colormap lookup tables (LUTs),
+      stat. map is masked w/n threshold of zero & sampled onto underlay grid by nearest voxel,
+      template filling & outline (& outlines of other templates, if overlaid) are alpha-blended on top.
+    Colors follow nilearn's plot_stat_map (dimmed gray underlay on black, 'cold_hot' symmetric stat. map),
+    but slices are drawn in a single image instead of a matplotlib axes per cut.
+    Vols. are prepared slices from zoo_SliceCache, so cuts are array indexing.
+    """
+
+    H_V_AXES = {'x': (1, 2), 'y': (0, 2), 'z': (0, 1)} # vol. axes shown horizontally & vertically in cut
+    GAP = 2  # pixels between tiles
+
+    def __init__(self, bg_cmap='gray', stat_cmap=cold_hot, n_colors=256, dim=0.8):
+        super().__init__()
+
+        self.n_colors = n_colors
+        self.bg_cmap = mpl.colormaps[bg_cmap] if isinstance(bg_cmap, str) else bg_cmap
+        self.stat_cmap = mpl.colormaps[stat_cmap] if isinstance(stat_cmap, str) else stat_cmap
+        self.bg_lut = self.lut(self.bg_cmap, n_colors)
+        self.stat_lut = self.lut(self.stat_cmap, n_colors)
+        self.dim = dim   # dimming of underlay, as nilearn on black background
+
+    @staticmethod
+    def lut(cmap, n_colors=256):
+        """RGBA lookup table for colormap, as uint8 (n_colors x 4)"""
+        return cmap(np.linspace(0, 1, n_colors), bytes=True)
+
+    def apply_lut(self, values, lut, vmin, vmax):
+        """Map values to RGBA by nearest LUT entry"""
+
+        scale = (len(lut) - 1) / (vmax - vmin) if vmax > vmin else 0.
+        inds = np.clip(np.rint((values - vmin) * scale), 0, len(lut) - 1).astype(np.intp)
+        return lut[inds]
+
+    def bg_range(self, bg):
+        """Color range of underlay, dimmed as nilearn does for black backgrounds"""
+
+        vmin, vmax = float(np.min(bg.data)), float(np.max(bg.data))
+        vmean, ptp = 0.5 * (vmin + vmax), 0.5 * (vmax - vmin)
+        return vmin, vmean + (1 + self.dim) * ptp
+
+    @staticmethod
+    def resample_inds(src, dst, direction):
+        """Indices into rows & cols. of src slices, for each row & col. of dst slices, -1 if outside src"""
+
+        inds = []
+        for axis, flip in zip(SliceCompositor.H_V_AXES[direction][::-1], [True, False]): # ...rows, then cols.
+            n_dst, n_src = dst.data.shape[axis], src.data.shape[axis]
+            world = dst.affine[axis, axis] * np.arange(n_dst) + dst.affine[axis, 3]
+            ind = np.rint((world - src.affine[axis, 3]) / src.affine[axis, axis]).astype(np.intp)
+            ind[(ind < 0) | (ind >= n_src)] = -1
+            if flip: # ...slices are rotated, w/ vertical axis reversed
+                ind = np.where(ind >= 0, n_src - 1 - ind, -1)[::-1]
+            inds.append(ind)
+        return inds
+
+    @staticmethod
+    def sample(vol, direction, coord, inds):
+        """Slice of vol. sampled at indices from 'resample_inds()', NaN outside vol."""
+
+        rows, cols = inds
+        try:
+            cut = vol.slice(direction, coord)
+        except IndexError:
+            return np.full((len(rows), len(cols)), np.nan)
+        tile = cut[np.ix_(np.maximum(rows, 0), np.maximum(cols, 0))].astype(np.float32)
+        tile[rows < 0, :] = np.nan
+        tile[:, cols < 0] = np.nan
+        return tile
+
+    @staticmethod
+    def outline(mask):
+        """Edge pixels of binary mask"""
+
+        edge = np.zeros_like(mask)
+        interior = mask[1:-1, 1:-1] & mask[:-2, 1:-1] & mask[2:, 1:-1] & mask[1:-1, :-2] & mask[1:-1, 2:]
+        edge[1:-1, 1:-1] = mask[1:-1, 1:-1] & ~interior
+        edge[[0, -1], :], edge[:, [0, -1]] = mask[[0, -1], :], mask[:, [0, -1]]
+        return edge
+
+    @staticmethod
+    def blend(rgba, where, color, alpha):
+        """Alpha-blend color over RGBA pixels in place"""
+
+        color = np.asarray(color[:3], dtype=np.float32) * 255
+        rgba[where, :3] = (alpha * color + (1 - alpha) * rgba[where, :3]).astype(np.uint8)
+
+    def tile(self, direction, coord, bg=None, stat=None, contour=None, ranges=None,
+             threshold=1e-06, contour_opts=None, overlays=None):
+        """RGBA image of single cut, on grid of underlay (or stat. map if no underlay).
+        overlays: [(vol., color)] of other templates, outlined w/o filling"""
+
+        grid = bg if bg is not None else stat
+        if bg is not None:
+            try:
+                bg_2d = bg.slice(direction, coord).astype(np.float32)
+            except IndexError:
+                bg_2d = None
+        h, v = self.H_V_AXES[direction]
+        shape = (grid.data.shape[v], grid.data.shape[h])
+        rgba = np.zeros(shape + (4,), dtype=np.uint8)
+        rgba[..., 3] = 255   # black background
+        if (bg is not None) and (bg_2d is not None):
+            visible = np.abs(bg_2d) > 1e-06
+            rgba[visible] = self.apply_lut(bg_2d[visible], self.bg_lut, *ranges['bg'])
+
+        if stat is not None:
+            stat_2d = self.sample(stat, direction, coord, self.resample_inds(stat, grid, direction))
+            visible = np.abs(np.nan_to_num(stat_2d)) > threshold
+            rgba[visible] = self.apply_lut(stat_2d[visible], self.stat_lut, *ranges['stat'])
+
+        if contour is not None:
+            opts = contour_opts if contour_opts else {}
+            templ_2d = self.sample(contour, direction, coord, self.resample_inds(contour, grid, direction))
+            mask = np.nan_to_num(templ_2d) > opts.get('levels', 0.5)
+            color, alpha = to_rgba(opts.get('colors', 'w')), opts.get('alpha', 0.6)
+            if opts.get('filled', False):
+                self.blend(rgba, mask, color, alpha)
+            self.blend(rgba, self.outline(mask), color, max(alpha, 0.8))
+        for overlay, overlay_color in (overlays if overlays else []):
+            opts = contour_opts if contour_opts else {}
+            templ_2d = self.sample(overlay, direction, coord, self.resample_inds(overlay, grid, direction))
+            mask = np.nan_to_num(templ_2d) > opts.get('levels', 0.5)
+            self.blend(rgba, self.outline(mask), to_rgba(overlay_color), max(opts.get('alpha', 0.6), 0.8))
+        return rgba
+
+    def mosaic(self, direction, coords_byRow, bg=None, stat=None, contour=None,
+               threshold=1e-06, vmax=None, contour_opts=None, overlays=None):
+        """Tiles of all cuts as single RGBA image, w/ rows of coords. from top to bottom.
+        Returns mosaic, list of (top, left, shape, coord) for each tile (ex. to label cuts), & stat. map range"""
+
+        ranges = {}
+        if bg is not None:
+            ranges['bg'] = self.bg_range(bg)
+        if stat is not None:
+            vmax = vmax if vmax else float(np.max(np.abs(stat.data)))
+            ranges['stat'] = (-vmax, vmax)
+        threshold = threshold if threshold else 1e-06
+
+        rows, tiles = [], []
+        for r, row_coords in enumerate(coords_byRow):
+            row, offset = [], 0
+            for coord in np.atleast_1d(row_coords):
+                t = self.tile(direction, coord, bg=bg, stat=stat, contour=contour, ranges=ranges,
+                              threshold=threshold, contour_opts=contour_opts, overlays=overlays)
+                row.append(t)
+                tiles.append((r, offset, t.shape, float(coord)))
+                offset += t.shape[1] + self.GAP
+            rows.append(row)
+
+        # Concatenate tiles w/ gaps, padding rows to same width
+        height = max(t.shape[0] for row in rows for t in row)
+        width = max(sum(t.shape[1] for t in row) + self.GAP * (len(row) - 1) for row in rows)
+        mosaic = np.zeros((len(rows) * (height + self.GAP) - self.GAP, width, 4), dtype=np.uint8)
+        mosaic[..., 3] = 255
+        for r, row in enumerate(rows):
+            y, x = r * (height + self.GAP), 0
+            for t in row:
+                mosaic[y:y + t.shape[0], x:x + t.shape[1]] = t
+                x += t.shape[1] + self.GAP
+        tiles = [(r * (height + self.GAP), offset, shape, coord) for r, offset, shape, coord in tiles]
+        return mosaic, tiles, ranges.get('stat')
+
+    def draw(self, ax, direction, coords_byRow, show_LR_annotations=True, show_colorbar=True,
+             text_size=12, **kwargs):
+        """Draw mosaic on matplotlib axes, w/ cut coords., L/R labels & colorbar as nilearn does"""
+
+        mosaic, tiles, stat_range = self.mosaic(direction, coords_byRow, **kwargs)
+        ax.imshow(mosaic, interpolation='nearest')
+        ax.set_adjustable('datalim')  # ...fill axes w/ black background, as nilearn does
+        ax.set_facecolor('k')
+        ax.set_xticks([])
+        ax.set_yticks([])
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        for y, x, shape, coord in tiles:
+            ax.text(x + shape[1] - 2, y + shape[0] - 2, '%s=%i' %(direction, coord), color='w',
+                    size=text_size * 0.75, horizontalalignment='right', verticalalignment='bottom')
+            if show_LR_annotations and direction in 'yz':
+                ax.text(x + 2, y + 2, 'L', color='w', size=text_size * 0.75, va='top', ha='left')
+                ax.text(x + shape[1] - 2, y + 2, 'R', color='w', size=text_size * 0.75, va='top', ha='right')
+        if show_colorbar and stat_range:
+            sm = mpl.cm.ScalarMappable(norm=Normalize(*stat_range), cmap=self.stat_cmap)
+            cbar = ax.figure.colorbar(sm, ax=ax, fraction=0.02, pad=0.01)
+            cbar.ax.tick_params(labelsize=text_size * 0.75)
+        return mosaic
@@ -0,0 +1,233 @@
+"""Fast navigation of spatial map display for Network Zoo, moving slices of plots already drawn"""
+
+# Python Libraries
+import re
+
+# Mathematical Libraries
+import numpy as np
+
+# Internal imports
+import zoo_ContourPaths as cp  # template outlines traced once per slice
+
+
+class SliceRenderer(object):
+    """
+    Moves cuts of ortho. display drawn by nilearn (see NetworkZooGUI.plot_vols), w/o rebuilding plot.
+    Image artists drawn by nilearn are kept & only their slices are swapped w/ 'set_data()',
+    template outlines are redrawn from cached paths for cuts that moved, & crosshairs/coordinate labels are shifted in place.
+    Once attached to canvas w/ 'animate()', crosshairs, coordinate labels & L/R annotations are animated artists,
+    blitted over saved background: cuts whose slices changed are redrawn alone, & moves w/n same slices
+    only blit crosshairs & labels (see 'refresh()'). L/R annotations do not move, so are kept in background.
+    Vols. are prepared slices (zoo_SliceCache.VolumeSlices) of same vols. passed to nilearn:
+      bg:       anatomical underlay, drawn first
+      stat:     IC or template, drawn over underlay & masked w/n threshold of zero
+      outlines: ICN templates outlined, as [(zoo_ContourPaths.ContourPaths, opts as passed to 'add_contours()')]
+    Display must be rebuilt when IC, template or display options change, see 'key'.
+    """
+
+    DIRECTIONS = 'xyz'
+    CROSS_LINES = {'x': ('y', 'z'), 'y': ('x', 'z'), 'z': ('x', 'y')} # coords. shown by (vertical, horizontal) lines
+
+    def __init__(self, display, key=None, bg=None, stat=None, threshold=None,
+                 outlines=None):
+        super().__init__()
+
+        self.display = display
+        self.key = key   # ~(IC, template, layout, options) drawn
+        self.cut_axes = {direction: cut_ax for direction, cut_ax in display.axes.items()
+                         if direction in self.DIRECTIONS}
+        self.coords = dict(zip(self.DIRECTIONS, [float(c) for c in display.cut_coords]))
+
+        self.layers = []  # [{'vol', 'threshold', 'images': {direction: AxesImage}}]
+        for vol, layer_threshold in [(bg, 1e-06), (stat, threshold)]: # ...nilearn's default for underlay
+            if vol is not None:
+                self.layers.append({'vol': vol, 'threshold': layer_threshold})
+        self.outlines = list(outlines) if outlines else []
+        self.indices = {}    # direction : slice index of each vol. shown on cut
+        self.changed = []    # cuts w/ slices changed by last move, not yet shown on canvas
+        self.canvas = None   # canvas blitted, see 'animate()'
+        self.background, self.background_bounds = None, None
+        self._cid = None
+
+        # Find artists drawn by nilearn, for each cut
+        self.valid = len(self.cut_axes) == 3
+        self.lines, self.labels = {}, {}
+        for direction, cut_ax in self.cut_axes.items():
+            images = [im for im in cut_ax.ax.get_images() if im.get_zorder() >= 0] # ...skip black backdrop
+            if len(images) != len(self.layers): # ...slice outside of vol., not drawn
+                self.valid = False
+                continue
+            for layer, im in zip(self.layers, images):
+                layer.setdefault('images', {})[direction] = im
+            lines = cut_ax.ax.get_lines()
+            if len(lines) == 2:
+                self.lines[direction] = lines
+            self.labels[direction] = [t for t in cut_ax.ax.texts
+                                      if re.match('^%s=' %direction, t.get_text())]
+            try:
+                self.indices[direction] = self.slice_indices(direction, self.coords[direction])
+            except IndexError: # ...outline outside of template
+                self.valid = False
+        self.annotations = [t for cut_ax in self.cut_axes.values() for t in cut_ax.ax.texts
+                            if t.get_text() in ['L', 'R']]
+        if self.valid: # ...stack slices now, so first move is as fast as others
+            for vol in self.vols:
+                for direction in self.cut_axes.keys():
+                    vol.stack(direction)
+
+    @property
+    def vols(self):
+        return [layer['vol'] for layer in self.layers] + [contours.vol for contours, _ in self.outlines]
+
+    @property
+    def moving(self):
+        """Crosshairs & coordinate labels, redrawn over background for each move"""
+
+        artists = [line for lines in self.lines.values() for line in lines]
+        return artists + [t for labels in self.labels.values() for t in labels]
+
+    @property
+    def animated(self):
+        """Artists excl. from figure draws while blitting, incl. L/R annotations (drawn into background once)"""
+        return self.moving + self.annotations
+
+    def slice_indices(self, direction, coord):
+        """Index of slice shown on cut for each vol., raises IndexError if cut is outside of any vol."""
+
+        indices = []
+        for vol in self.vols:
+            index = vol.index(direction, coord)
+            vol.stack(direction)[index]
+            indices.append(index)
+        return tuple(indices)
+
+    def direction_of(self, ax):
+        """Direction of cut shown in matplotlib axes, ex. for clicks on display. None if not a cut"""
+
+        for direction, cut_ax in self.cut_axes.items():
+            if cut_ax.ax is ax: return direction
+        return None
+
+    def set_coords(self, coords):
+        """Move cuts to coords (x,y,z), returns False if display needs to be rebuilt instead.
+        Only cuts moved to other slices are updated, see 'changed'"""
+
+        if not self.valid: return False
+        coords = dict(zip(self.DIRECTIONS, [float(c) for c in coords]))
+        moved = [d for d in self.DIRECTIONS if coords[d] != self.coords[d]]
+        indices = {}
+        for direction in moved:
+            try:
+                indices[direction] = self.slice_indices(direction, coords[direction])
+            except IndexError: # ...cut outside vol.
+                return False
+
+        for direction in moved:
+            self.cut_axes[direction].coord = coords[direction]
+            if indices[direction] == self.indices[direction]: continue # ...same slices, only crosshairs move
+            self.indices[direction] = indices[direction]
+            for layer, index in zip(self.layers, indices[direction]):
+                im = layer['images'][direction]
+                data_2d = layer['vol'].stack(direction)[index]
+                im.set_data(self.mask_slice(data_2d, layer['threshold'], im.norm.vmin, im.norm.vmax))
+            if self.outlines:
+                self.draw_contours(direction)
+            if direction not in self.changed:
+                self.changed.append(direction)
+        self.coords = coords
+        self.display.cut_coords = tuple(coords[d] for d in self.DIRECTIONS)
+        self.move_crosshairs()
+        return True
+
+    @staticmethod
+    def mask_slice(data_2d, threshold, vmin=None, vmax=None):
+        """Mask values w/n threshold of zero, or outside color range, as nilearn does"""
+
+        if threshold is None: return data_2d
+        data_2d = np.ma.masked_where(np.abs(data_2d) <= threshold, data_2d, copy=False)
+        if (vmin is not None) and (vmin >= -threshold):
+            data_2d = np.ma.masked_where(data_2d < vmin, data_2d, copy=False)
+        if (vmax is not None) and (vmax <= threshold):
+            data_2d = np.ma.masked_where(data_2d > vmax, data_2d, copy=False)
+        return data_2d
+
+    def draw_contours(self, direction):
+        """Redraw template outlines on single cut, from paths traced once per slice"""
+
+        cut_ax = self.cut_axes[direction]
+        for collection in list(cut_ax.ax.collections):
+            collection.remove()
+        cp.ContourPaths.draw(cut_ax, self.outlines, add_bounds=False) # ...axes limits kept from first draw
+
+    def move_crosshairs(self):
+        """Shift crosshairs & coordinate labels to current cuts"""
+
+        for direction, (vline, hline) in self.lines.items():
+            v, h = self.CROSS_LINES[direction]
+            vline.set_xdata([self.coords[v], self.coords[v]])
+            hline.set_ydata([self.coords[h], self.coords[h]])
+        for direction, labels in self.labels.items():
+            for label in labels:
+                label.set_text('%s=%i' %(direction, self.coords[direction]))
+
+    # Blitting
+    def animate(self, canvas):
+        """Draw crosshairs, coordinate labels & L/R annotations as animated artists on canvas,
+        w/ background saved each time canvas is drawn. Not needed for offscreen figures"""
+
+        if not getattr(canvas, 'supports_blit', False): return
+        self.canvas = canvas
+        for artist in self.animated:
+            artist.set_animated(True)
+        self._cid = canvas.mpl_connect('draw_event', self.on_draw)
+
+    def disconnect(self):
+        """Stop blitting, ex. when display is cleared"""
+
+        if self.canvas is not None:
+            self.canvas.mpl_disconnect(self._cid)
+            for artist in self.animated:
+                artist.set_animated(False)
+        self.canvas, self.background, self._cid = None, None, None
+
+    def on_draw(self, event):
+        """Save background after full redraw, then draw animated artists over it"""
+
+        if self.canvas.is_saving(): return # ...animated artists are drawn w/ figure when saving
+        fig = self.canvas.figure
+        for annotation in self.annotations:
+            annotation.draw(event.renderer)
+        self.background = self.canvas.copy_from_bbox(fig.bbox)
+        self.background_bounds = tuple(fig.bbox.bounds)
+        self.changed = []
+        self.draw_animated(event.renderer)
+
+    def draw_animated(self, renderer):
+        for artist in self.moving:
+            artist.draw(renderer)
+
+    def blit(self):
+        """Redraw changed cuts over saved background & blit crosshairs, returns False if canvas needs full redraw"""
+
+        if (self.canvas is None) or (self.background is None): return False
+        fig = self.canvas.figure
+        if tuple(fig.bbox.bounds) != self.background_bounds: return False # ...resized, or drawn w/ other dpi
+        renderer = self.canvas.get_renderer()
+        self.canvas.restore_region(self.background)
+        if self.changed:
+            for direction in self.changed:
+                ax = self.cut_axes[direction].ax
+                ax.draw(renderer)
+                for annotation in [t for t in self.annotations if t.axes is ax]:
+                    annotation.draw(renderer)
+            self.background = self.canvas.copy_from_bbox(fig.bbox)
+            self.changed = []
+        self.draw_animated(renderer)
+        self.canvas.blit(fig.bbox)
+        return True
+
+    def refresh(self):
+        """Show moved cuts on canvas, by blitting if animated, or full redraw otherwise"""
+
+        if not self.blit():
+            self.display.frame_axes.figure.canvas.draw_idle()
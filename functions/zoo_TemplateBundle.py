@@ -0,0 +1,329 @@
+"""Precompiled bundles of ICN & noise templates for Network Zoo"""
+
+# Python Libraries
+import os, sys, re, csv, json, glob, time, shutil, getopt, warnings
+
+# Mathematical/Neuroimaging Libraries
+import numpy as np
+import nibabel as nib
+from nilearn import image
+
+# Internal imports
+import zoo_VolumeCache as vc  # decompressed, memory-mapped copies of .nii.gz files
+import zoo_FileLoader as fl   # atlas checks, as used for list items
+import zoo_Fingerprints as fp # content hashes of vols., to match bundled & loose templates
+
+
+FORMAT_VERSION = 1
+SEARCH_PATTERN = "([a-zA-Z0-9_\\-\\.]+)(\\.nii\\.gz|\\.nii)$"  # as in config.json for ICNs & noise
+RESAMPLING_TOL = 1e-5  # values below this fraction of template max. are interpolation ringing, set to 0
+
+# Standard MNI152 grids (FSL conventions), as (shape, affine)
+MNI_GRIDS = {2: ((91, 109, 91), [[-2., 0., 0., 90.], [0., 2., 0., -126.],
+                                 [0., 0., 2., -72.], [0., 0., 0., 1.]]),
+             3: ((61, 73, 61),  [[-3., 0., 0., 90.], [0., 3., 0., -126.],
+                                 [0., 0., 3., -72.], [0., 0., 0., 1.]])}
+
+
+class TemplateBundle(object):
+    """
+    Templates already resampled to a standard MNI grid, stored in one directory:
+      manifest.json:  names, labels, source files & vol. indices, fingerprints, grid
+      templates.npy:  float32 matrix (templates x voxels w/n shared mask), memory-mapped when loaded
+      index.npz:      mask_index (flat grid indices of shared mask, i.e. voxels non-zero in any template),
+                      & per-template stats over full grid: mean, norm (of mean-centered vol.)
+    Names match list items created from loose files ('<file>', '<file>,<vol>' or '<atlas>,<label>'),
+    so saved analyses are interchangeable; labels from CSV/JSON files are used for display.
+    Templates are correlated w/o resampling when ICs are on the same grid, see 'prepared_vector()'.
+    """
+
+    MANIFEST_NAME = 'manifest.json'
+    TEMPLATES_NAME = 'templates.npy'
+    INDEX_NAME = 'index.npz'
+    SUFFIX = '.zoobundle'
+
+    def __init__(self, directory):
+        super().__init__()
+
+        self.directory = str(directory)
+        with open(os.path.join(self.directory, self.MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version', 0) > FORMAT_VERSION:
+            print('WARNING: template bundle created by newer version of Network Zoo: ' + self.directory)
+        with np.load(os.path.join(self.directory, self.INDEX_NAME), allow_pickle=False) as arrays:
+            self.mask_index = arrays['mask_index']
+            self.mean = arrays['mean']
+            self.norm = arrays['norm']
+        self.templates = np.load(os.path.join(self.directory, self.TEMPLATES_NAME), mmap_mode='r')
+
+        self.names = self.manifest['names']
+        self.labels = self.manifest['labels']
+        self.filepaths = self.manifest['filepaths']
+        self.vol_inds = self.manifest['vol_inds']
+        self.fourD = self.manifest['fourD']
+        self.kinds = self.manifest['kinds']
+        self.fingerprints = self.manifest['fingerprints']
+        self.shape = tuple(self.manifest['shape'])
+        self.affine = np.array(self.manifest['affine'])
+        self.resolution = self.manifest['resolution']
+        self._name_inds = {name: k for k, name in enumerate(self.names)}
+
+    @classmethod
+    def open(cls, directory):
+        """Load bundle, or None w/ warning if missing/unreadable"""
+
+        if (not directory) or (not os.path.isdir(str(directory))): return None
+        try:
+            return cls(directory)
+        except (OSError, ValueError, KeyError) as e:
+            print('WARNING: could not load template bundle: ' + str(directory) + '\n  ' + str(e))
+            return None
+
+    @classmethod
+    def from_config(cls, config):
+        """Load bundle from 'bundle' field of ICN settings in config.json, if set"""
+
+        if 'icn' not in config.keys(): return None
+        return cls.open(config['icn'].get('bundle'))
+
+    @classmethod
+    def bundle_path(cls, directory, resolution, out_dir=None):
+        """Default path for bundle compiled from template directory"""
+
+        directory = os.path.abspath(str(directory)).rstrip(os.sep)
+        out_dir = out_dir if out_dir else os.path.dirname(directory)
+        return os.path.join(out_dir, os.path.basename(directory) + '_%dmm' %resolution + cls.SUFFIX)
+
+    def __len__(self):
+        return len(self.names)
+
+    def index(self, name):
+        """Row of template in bundle, or None"""
+        return self._name_inds.get(name)
+
+    def outdated(self):
+        """Source files changed since bundle was compiled.
+        Missing source files are not outdated, bundled templates are still usable"""
+
+        changed = []
+        for filepath, (size, mtime_ns) in self.manifest['sources'].items():
+            if not os.path.isfile(filepath): continue
+            st = os.stat(filepath)
+            if (st.st_size != size) or (st.st_mtime_ns != mtime_ns):
+                changed.append(filepath)
+        return changed
+
+    def on_grid(self, img):
+        """Check if vol. is on bundle grid, i.e. templates do not need resampling to match"""
+
+        if img is None: return False
+        return (tuple(img.shape[:3]) == self.shape) and np.allclose(img.affine, self.affine)
+
+    def prepared_vector(self, k):
+        """Template over full grid as mean-centered unit vector, w/ precomputed stats.,
+        as prepared for correlations by zoo_Mapper.CorrelationSession. None if template is constant"""
+
+        if self.norm[k] == 0: return None
+        vec = np.full(int(np.prod(self.shape)), -self.mean[k])
+        vec[self.mask_index] += self.templates[k]
+        vec /= self.norm[k]
+        return vec.astype(np.float32)
+
+    def volume(self, k):
+        """Template as 3D array on bundle grid"""
+
+        vol = np.zeros(int(np.prod(self.shape)), dtype=np.float32)
+        vol[self.mask_index] = self.templates[k]
+        return vol.reshape(self.shape)
+
+    def img(self, k):
+        """Template as nifti vol."""
+        return nib.Nifti1Image(self.volume(k), self.affine)
+
+    @staticmethod
+    def grid(resolution):
+        """Shape & affine of standard MNI grid"""
+
+        if int(resolution) not in MNI_GRIDS.keys():
+            raise ValueError('Template bundles require resolution of ' +
+                             ' or '.join(['%d mm' %r for r in MNI_GRIDS.keys()]))
+        shape, affine = MNI_GRIDS[int(resolution)]
+        return shape, np.array(affine)
+
+    @staticmethod
+    def find_labels(directory):
+        """Labels for templates from CSV (1st matching columns for filename & label)
+        or JSON ('labels' field) files in directory"""
+
+        labels = {}
+        for fname in sorted(glob.glob(os.path.join(str(directory), '*.csv'))):
+            with open(fname) as f:
+                rows = list(csv.reader(f))
+            if len(rows) < 2: continue
+            header = [col.replace(':', '') for col in rows[0]]
+            c0 = [c for c, col in enumerate(header) if any([s in col for s in
+                                                             ['Component', 'Filename', 'File', 'Template']])]
+            c1 = [c for c, col in enumerate(header) if any([s in col for s in ['Label', 'Classification']])]
+            if not c0 or not c1: continue
+            for row in rows[1:]:
+                if len(row) > max(c0[0], c1[0]):
+                    labels[row[c0[0]]] = row[c1[0]]
+        for fname in sorted(glob.glob(os.path.join(str(directory), '*.json'))):
+            try:
+                with open(fname) as f:
+                    content = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if isinstance(content, dict) and isinstance(content.get('labels'), dict):
+                labels.update(content['labels'])
+        return labels
+
+    @staticmethod
+    def compile(out_dir, icn_dirs, noise_dirs=None, resolution=2, search_pattern=SEARCH_PATTERN):
+        """Resample all templates in directories to MNI grid & write bundle.
+        ROI atlases are resampled once w/ nearest-neighbor interpolation, then split by label"""
+
+        t0 = time.time()
+        shape, affine = TemplateBundle.grid(resolution)
+        r_pattern = re.compile(search_pattern)
+        dirs = [(d, 'icn') for d in icn_dirs] + [(d, 'noise') for d in (noise_dirs if noise_dirs else [])]
+
+        info = {'names': [], 'labels': [], 'filepaths': [], 'vol_inds': [], 'fourD': [],
+                'kinds': [], 'fingerprints': [], 'sources': {}}
+        sparse = [] # (flat grid indices, values) for each template
+        for directory, kind in dirs:
+            labels = TemplateBundle.find_labels(directory)
+            files = sorted([os.path.abspath(f) for f in glob.glob(os.path.join(str(directory), '*'))
+                            if r_pattern.search(f) and os.path.isfile(f)])
+            for filepath in files:
+                img = vc.VolumeCache.load(filepath)
+                if len(img.shape) < 3: continue
+                st = os.stat(filepath)
+                info['sources'][filepath] = [st.st_size, st.st_mtime_ns]
+                file_fps = fp.FingerprintIndex.compute(filepath)
+                lookup = r_pattern.search(filepath).groups()[0]
+
+                if (len(img.shape) > 3) and (img.shape[3] > 1):
+                    items = [(lookup + ',%d' %(k+1), k, True, vol)
+                             for k, vol in enumerate(image.iter_img(img))]
+                elif fl.FileLoader.is_atlas_vol(img):
+                    atlas = image.resample_img(img, target_affine=affine, target_shape=shape,
+                                               interpolation='nearest').get_fdata(caching='unchanged')
+                    roi_inds = np.unique(np.asanyarray(img.dataobj)).tolist()
+                    if 0 in roi_inds: roi_inds.remove(0)
+                    items = [(lookup + ',' + str(int(ind)), int(ind), False, atlas == ind)
+                             for ind in roi_inds]
+                else:
+                    items = [(lookup, 0, len(img.shape) > 3,
+                              image.index_img(img, 0) if len(img.shape) > 3 else img)]
+
+                for name, vol_ind, fourD, vol in items:
+                    fingerprint = fp.FingerprintIndex.vol_fingerprint(file_fps, vol_ind, fourD)
+                    if fingerprint and (fingerprint in info['fingerprints']):
+                        print('WARNING: skipping duplicate of ' + name + ' from file: ' + filepath)
+                        continue
+                    if isinstance(vol, np.ndarray):
+                        data = vol.astype(np.float32).ravel()
+                    else:
+                        with warnings.catch_warnings():
+                            warnings.simplefilter('ignore', UserWarning) # dtype casts, binary masks
+                            data = image.resample_img(vol, target_affine=affine, target_shape=shape,
+                                                      interpolation='continuous')
+                        data = np.asarray(data.get_fdata(caching='unchanged'), dtype=np.float32).ravel()
+                    data[~np.isfinite(data)] = 0
+                    if len(data) > 0:
+                        data[np.abs(data) < RESAMPLING_TOL * np.abs(data).max()] = 0
+                    inds = np.flatnonzero(data)
+                    if len(inds) == 0:
+                        print('WARNING: template ' + name + ' is empty at %d mm' %resolution)
+                    sparse.append((inds, data[inds]))
+                    info['names'].append(name)
+                    info['labels'].append(labels.get(name, name))
+                    info['filepaths'].append(filepath)
+                    info['vol_inds'].append(vol_ind)
+                    info['fourD'].append(fourD)
+                    info['kinds'].append(kind)
+                    info['fingerprints'].append(fingerprint)
+        if len(sparse) == 0:
+            raise ValueError('No templates found in: ' + ', '.join([str(d) for d, _ in dirs]))
+
+        # Shared mask & stats over full grid
+        n_grid = int(np.prod(shape))
+        mask_index = np.unique(np.concatenate([inds for inds, _ in sparse])).astype(np.int64)
+        n_templates = len(sparse)
+        mean, norm = np.zeros(n_templates), np.zeros(n_templates)
+        positions = []
+        for k, (inds, values) in enumerate(sparse):
+            values = values.astype(np.float64)
+            mean[k] = values.sum() / n_grid
+            norm[k] = np.sqrt(max(np.dot(values, values) - n_grid * mean[k]**2, 0.))
+            positions.append(np.searchsorted(mask_index, inds))
+
+        # Write to temporary dir. & replace atomically, so partial bundles are never loaded
+        out_dir = os.path.abspath(str(out_dir)).rstrip(os.sep)
+        tmp = out_dir + '.tmp'
+        if os.path.isdir(tmp): shutil.rmtree(tmp)
+        os.makedirs(tmp)
+        matrix = np.lib.format.open_memmap(os.path.join(tmp, TemplateBundle.TEMPLATES_NAME), mode='w+',
+                                           dtype=np.float32, shape=(n_templates, len(mask_index)))
+        for k, (_, values) in enumerate(sparse):
+            matrix[k, positions[k]] = values
+        matrix.flush()
+        del matrix
+        with open(os.path.join(tmp, TemplateBundle.INDEX_NAME), 'wb') as f:
+            np.savez(f, mask_index=mask_index, mean=mean, norm=norm)
+        info.update({'format_version': FORMAT_VERSION, 'resolution': int(resolution),
+                     'shape': list(shape), 'affine': affine.tolist(), 'created': time.time(),
+                     'source_dirs': [os.path.abspath(str(d)) for d, _ in dirs]})
+        with open(os.path.join(tmp, TemplateBundle.MANIFEST_NAME), 'w') as f:
+            json.dump(info, f)
+        if os.path.isdir(out_dir): shutil.rmtree(out_dir)
+        os.replace(tmp, out_dir)
+        print('Compiled %d templates (%d voxels w/n mask) at %d mm in %.1fs: %s'
+              %(n_templates, len(mask_index), resolution, time.time() - t0, out_dir))
+        return out_dir
+
+
+def main(argv):
+    """Compile template bundles from ICN & noise template directories:
+      python zoo_TemplateBundle.py -i data_templates/icn_atlases/Yeo7 -n data_templates/noise_confounders -r 2 -r 3
+      -i: ICN template directory (repeat for several), -n: noise template directory (optional, repeatable),
+      -r: resolution in mm, 2 or 3 (default 2, repeatable), -o: output bundle (default next to 1st ICN dir.)
+    """
+
+    usage = main.__doc__
+    try:
+        opts, args = getopt.getopt(argv, "hi:n:r:o:", ["help", "icn=", "noise=", "resolution=", "output="])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    icn_dirs, noise_dirs, resolutions, out_dir = [], [], [], None
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print(usage)
+            sys.exit()
+        elif opt in ('-i', '--icn'):
+            icn_dirs.append(arg)
+        elif opt in ('-n', '--noise'):
+            noise_dirs.append(arg)
+        elif opt in ('-r', '--resolution'):
+            resolutions.append(int(arg))
+        elif opt in ('-o', '--output'):
+            out_dir = arg
+    if not icn_dirs:
+        print(usage)
+        sys.exit(2)
+    resolutions = resolutions if resolutions else [2]
+
+    for resolution in resolutions:
+        if out_dir and (len(resolutions) == 1):
+            bundle = out_dir
+        elif out_dir:
+            bundle = os.path.splitext(out_dir.rstrip(os.sep))[0] + '_%dmm' %resolution + TemplateBundle.SUFFIX
+        else:
+            bundle = TemplateBundle.bundle_path(icn_dirs[0], resolution)
+        TemplateBundle.compile(bundle, icn_dirs, noise_dirs, resolution=resolution)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
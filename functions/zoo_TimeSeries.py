@@ -0,0 +1,76 @@
+"""Shared ICA time series matrices for Network Zoo"""
+
+# Mathematical/Neuroimaging Libraries
+import numpy as np
+import nibabel as nib
+
+# Internal imports
+import zoo_VolumeCache as vc # decompressed, memory-mapped copies of .nii.gz files
+
+
+class TimeSeriesMatrix(object):
+    """
+    Single (time x ICs) float32 matrix for a GIFT-style time courses file.
+
+    File is opened once & memory-mapped when possible, each IC in NetworkZooGUI.gd['ica']
+    only holds a column view into the shared matrix. Spectra are found for the whole matrix at once
+    & are cached until the TR changes.
+    """
+
+    def __init__(self, filepath):
+        super().__init__()
+
+        self.filepath = filepath
+        self.matrix = None
+        self._spectra = {}  # cached |FFT| of all ICs, indexed by sampling rate
+
+        self._load()
+
+    def _load(self):
+        """Open time courses file, w/o copying if already stored as float32"""
+
+        img = nib.load(vc.VolumeCache.path(self.filepath), mmap=True)
+        if len(img.shape) != 2: # expect [time x ICs] vol.
+            return
+        dat = np.asanyarray(img.dataobj)
+        if dat.dtype != np.float32:
+            dat = np.asarray(dat, dtype=np.float32)
+        self.matrix = dat
+
+    @property
+    def shape(self):
+        return self.matrix.shape if self.matrix is not None else None
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes if self.matrix is not None else 0
+
+    def column(self, k):
+        """View of IC time series, w/o copying matrix"""
+        if (self.matrix is None) or (k is None): return None
+        k = int(k)
+        if not (0 <= k < self.matrix.shape[1]): return None
+        return self.matrix[:, k]
+
+    def spectra(self, Fs=2):
+        """Magnitude of power spectra for all ICs, as (freqs., [freq. x ICs] matrix)"""
+
+        if self.matrix is None: return None, None
+        if Fs not in self._spectra.keys():
+            n = self.matrix.shape[0]
+            ps = np.abs(np.fft.rfft(self.matrix, axis=0, norm='ortho')).astype(np.float32)
+            freq_range = np.fft.rfftfreq(n, Fs)
+            self._spectra = {Fs: (freq_range, ps)}  # only keep spectra for current TR
+        return self._spectra[Fs]
+
+    def spectrum(self, k, Fs=2):
+        """Power spectrum for single IC, from cached batch spectra"""
+
+        freq_range, ps = self.spectra(Fs)
+        if ps is None: return None, None
+        return freq_range, ps[:, int(k)]
+
+    def release(self):
+        """Drop references to matrix (incl. any open memory map)"""
+        self.matrix = None
+        self._spectra = {}
@@ -0,0 +1,154 @@
+"""Rendered displays for Network Zoo, kept as bitmaps to redraw revisited views w/o re-plotting"""
+
+# Python Libraries
+import json, hashlib
+from collections import OrderedDict
+
+# Mathematical Libraries
+import numpy as np
+
+
+class ViewCache(object):
+    """
+    Bitmaps of rendered figures (spatial maps, time series), by view key:
+      (figure, ica_lookup, icn_lookup, layout, coords, canvas size, display text, overlaid templates, option hash)
+    Least recently used bitmaps are dropped once pixel memory exceeds budget.
+    Each entry also keeps state needed while bitmap is shown, ex. slice coords. & axes of each cut,
+    so clicks on cached display can be mapped to MNI coords.
+    Entries for IC or template are dropped w/ 'invalidate()' when item is removed or changed,
+    & entries drawn w/ previous options w/ 'invalidate_options()'.
+    Bitmaps rendered outside GUI thread are stored w/ epoch of cache when render was queued,
+    & dropped if entries were invalidated since, see 'store_bitmap()'.
+    """
+
+    def __init__(self, budget_mb=64):
+        super().__init__()
+
+        self.budget_bytes = int(budget_mb * 1024**2) if budget_mb else 0  # 0 ~ disabled
+        self.entries = OrderedDict()  # key : {'rgba', 'state'}, least recently used first
+        self.n_hits, self.n_misses = 0, 0
+        self.epoch = 0  # incremented whenever entries are invalidated
+
+    @classmethod
+    def from_config(cls, config):
+        """Create cache from 'memory' field in config.json"""
+
+        if 'memory' not in config.keys(): return cls()
+        return cls(budget_mb=config['memory'].get('view_cache_mb', 64))
+
+    @property
+    def enabled(self):
+        return self.budget_bytes > 0
+
+    @property
+    def nbytes(self):
+        return sum(entry['rgba'].nbytes for entry in self.entries.values())
+
+    @staticmethod
+    def options_hash(*options):
+        """Short hash of display options, ex. plotting settings"""
+
+        text = json.dumps(options, sort_keys=True, default=str)
+        return hashlib.md5(text.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def key(figure, ica_lookup=None, icn_lookup=None, layout=None, coords=None, size=None,
+            text=None, options=None, overlays=None):
+        """View key, w/ option hash last (see 'invalidate_options()')"""
+
+        coords = tuple(coords) if isinstance(coords, (list, tuple)) else coords
+        overlays = tuple(overlays) if overlays else ()
+        return (figure, ica_lookup, icn_lookup, layout, coords, tuple(size) if size else None, text, 
+                overlays, options)
+
+    @staticmethod
+    def same_display(key1, key2):
+        """Check if view keys differ only in slice coords"""
+        return (key1[:4] == key2[:4]) and (key1[5:] == key2[5:])
+
+    @staticmethod
+    def locate(state, x, y):
+        """Cut & coords. (direction, xdata, ydata) at pixel (x,y) on cached display, Nones if not on a cut.
+        Cuts are stored in state as [(direction, (x0, y0, x1, y1) pixel extent, xlim, ylim)]"""
+
+        for direction, (x0, y0, x1, y1), xlim, ylim in state.get('cuts', []):
+            if (x0 <= x <= x1) and (y0 <= y <= y1):
+                xdata = xlim[0] + (x - x0) / (x1 - x0) * (xlim[1] - xlim[0])
+                ydata = ylim[0] + (y - y0) / (y1 - y0) * (ylim[1] - ylim[0])
+                return direction, xdata, ydata
+        return None, None, None
+
+    def get(self, key):
+        """Cached entry for key, marked most recently used, or None"""
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.n_misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.n_hits += 1
+        return entry
+
+    def has(self, key):
+        """Check if view is cached, w/o marking as used"""
+        return key in self.entries.keys()
+
+    def store(self, key, canvas, **state):
+        """Copy rendered canvas as bitmap for key, returns entry"""
+
+        if not self.enabled: return None
+        return self.store_bitmap(key, np.array(canvas.buffer_rgba(), dtype=np.uint8, copy=True), **state)
+
+    def store_bitmap(self, key, rgba, epoch=None, **state):
+        """Keep RGBA array already copied from canvas for key, returns entry.
+        epoch: value of 'epoch' when render was queued, bitmap is dropped if entries were invalidated since"""
+
+        if not self.enabled: return None
+        if (epoch is not None) and (epoch != self.epoch): return None
+        if rgba.nbytes > self.budget_bytes: return None
+        self.entries.pop(key, None)
+        self.entries[key] = {'rgba': rgba, 'state': state}
+        self.enforce()
+        return self.entries[key]
+
+    def enforce(self):
+        """Drop least recently used bitmaps until w/n budget"""
+
+        total = self.nbytes
+        while (total > self.budget_bytes) and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            total -= entry['rgba'].nbytes
+
+    @staticmethod
+    def show(fig, canvas, entry):
+        """Redraw figure as cached bitmap"""
+
+        fig.clear()
+        fig.figimage(entry['rgba'], xo=0, yo=0, origin='upper', resize=False)
+        canvas.draw()
+
+    def invalidate(self, ica_lookup=None, icn_lookup=None, figure=None):
+        """Drop entries showing IC or template, incl. as overlay (or all entries for figure, if no lookups given)"""
+
+        self.epoch += 1
+
+        for key in list(self.entries.keys()):
+            if (figure is not None) and (key[0] != figure):
+                continue
+            if ((ica_lookup is None) and (icn_lookup is None)) or \
+               ((ica_lookup is not None) and (key[1] == ica_lookup)) or \
+               ((icn_lookup is not None) and ((key[2] == icn_lookup) or (icn_lookup in key[-2]))):
+                self.entries.pop(key)
+
+    def invalidate_options(self, figure, options):
+        """Drop entries for figure drawn w/ options other than current option hash"""
+
+        self.epoch += 1
+
+        for key in list(self.entries.keys()):
+            if (key[0] == figure) and (key[-1] != options):
+                self.entries.pop(key)
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.epoch += 1
@@ -0,0 +1,175 @@
+"""Local cache of decompressed nifti files for Network Zoo"""
+
+# Python Libraries
+import os, gzip, shutil, hashlib, threading
+
+# Mathematical/Neuroimaging Libraries
+import nibabel as nib
+from nilearn import image
+
+
+class VolumeCache(object):
+    """
+    Stores decompressed, memory-mappable copies of gzip-compressed nifti files (.nii.gz),
+    so repeated loading/indexing of vols. does not repeat gzip decompression.
+
+    Cached copies are keyed by source path + size + mtime, so edited files are re-cached.
+    Total size is capped, least recently used copies are evicted first
+    (file mtime of cached copy is used as last access time).
+    """
+
+    default = None  # cache shared by all loaders, set w/ VolumeCache.set_default()
+
+    def __init__(self, directory, max_size_mb=4096):
+        super().__init__()
+
+        self.directory = directory
+        self.max_bytes = int(max_size_mb * 1024**2)
+        self._lock = threading.Lock()
+        self._key_locks = {}  # prevents decompressing same file twice at once
+
+        if self.directory and not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                print('WARNING: could not create cache directory: ' + str(self.directory))
+                self.directory = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Create cache from 'cache' field in config.json, if enabled"""
+
+        if 'cache' not in config.keys(): return None
+        if not config['cache'].get('enabled', True): return None
+        if not config['cache'].get('directory'): return None
+        return cls(config['cache']['directory'],
+                   max_size_mb=config['cache'].get('max_size_mb', 4096))
+
+    @classmethod
+    def set_default(cls, cache):
+        cls.default = cache
+
+    @classmethod
+    def load(cls, filepath):
+        """Load nifti img from memory-mapped copy in default cache, if available"""
+
+        if cls.default is not None:
+            return cls.default.load_img(filepath)
+        return image.load_img(str(filepath))
+
+    @classmethod
+    def path(cls, filepath):
+        """Path to memory-mappable copy of file in default cache, if available"""
+
+        if cls.default is not None:
+            return cls.default.cached_path(filepath)
+        return str(filepath)
+
+    @staticmethod
+    def file_key(filepath):
+        """Key for file contents, from path, size & modification time"""
+
+        filepath = os.path.abspath(str(filepath))
+        st = os.stat(filepath)
+        return '%s|%d|%d' %(filepath, st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def is_compressed(filepath):
+        return str(filepath).endswith('.nii.gz')
+
+    def load_img(self, filepath):
+        """Load nifti img, w/ voxel data memory-mapped from decompressed copy"""
+
+        return nib.load(self.cached_path(filepath), mmap=True)
+
+    def cached_path(self, filepath):
+        """Get path to decompressed copy of file, creating copy if needed.
+        Returns original path for uncompressed files, or if caching fails"""
+
+        filepath = str(filepath)
+        if (not self.directory) or (not self.is_compressed(filepath)):
+            return filepath
+        if not os.path.isfile(filepath):
+            return filepath
+
+        cached = self._cache_name(filepath)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(cached, threading.Lock())
+        with key_lock:
+            if os.path.isfile(cached):
+                try:
+                    os.utime(cached) # mark as recently used
+                except OSError:
+                    pass
+                return cached
+            try:
+                tmp = cached + '.%d.%d.tmp' %(os.getpid(), threading.get_ident())
+                with gzip.open(filepath, 'rb') as f_in, open(tmp, 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, length=1024**2)
+                n_bytes = os.path.getsize(tmp)
+                if n_bytes > self.max_bytes:  # too large to cache
+                    os.remove(tmp)
+                    return filepath
+                self.evict(n_bytes)
+                os.replace(tmp, cached)
+            except (OSError, EOFError) as e:
+                print('WARNING: could not cache decompressed copy of: ' + filepath + '\n  ' + str(e))
+                if os.path.isfile(tmp): os.remove(tmp)
+                return filepath
+        return cached
+
+    def _cache_name(self, filepath):
+        """Path of decompressed copy, from key for current file contents"""
+
+        key = self.file_key(filepath)
+        name = hashlib.sha1(key.encode()).hexdigest()[:20]
+        base = os.path.basename(filepath)[:-len('.nii.gz')]
+        return os.path.join(self.directory, base + '_' + name + '.nii')
+
+    def existing_path(self, filepath):
+        """Path to decompressed copy if already cached, w/o creating copy"""
+
+        filepath = str(filepath)
+        if (not self.directory) or (not self.is_compressed(filepath)):
+            return None
+        if not os.path.isfile(filepath):
+            return None
+        cached = self._cache_name(filepath)
+        return cached if os.path.isfile(cached) else None
+
+    def entries(self):
+        """Cached files, as list of (path, bytes, last used), least recently used first"""
+
+        if not self.directory or not os.path.isdir(self.directory): return []
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.nii'):
+                st = entry.stat()
+                entries.append((entry.path, st.st_size, st.st_mtime))
+        entries.sort(key=lambda x: x[2])
+        return entries
+
+    def size(self):
+        """Total size of cache, in bytes"""
+        return sum([n_bytes for _, n_bytes, _ in self.entries()])
+
+    def evict(self, needed_bytes=0):
+        """Remove least recently used copies, until there is room for needed_bytes"""
+
+        entries = self.entries()
+        total = sum([n_bytes for _, n_bytes, _ in entries])
+        for path, n_bytes, _ in entries:
+            if total + needed_bytes <= self.max_bytes: break
+            try:
+                os.remove(path) # open memory-maps remain valid on posix
+                total -= n_bytes
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove all cached copies"""
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
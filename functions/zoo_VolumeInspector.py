@@ -0,0 +1,186 @@
+"""Header-only inspection of nifti volumes for Network Zoo"""
+
+# Python Libraries
+import os, json, gzip, threading
+
+# Mathematical/Neuroimaging Libraries
+import numpy as np
+import nibabel as nib
+
+# Internal imports
+import zoo_VolumeCache as vc # decompressed, memory-mapped copies of .nii.gz files
+
+
+NIFTI_INTENT_LABEL = 1002  # nifti intent code for vols. of integer labels (~ROI atlases)
+
+
+class VolumeInspector(object):
+    """
+    Reads vol. info from headers, w/o loading voxel data:
+    shape, affine, dtype, intensity intent codes, & whether vol. looks like an atlas of integer labels.
+    Atlas check is made from a sample of voxels, only when header is inconclusive.
+    Results are cached per file (path + size + mtime), & saved between sessions if 'index_file' is set.
+    """
+
+    MAX_SAMPLES = 2**16     # max. number of voxels sampled for atlas check
+    MAX_GZIP_BYTES = 2**24  # max. decompressed bytes read for atlas check of .nii.gz files w/o cached copy
+
+    def __init__(self, index_file=None):
+        super().__init__()
+
+        self.index_file = index_file
+        self._index = {}
+        self._lock = threading.Lock()
+        self._modified = False
+        if index_file and os.path.isfile(index_file):
+            try:
+                with open(index_file) as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+
+    @classmethod
+    def from_config(cls, config):
+        """Create inspector w/ index saved in cache directory, if enabled"""
+
+        index_file = None
+        if 'cache' in config.keys():
+            if config['cache'].get('enabled', True) and config['cache'].get('directory'):
+                index_file = os.path.join(config['cache']['directory'], 'header_index.json')
+        return cls(index_file)
+
+    def inspect(self, filepath):
+        """Get vol. info for file, from cache if file is unchanged. Returns None if unreadable"""
+
+        if (not filepath) or (not os.path.isfile(str(filepath))): return None
+        key = vc.VolumeCache.file_key(filepath)
+        with self._lock:
+            if key in self._index.keys():
+                return self._index[key]
+        try:
+            info = self.read_header(filepath)
+        except Exception as e:
+            print('WARNING: could not read nifti header: ' + str(filepath) + '\n  ' + str(e))
+            return None
+        with self._lock:
+            self._index[key] = info
+            self._modified = True
+        return info
+
+    def save(self):
+        """Write cached info to index file, if updated"""
+
+        if (not self.index_file) or (not self._modified): return
+        with self._lock:
+            index = dict(self._index)
+            self._modified = False
+        # drop entries for files that have been moved, changed or deleted
+        index = {key: info for key, info in index.items()
+                 if os.path.isfile(key.rsplit('|', 2)[0])}
+        try:
+            tmp = self.index_file + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp, self.index_file)
+        except OSError as e:
+            print('WARNING: could not save header index: ' + str(e))
+
+    def check_vol_inds(self, filepath, vol_inds):
+        """Checks that file is a readable 3D/4D vol., containing all requested vol. indices"""
+
+        info = self.inspect(filepath)
+        if info is None: return False
+        if len(info['shape']) < 3: return False
+        if (len(info['shape']) > 3) and vol_inds:
+            return all([0 <= int(float(k)) < info['n_vols'] for k in vol_inds])
+        return True
+
+    @staticmethod
+    def read_header(filepath):
+        """Read vol. info from nifti header, sampling voxels only if needed for atlas check"""
+
+        img = nib.load(str(filepath))
+        hdr = img.header
+        shape = [int(d) for d in img.shape]
+        dtype = img.get_data_dtype()
+        intent_code = int(hdr['intent_code']) if 'intent_code' in hdr else 0
+        intent_name = hdr.get_intent()[0] if hasattr(hdr, 'get_intent') else ''
+        slope, inter = hdr.get_slope_inter() if hasattr(hdr, 'get_slope_inter') else (None, None)
+        info = {'shape': shape,
+                'n_vols': shape[3] if len(shape) > 3 else 1,
+                'affine': img.affine.tolist(),
+                'zooms': [float(z) for z in hdr.get_zooms()[:3]],
+                'dtype': str(dtype),
+                'intent_code': intent_code,
+                'intent_name': intent_name,
+                'scl_slope': None if (slope is None or not np.isfinite(slope)) else float(slope),
+                'scl_inter': None if (inter is None or not np.isfinite(inter)) else float(inter),
+                'is_label': False}
+        if len(shape) != 3:
+            return info  # only 3D vols. are expanded as atlases
+        if intent_code == NIFTI_INTENT_LABEL:
+            info['is_label'] = True
+        else:
+            info['is_label'] = VolumeInspector.sample_is_label(img, filepath)
+        return info
+
+    @staticmethod
+    def sample_is_label(img, filepath):
+        """
+        Atlas check from voxels sampled across entire vol.: non-negative integers w/ 2 < unique values < 1000.
+        Returns True/False, or None if no finite voxels were sampled
+        """
+
+        n_vox = int(np.prod(img.shape[:3]))
+        mmap_path = None
+        if vc.VolumeCache.default is not None:
+            mmap_path = vc.VolumeCache.default.existing_path(filepath)
+        if (mmap_path is None) and str(filepath).endswith('.gz'):
+            return VolumeInspector._sample_gzip(img, filepath, n_vox)
+
+        if mmap_path is not None:
+            img = nib.load(mmap_path, mmap=True)
+        step = max(1, int(np.ceil((n_vox / VolumeInspector.MAX_SAMPLES)**(1/3))))
+        sample = np.asarray(img.dataobj[::step, ::step, ::step])
+        return VolumeInspector._label_verdict(np.unique(sample), complete=True)
+
+    @staticmethod
+    def _sample_gzip(img, filepath, n_vox):
+        """Stream through compressed data w/o storing vol., stopping once verdict is certain,
+        or after first MAX_GZIP_BYTES of voxel data (ex. large integer atlases, never ruled out early),
+        capped reads are uncertain (None) unless continuous values were found"""
+
+        dtype = img.get_data_dtype()
+        slope, inter = img.dataobj.slope, img.dataobj.inter
+        offset = int(img.dataobj.offset)
+        capped = n_vox > max(1, VolumeInspector.MAX_GZIP_BYTES // dtype.itemsize)
+        n_vox = min(n_vox, max(1, VolumeInspector.MAX_GZIP_BYTES // dtype.itemsize))
+        n_bytes = n_vox * dtype.itemsize
+        stride = max(1, n_vox // VolumeInspector.MAX_SAMPLES)
+        chunk_vox = max(stride, (2**20 // dtype.itemsize) // stride * stride)
+
+        uniques = np.array([])
+        with gzip.open(str(filepath), 'rb') as f:
+            f.seek(offset)
+            read = 0
+            while read < n_bytes:
+                buf = f.read(min(chunk_vox * dtype.itemsize, n_bytes - read))
+                if not buf: break
+                read += len(buf)
+                vals = np.frombuffer(buf, dtype=dtype)[::stride].astype(np.float64)
+                vals = vals * slope + inter
+                uniques = np.union1d(uniques, np.unique(vals))
+                if VolumeInspector._label_verdict(uniques, complete=False) is False:
+                    return False  # continuous values found, no need to read further
+        return VolumeInspector._label_verdict(uniques, complete=(read >= n_bytes) and not capped)  # ...capped reads uncertain
+
+    @staticmethod
+    def _label_verdict(v_unique, complete=False):
+        """Same criteria as used for fully loaded vols., see FileLoader.is_atlas_vol()"""
+
+        v_unique = v_unique[np.isfinite(v_unique)]
+        if len(v_unique) == 0: return None
+        if (v_unique < 0).any() or (np.mod(v_unique, 1) != 0).any(): return False
+        if len(v_unique) >= 1000: return False
+        if len(v_unique) > 2: return True
+        return False if complete else None
@@ -0,0 +1,121 @@
+"""Summary statistics of vols. for Network Zoo, computed once per loaded vol."""
+
+# Python Libraries
+import threading, weakref
+
+# Mathematical Libraries
+import numpy as np
+
+
+class VolumeStats(object):
+    """
+    Summary stats. of single vol., w/ non-finite values counted as 0 (as masks & correlations treat them):
+      min, max, absmax, mean, std:  over all voxels
+      nz_mean, nz_std:              over nonzero voxels (std w/ ddof=1, as 'prep_tmap()' scaling)
+      n_voxels, n_finite, n_nonzero
+      hist_counts, hist_edges:      histogram over [min, max]
+      percentiles:                  {(q, nonzero): value}, for PERCENTILES found w/ single partial sort,
+                                    others added by 'percentile()' as requested
+    Percentiles match np.percentile (linear interpolation), but use np.partition instead of full sort.
+    """
+
+    PERCENTILES = (1., 5., 25., 50., 75., 95., 99.)
+    N_BINS = 64
+
+    def __init__(self, data):
+        super().__init__()
+
+        dat = self.finite(data)
+        self.n_voxels = int(dat.size)
+        self.n_finite = int(np.count_nonzero(np.isfinite(np.asarray(data))))
+        self.min, self.max = (float(dat.min()), float(dat.max())) if dat.size else (0., 0.)
+        self.absmax = max(abs(self.min), abs(self.max))
+        self.mean = float(dat.mean()) if dat.size else 0.
+        self.std = float(dat.std()) if dat.size else 0.
+
+        nonzero = dat[dat != 0]
+        self.n_nonzero = int(nonzero.size)
+        self.nz_mean = float(nonzero.mean()) if nonzero.size else 0.
+        self.nz_std = float(nonzero.std(ddof=1)) if nonzero.size > 1 else 0.
+
+        self.hist_counts, self.hist_edges = np.histogram(dat, bins=self.N_BINS,
+                                                         range=(self.min, self.max) if self.max > self.min else None)
+        self.percentiles = {}
+        self.add_percentiles(dat, self.PERCENTILES, nonzero=False)
+        self.add_percentiles(nonzero, self.PERCENTILES, nonzero=True)
+
+    @staticmethod
+    def finite(data):
+        """Flattened data w/ non-finite values zeroed"""
+
+        dat = np.asarray(data, dtype=np.float64).ravel()
+        if not np.all(np.isfinite(dat)):
+            dat = np.where(np.isfinite(dat), dat, 0.)
+        return dat
+
+    @staticmethod
+    def partition_percentiles(values, qs):
+        """Percentiles of 1D values, as np.percentile w/ linear interpolation, from single partial sort"""
+
+        if values.size == 0: return [np.nan for q in qs]
+        inds = np.asarray(qs, dtype=np.float64) / 100. * (values.size - 1)
+        lo, hi = np.floor(inds).astype(np.intp), np.ceil(inds).astype(np.intp)
+        part = np.partition(values, np.unique(np.concatenate([lo, hi])))
+        frac = inds - lo
+        return (part[lo] + (part[hi] - part[lo]) * frac).tolist()
+
+    def add_percentiles(self, values, qs, nonzero=False):
+        for q, value in zip(qs, self.partition_percentiles(values, qs)):
+            self.percentiles[(float(q), nonzero)] = value
+
+    def percentile(self, q, nonzero=False, data=None):
+        """Percentile of all (or nonzero) voxels, from data if not yet known, None if unknown & no data"""
+
+        key = (float(q), nonzero)
+        if (key not in self.percentiles.keys()) and (data is not None):
+            dat = self.finite(data)
+            self.add_percentiles(dat[dat != 0] if nonzero else dat, [q], nonzero=nonzero)
+        return self.percentiles.get(key)
+
+
+class StatsCache(object):
+    """
+    Stats. of nifti vols., computed when first requested & kept while vol. is in memory
+    (keyed by img object, so stats. are dropped w/ evicted or replaced vols.).
+    Shared by display, masking & correlation fns., see 'StatsCache.get()'.
+    """
+
+    default = None  # cache shared by all fns., set w/ StatsCache.set_default()
+
+    def __init__(self):
+        super().__init__()
+
+        self.stats = weakref.WeakKeyDictionary()  # img : VolumeStats
+        self._lock = threading.Lock()
+        self.n_computed = 0
+
+    @classmethod
+    def set_default(cls, cache):
+        cls.default = cache
+
+    @classmethod
+    def get(cls, img):
+        """Stats. of img from default cache, or computed w/o caching if no default is set"""
+
+        if cls.default is not None:
+            return cls.default.get_stats(img)
+        return VolumeStats(img.get_fdata(caching='unchanged'))
+
+    def get_stats(self, img):
+        with self._lock:
+            stats = self.stats.get(img)
+        if stats is None:
+            stats = VolumeStats(img.get_fdata(caching='unchanged'))
+            with self._lock:
+                self.stats[img] = stats
+                self.n_computed += 1
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self.stats = weakref.WeakKeyDictionary()
@@ -16,7 +16,8 @@ networkZoo.py
 # Python Libraries
 from os.path import join as opj  # method to join strings of file paths
 import getopt  # used to parse command-line input
-import os, sys, re, json, csv
+import os, sys, re, json, csv, copy, time, gc
+import tracemalloc
 from functools import partial
 from string import digits
 from numbers import Number
@@ -69,6 +70,18 @@ import zoo_OutputOpts as outparams # Qt GUI dialog to tweak mask creation & outp
 import zoo_About as about         # Qt window for about info
 import zoo_Tutorial as tutorial   # Qt window for Step-by-step tutorial
 import zoo_MaskMaker as masks     # fns. to create binary masks
+import zoo_Journal as journal     # autosave of changes to analysis, for recovery after crashes
+import zoo_CorrelationStore as cs # correlations between ICs & templates, stored as labeled matrix
+import zoo_MemoryReport as mr     # memory accounting by category & item, w/ diagnostics window
+import zoo_SliceRenderer as render # moves slices of spatial map display w/o re-plotting
+import zoo_SliceCache as slices   # vols. prepared for display, w/ multi-resolution anatomical underlay
+import zoo_SliceCompositor as compose # mosaics of slices composited as RGBA arrays
+import zoo_ViewCache as views     # bitmaps of rendered displays, redrawn when views are revisited
+import zoo_Prefetcher as prefetch # background prep. of views likely shown next
+import zoo_OffscreenRenderer as offscreen_render # views drawn on private figures in background thread
+import zoo_VolumeStats as vstats  # summary stats. of vols., computed once per vol.
+import zoo_ContourPaths as contours # template outlines traced once per slice, drawn as cached paths
+import zoo_RenderScheduler as scheduling # debounced display updates, coalescing redundant redraws
 
 # Selectively suppress _expected_ irrevelant warnings
 import warnings
@@ -108,8 +121,9 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         self.gd = {}  # gui data; 
         # ...where gd[class][unique_name][file_path, nilearn image object]
         self.gd = {'ica' : {}, 'icn' : {}, 'mapped' : {},
-                   'mapped_ica' : {}, 'mapped_icn' : {}}
-        self.corrs = {} # dict of correlations, indexed by ic name
+                   'mapped_ica' : {}, 'mapped_icn' : {},
+                   'ica_ts' : {}}  # shared ICA time series matrices, indexed by file
+        self.corrs = cs.CorrelationStore() # correlations, indexed as corrs[ica_lookup][icn_lookup]
         self.matches = {} # dict of top matches, indexed by ic name
         self.reference_img = None # referrence nii vol. w/ smallest dimensions
         
@@ -175,15 +189,70 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                                    self.listWidget_ICAComponents,
                                    self.listWidget_ICNtemplates,
                                    self.listWidget_Classifications)
-        # Load default files
-        self.io.configure_ICs() # loads anatomical MRI, ICN templates, etc.
+        # Progress of files loading in background
+        self.progressBar_loading = QtWidgets.QProgressBar(self.statusbar)
+        self.progressBar_loading.setMaximumWidth(200)
+        self.progressBar_loading.setFormat('Loading files... %v/%m')
+        self.pushButton_cancelLoading = QtWidgets.QPushButton('Cancel loading', self.statusbar)
+        self.statusbar.addPermanentWidget(self.progressBar_loading)
+        self.statusbar.addPermanentWidget(self.pushButton_cancelLoading)
+        self.progressBar_loading.hide()
+        self.pushButton_cancelLoading.hide()
+        self.io.loader.progress.connect(self.update_loading_progress)
+        self.io.loader.finished.connect(self.finish_loading)
+        self.io.loader.file_failed.connect(self.warn_loading_failed)
+        self.pushButton_cancelLoading.clicked.connect(self.io.cancel_loading)
+        
+        # Vols. prepared for display, kept w/n memory budget
+        self.slice_cache = slices.SliceCache(memory=self.io.memory)
+        self.compositor = compose.SliceCompositor()
+        self.view_cache = views.ViewCache.from_config(self.config)
+        self.io.view_cache = self.view_cache # ...time series views dropped when time series are loaded
+        
+        # Views likely shown next, prepared & rendered offscreen in background while GUI is idle
+        self.prefetcher = prefetch.ViewPrefetcher(get_in_img=lambda lookup: self.io.peek_img('ica', lookup),
+                                                  get_map_img=lambda lookup: self.io.peek_img('icn', lookup))
+        self.prefetcher.coords_ready.connect(self.queue_prefetched_view)
+        self.io.prefetcher = self.prefetcher # ...cut coords. saved w/ analysis
+        self.prefetch_predicted = [] # views predicted from current view
+        self.prefetch_held = False # no prefetching while output is created, see 'create_FiguresAndTables'
+        self.offscreen_renderer = offscreen_render.OffscreenRenderer()
+        self.offscreen_renderer.rendered.connect(self.store_prefetched_view)
         
-        # Setup corr. fns.
-        self.mapper = map.Mapper(in_files=self.get_imgs('ica'), 
-                                 in_filenames=self.get_img_names('ica'),
-                                 map_files=self.get_imgs('icn'), 
-                                 map_filenames=self.get_img_names('icn'), 
-                                 corrs=self.corrs)
+        # Load default files
+        self.io.configure_ICs() # reads headers for ICN templates, etc., voxel data loaded in background
+        
+        # Autosave, as journal of changes written in background w/ periodic snapshots
+        self.journal = journal.AnalysisJournal.from_config(self.config)
+        self.journal_held = False # no autosaves until previous session is recovered or discarded
+        self.timer_compactJournal = QtCore.QTimer(self)
+        self.timer_compactJournal.timeout.connect(self.compact_journal)
+        if self.journal is not None:
+            interval = self.config['journal'].get('compact_interval_sec', 120)
+            self.timer_compactJournal.start(int(interval * 1000))
+        
+        # Setup corr. fns., w/ prepared vols. kept across clicks & analyses
+        self.corr_session = map.CorrelationSession(get_in_img=lambda lookup: self.io.get_img('ica', lookup),
+                                                   get_map_img=lambda lookup: self.io.get_img('icn', lookup),
+                                                   get_map_bundle=lambda lookup: self.io.get_bundle('icn', lookup))
+        self.corr_scheduler = map.CorrelationScheduler(self.corr_session, corrs=self.corrs,
+                                                       get_in_img=lambda lookup: self.io.peek_img('ica', lookup),
+                                                       get_map_img=lambda lookup: self.io.peek_img('icn', lookup),
+                                                       is_loading=self.io.loader.is_loading)
+        self.corr_scheduler.corrs_ready.connect(self.apply_scheduled_corrs)
+        self.corr_scheduler.progress.connect(self.update_correlating_progress)
+        self.corr_scheduler.finished.connect(self.finish_correlating)
+        self.analysis_pending = False
+        self.progressBar_correlating = QtWidgets.QProgressBar(self.statusbar)
+        self.progressBar_correlating.setMaximumWidth(200)
+        self.progressBar_correlating.setFormat('Correlating... %v/%m')
+        self.statusbar.addPermanentWidget(self.progressBar_correlating)
+        self.progressBar_correlating.hide()
+        self.mapper = map.Mapper(in_files=self.get_imgs('ica', load=False), 
+                                 in_filenames=self.get_img_names('ica', load=False),
+                                 map_files=self.get_imgs('icn', load=False), 
+                                 map_filenames=self.get_img_names('icn', load=False), 
+                                 corrs=self.corrs, session=self.corr_session)
 
         # Setup non-Qt display defaults
         if hasattr(self, 'config'):
@@ -214,11 +283,30 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         # change MNI coordinates on click
         self.canvas_x.mpl_connect('button_release_event', self.figure_x_onClick)
 
+        # nilearn displays currently drawn, by figure
+        self.displays_opened = {}
+        self.memory_report_file = None # JSON file w/ memory usage, written on quit, see 'main()'
+        self.slice_renderer = None # moves slices of ortho. display on figure above, see 'plot_vols'
+        self.view_live = None # view key of display moved by slice_renderer, see 'draw_spatial_maps'
+        
         # figure for time & frequency data
         self.figure_t = plt.figure()
         self.canvas_t = FigureCanvas(self.figure_t)
         self.verticalLayout_plot.addWidget(self.canvas_t)
         self.canvas_t.setSizePolicy(ts_sp)
+        
+        # cached bitmaps currently shown, by figure ('x','t'), re-plotted after canvas is resized
+        self.view_shown = {}
+        self.timer_resizeViews = QtCore.QTimer(self)
+        self.timer_resizeViews.setSingleShot(True)
+        self.timer_resizeViews.setInterval(250)
+        self.timer_resizeViews.timeout.connect(self.redraw_cached_views)
+        self.canvas_x.mpl_connect('resize_event', lambda event: self.timer_resizeViews.start())
+        self.canvas_t.mpl_connect('resize_event', lambda event: self.timer_resizeViews.start())
+        
+        # display updates requested by GUI signals, coalesced & rendered in stages, see 'request_plots'
+        self.render_scheduler = scheduling.RenderScheduler(self.render_stages, get_selection=self.get_selected_items)
+        self.render_scheduler.rendered.connect(self.report_render_latency)
 
         # connections for menu items
         self.action_LoadAnalysis.triggered.connect(self.load_analysis)
@@ -286,11 +374,14 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         self.action_ShowAboutInfo.triggered.connect(self.show_about)
         self.action_ShowStepByStepTutorial.triggered.connect(self.show_tutorial)
         self.action_LoadDemoICAcomps.triggered.connect(self.load_demoICA)
+        self.menuDiagnostics = self.menuHelp.addMenu('Diagnostics')
+        self.action_ShowMemoryUsage = self.menuDiagnostics.addAction('Memory Usage...')
+        self.action_ShowMemoryUsage.triggered.connect(self.show_memory_report)
         
         
         # Connections for buttons & lists
         self.buttonGroup_xview.buttonReleased.connect(self.change_display_layout)
-        self.pushButton_showMaxOverlap.clicked.connect(self.update_plots)
+        self.pushButton_showMaxOverlap.clicked.connect(self.request_plots)
         self.pushButton_icaload.clicked.connect(self.io.browse_ica_files)
         self.pushButton_icnload.clicked.connect(self.io.browse_icn_files)
 
@@ -306,7 +397,7 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         self.horizontalSlider_Xslice.sliderReleased.connect(self.update_plots_from_sliders)
         self.horizontalSlider_Yslice.sliderReleased.connect(self.update_plots_from_sliders)
         self.horizontalSlider_Zslice.sliderReleased.connect(self.update_plots_from_sliders)
-        self.buttonGroup_xview.buttonReleased.connect(self.update_plots)
+        self.buttonGroup_xview.buttonReleased.connect(self.request_plots)
         
         self.listWidget_ICAComponents.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
         self.listWidget_ICAComponents.clearSelection()
@@ -335,6 +426,11 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             message += "\n\nTo this change setting, select 'Preferrences' from the 'Edit' menu"
             message += " when the main window is opened, and click on 'Reset All Settings' if needed"
             QtWidgets.QMessageBox.warning(self, title, message)
+        
+        self.recover_session() # offer to replay autosave, if previous session was not saved
+        self.start_background_sweep() # correlate loaded vols. in idle time
+        gc.collect()
+        gc.freeze() # ...long-lived objects skipped by collections nilearn forces, incl. in offscreen renders
 
         
         
@@ -431,13 +527,15 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.horizontalSlider_Xslice.setEnabled(False)
             self.horizontalSlider_Yslice.setEnabled(False)
             self.horizontalSlider_Zslice.setEnabled(False)
-        self.update_plots()
+        self.request_plots()
                 
         
     def reset_display(self):
     # def reset_display(self, initialize=False):  # 6/9/2022 --kw-- removing deprecated arg
         """Clear Qt display & unselect lists"""
         
+        self.release_displays()
+        self.view_shown = {}
         self.figure_x.clear()
         self.canvas_x.draw()
         self.figure_t.clear()
@@ -515,6 +613,8 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         else:
             self.mp = self.editedDisplay.mp_prev
             self.tp = self.editedDisplay.tp_prev
+        for figure in ['x', 't']: # drop views rendered w/ other options, incl. previews
+            self.view_cache.invalidate_options(figure, self.get_view_options(figure))
             
     def edit_output_opts(self):
         """Launch window to edit output & mask creation options"""
@@ -546,17 +646,27 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.pushButton_runAnalysis.setText("Creating...")
             extra_items = self.config['icn']['extra_items'].copy()
             extra_items += self.config['noise']['extra_items']
-            
-            self.saverGUI = saver.PatienceTestingGUI(self.gd,
-                                                     self.config,
-                                                     self.listWidget_Classifications,
-                                                     self.listWidget_ICNtemplates,
-                                                     self.update_plots,
-                                                     self.figure_x,
-                                                     self.figure_t,
-                                                     self.corrs,
-                                                     extra_items = extra_items,
-                                                     output_path = output_path)
+            with self.io.memory.paused(): # all vols. kept until output is finished
+                self.io.load_pending() # output created in separate thread, finish loading vols. here
+                
+                # Output thread draws each mapping w/ 'update_plots', w/o renders or prefetching by GUI thread
+                self.render_scheduler.suspend()
+                self.interrupt_prefetch()
+                self.prefetch_held = True
+                try:
+                    self.saverGUI = saver.PatienceTestingGUI(self.gd,
+                                                             self.config,
+                                                             self.listWidget_Classifications,
+                                                             self.listWidget_ICNtemplates,
+                                                             self.update_plots,
+                                                             self.figure_x,
+                                                             self.figure_t,
+                                                             self.corrs,
+                                                             extra_items = extra_items,
+                                                             output_path = output_path)
+                finally:
+                    self.prefetch_held = False
+                    self.render_scheduler.resume()
             warnflag = False
             output_files = [os.path.basename(f) 
                             for f in self.saverGUI.output.output_files 
@@ -611,10 +721,51 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                 QtWidgets.QMessageBox.warning(self, "Error Creating Masks", 
                                               "Save filename not selected")
             else:
-                self.masks = masks.MaskMaker(self.gd, config=self.config)
-                self.masks.create_binaryMasks(mask_fname)
+                with self.io.memory.paused(): # all vols. kept until masks are created
+                    for mapping_lookup in self.gd['mapped'].keys(): # load vols. not yet in memory
+                        self.io.get_img('ica', self.gd['mapped'][mapping_lookup]['ica_lookup'])
+                    self.masks = masks.MaskMaker(self.gd, config=self.config)
+                    self.masks.create_binaryMasks(mask_fname)
                 
                 
+    def memory_report(self):
+        """Memory used by vols., displays, correlations, etc., see zoo_MemoryReport.MemoryReport"""
+        
+        return mr.MemoryReport.collect(self.io.memory, 
+                                       reference_img=self.reference_img,
+                                       session=self.corr_session, 
+                                       corrs=self.corrs,
+                                       time_series=self.gd.get('ica_ts'),
+                                       figures={'spatial maps figure': self.figure_x, 
+                                                'time series figure': self.figure_t},
+                                       displays=[d for ds in self.displays_opened.values() for d in ds],
+                                       view_cache=self.view_cache)
+    
+    def show_memory_report(self):
+        """Pull up window w/ memory usage by category & item"""
+        
+        win = mr.newMemoryReportWin(self.memory_report, parent=self, 
+                                    directory=self.config['base_directory'])
+        win.exec()
+        
+    def save_memory_report(self, fname):
+        """Write memory report as JSON, ex. to compare sessions"""
+        mr.MemoryReport.save(self.memory_report(), fname)
+        
+    def release_displays(self, fig=None, close=False):
+        """Drop nilearn displays drawn on fig (or all figures), closing their figures if close.
+        Displays are not closed while redrawing, since display.close() also closes the figure in main window"""
+        
+        figs = [fig] if fig is not None else list(self.displays_opened.keys())
+        if (fig is None) or (fig is self.figure_x):
+            if self.slice_renderer is not None:
+                self.slice_renderer.disconnect()
+            self.slice_renderer, self.view_live = None, None
+            self.view_shown.pop('x', None)
+        for fig in figs:
+            for d in self.displays_opened.pop(fig, []):
+                if close: d.close()
+                    
     def show_about(self):
         """Pull up window to background details & aims of software"""
         about_file = opj(self.config['base_directory'], 'ABOUT.txt')
@@ -655,13 +806,93 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             QtWidgets.QMessageBox.information(self, title, message)
             
             self.io.load_demo_files(demo_ica_path)
-                
-            
+
+    def update_loading_progress(self, n_done, n_submitted):
+        """Show progress of files loading in background"""
+
+        if n_submitted == 0: return
+        self.progressBar_loading.setMaximum(n_submitted)
+        self.progressBar_loading.setValue(n_done)
+        self.progressBar_loading.show()
+        self.pushButton_cancelLoading.show()
+
+    def finish_loading(self):
+        """Hide progress bar once all files are loaded or loading is cancelled"""
+
+        self.progressBar_loading.hide()
+        self.pushButton_cancelLoading.hide()
+        self.corr_scheduler.retry_waiting() # ...pairs requested before vols. were loaded
+        self.start_background_sweep()
+        self.sweep_cut_coords()
+
+    def start_background_sweep(self):
+        """Queue all pairs of loaded ICs & templates, correlated while GUI is idle"""
+        
+        if not self.config.get('corr_background', True): return
+        ica_names = self.get_img_names('ica', load=False)
+        icn_names = self.get_img_names('icn', load=False)
+        if ica_names and icn_names:
+            self.corr_scheduler.request_all(ica_names, icn_names, 
+                                            priority=map.CorrelationScheduler.PRIORITY_SWEEP)
+    
+    def apply_scheduled_corrs(self, new_corrs):
+        """Add corrs. calculated in background to shared corrs., called in GUI thread"""
+        
+        added = {}
+        for ica_lookup, icn_corrs in new_corrs.items():
+            if ica_lookup not in self.gd['ica'].keys(): continue # removed while correlating
+            icn_corrs = {icn_lookup: r for icn_lookup, r in icn_corrs.items() 
+                         if icn_lookup in self.gd['icn'].keys()}
+            if ica_lookup not in self.corrs.keys():
+                self.corrs.update({ica_lookup: {}})
+            self.corrs[ica_lookup].update(icn_corrs)
+            added[ica_lookup] = icn_corrs
+        if len(added) == 0: return
+        self.journal_log('corrs', corrs=added)
+        
+        # Re-rank ICN list for selected IC or classification, keeping current selection
+        ica_lookup = None
+        if self.listWidget_Classifications.currentRow() != -1:
+            mapping_lookup = str(self.listWidget_Classifications.currentItem().data(Qt.UserRole))
+            ica_lookup = self.gd['mapped'][mapping_lookup]['ica_lookup']
+        elif self.listWidget_ICAComponents.currentRow() != -1:
+            ica_lookup = str(self.listWidget_ICAComponents.currentItem().data(Qt.UserRole))
+        if ica_lookup in added.keys():
+            icn_lookup = None
+            if self.listWidget_ICNtemplates.currentRow() != -1:
+                icn_lookup = str(self.listWidget_ICNtemplates.currentItem().data(Qt.UserRole))
+            self.repopulate_ICNs(ica_lookup)
+            if icn_lookup in self.gd['icn'].keys():
+                self.listWidget_ICNtemplates.setCurrentItem(self.gd['icn'][icn_lookup]['widget'])
+        
+    def update_correlating_progress(self, n_done, n_requested):
+        """Show progress of correlations in background"""
+        
+        if n_requested == 0: return
+        self.progressBar_correlating.setMaximum(n_requested)
+        self.progressBar_correlating.setValue(n_done)
+        self.progressBar_correlating.show()
+        
+    def finish_correlating(self):
+        """Hide progress bar once queued correlations are done"""
+        
+        self.progressBar_correlating.hide()
+        if self.analysis_pending:
+            self.finish_analysis()
+        self.sweep_cut_coords() # ...w/ templates ranked by new corrs.
+
+    def warn_loading_failed(self, filepath, error_message):
+        """Report files that could not be loaded in background"""
+
+        print('ERROR: could not load file: ' + filepath + '\n  ' + error_message)
+        self.statusbar.showMessage('Could not load file: ' + os.path.basename(filepath), 5000)
+
+
     #--------------------------------------------
     ### Functions controlling entire analysis ###
     #--------------------------------------------
-    def reset_analysis(self, clear_lists=False, clear_display=False, warn=False):
-        """Reset entire analysis"""
+    def reset_analysis(self, clear_lists=False, clear_display=False, warn=False, discard_journal=True):
+        """Reset entire analysis, & autosave of it unless discard_journal=False (ex. while recovering from autosave)"""
         
         if warn:
             warn_title = "Resetting Analysis"
@@ -672,6 +903,16 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                                              QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
                                              QtWidgets.QMessageBox.No) == QtWidgets.QMessageBox.No:
                 return # do nothing
+        if hasattr(self, 'io'):
+            self.io.cancel_loading() # discard files still loading in background
+            self.io.memory.clear()
+        if getattr(self, 'slice_cache', None) is not None:
+            self.slice_cache.clear()
+        if getattr(self, 'view_cache', None) is not None:
+            self.view_cache.clear()
+        if getattr(self, 'prefetcher', None) is not None:
+            self.prefetcher.discard()
+            self.offscreen_renderer.interrupt()
         if clear_lists:
             self.listWidget_Classifications.clear()
             self.listWidget_ICAComponents.clear()
@@ -680,7 +921,8 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.lineEdit_mappedICANetwork.clear()
         if not hasattr(self, 'gd'):
             self.gd = {'smri': {}, 'ica': {}, 'icn': {}, 
-                       'mapped': {}, 'mapped_ica': {}, 'mapped_icn': {}}
+                       'mapped': {}, 'mapped_ica': {}, 'mapped_icn': {},
+                       'ica_ts': {}}
         else:
             # clear up img cache to prevent accumulation in memory
             if 'ica' in self.gd.keys():
@@ -693,13 +935,24 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                     if 'img' in self.gd['icn'][icn_lookup].keys():
                         if self.gd['icn'][icn_lookup]['img']:
                             self.gd['icn'][icn_lookup]['img'].uncache()
+            if 'ica_ts' in self.gd.keys():
+                for ica_ts in self.gd['ica_ts'].values():
+                    ica_ts.release()
             self.gd['ica'] = {}
             self.gd['icn'] = {}
+            self.io.fp_items = {'ica': {}, 'icn': {}}
+            self.gd['ica_ts'] = {}
             self.gd['mapped'] = {}
             self.gd['mapped_ica'] = {}
             self.gd['mapped_icn'] = {}
-        self.corrs = {}
         self.matches = {}
+        if getattr(self, 'corr_session', None) is not None:
+            self.corr_session.clear()
+            self.corr_scheduler.discard()
+            self.analysis_pending = False
+        self.share_corrs(cs.CorrelationStore())
+        if clear_lists and discard_journal and getattr(self, 'journal', None):
+            self.journal.discard() # user confirmed discarding current analysis
         if hasattr(self, 'config'):
             if 'saved_analysis' in self.config.keys():
                 self.config['saved_analysis'] = False
@@ -724,6 +977,17 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
 
 
             
+    def share_corrs(self, corrs):
+        """Use corrs. for GUI, saved analyses, & correlation fns., keeping all in sync"""
+        
+        self.corrs = cs.CorrelationStore.from_corrs(corrs)
+        if hasattr(self, 'io'):
+            self.io.corrs = self.corrs
+        if getattr(self, 'corr_scheduler', None) is not None:
+            self.corr_scheduler.corrs = self.corrs
+        if getattr(self, 'mapper', None) is not None:
+            self.mapper.corrs = self.corrs
+            
     def save_analysis(self):
         """Quick save info to existing file"""
         
@@ -737,6 +1001,7 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.save_analysis_as()
         else:
             self.io.save_analysis_json(fname)
+            if self.journal: self.journal.discard() # all changes saved
             
         
     def save_analysis_as(self):
@@ -763,6 +1028,7 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.config['saved_analysis'] = True
             self.config['saved_analysis_path'] = fname
             self.io.save_analysis_json(fname)
+            if self.journal: self.journal.discard() # all changes saved
 
     def load_analysis(self):
         """Load info from file created by 'save_analysis()' fn."""
@@ -779,7 +1045,8 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.io.load_analysis_json(fname)
             
             self.config = self.io.config
-            self.corrs = self.io.corrs
+            self.share_corrs(self.io.corrs)
+            if self.journal: self.journal.discard() # analysis matches saved file
             self.reset_display()   # 6/9/2022 --kw-- tweaking behavior
             if self.listWidget_Classifications.count() > 0:
                 self.listWidget_Classifications.setCurrentRow(0)
@@ -788,6 +1055,100 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                 self.update_plots()
                 
     
+    def journal_log(self, op, **fields):
+        """Autosave single change to analysis, see zoo_Journal.AnalysisJournal for entries"""
+        
+        if (self.journal is None) or self.journal_held: return
+        if not self.journal.has_snapshot: # entries are replayed on top of snapshot
+            self.compact_journal(force=True)
+        if 'corrs' in fields.keys():
+            fields['corrs'] = {ica_lookup: {icn_lookup: float(r) for icn_lookup, r in ica_corrs.items()}
+                               for ica_lookup, ica_corrs in fields['corrs'].items()}
+        self.journal.log(op, **fields)
+        
+    def compact_journal(self, force=False):
+        """Autosave snapshot of entire analysis, replacing journal of changes since last snapshot.
+        Files are written in background, only copying current analysis info here"""
+        
+        if (self.journal is None) or self.journal_held: return
+        if (not force) and (self.journal.n_events == 0): return # nothing new
+        analysisInfo, corrs, IndstoNames = self.io.analysis_info(corrs=self.corrs, hash_files=False)
+        analysisInfo['config'] = copy.deepcopy(analysisInfo['config'])
+        corrs = {ica_lookup: dict(ica_corrs) for ica_lookup, ica_corrs in corrs.items()}
+        self.journal.snapshot(analysisInfo, corrs, IndstoNames)
+        
+    def recover_session(self):
+        """Offer to restore unsaved analysis from autosave of previous session"""
+        
+        if (self.journal is None) or (not self.journal.has_recovery()): return
+        self.journal_held = True # ...ex. corrs. arriving while prompt is shown would replace autosave
+        try:
+            title = "Recover unsaved analysis"
+            message = "Changes to the analysis in a previous session of Network Zoo were not saved."
+            message += "\n\nRecover unsaved ICA > ICN classifications & correlations?"
+            if QtWidgets.QMessageBox.question(self, title, message,
+                                              QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+                                              QtWidgets.QMessageBox.Yes) == QtWidgets.QMessageBox.No:
+                self.journal.discard()
+                return
+            
+            entries = self.journal.read_entries()
+            if os.path.isfile(self.journal.snapshot_file): # ...autosave replaced by new snapshot below
+                self.reset_analysis(clear_lists=True, clear_display=True, warn=False, discard_journal=False)
+                self.io.load_analysis_json(self.journal.snapshot_file)
+                self.config = self.io.config
+                self.share_corrs(self.io.corrs)
+            for entry in entries:
+                self.replay_journal_entry(entry)
+        finally:
+            self.journal_held = False
+        self.compact_journal(force=True) # replayed entries become new snapshot
+        self.journal.unsaved = True
+        
+        self.reset_display()
+        if self.listWidget_Classifications.count() > 0:
+            self.listWidget_Classifications.setCurrentRow(0)
+            self.update_gui_classifications(self.listWidget_Classifications.currentItem())
+            
+    def replay_journal_entry(self, entry):
+        """Re-apply single autosaved change, skipping changes to items no longer loaded"""
+        
+        op = entry.get('op')
+        if op == 'classify':
+            ica_lookup, icn_lookup = entry.get('ica'), entry.get('icn')
+            if ica_lookup and (ica_lookup not in self.gd['ica'].keys()): return
+            if icn_lookup and (icn_lookup not in self.gd['icn'].keys()): return
+            self.add_Classification(ica_icn_pair=(ica_lookup, icn_lookup),
+                                    ica_custom_name=entry.get('ica_name', ica_lookup),
+                                    icn_custom_name=entry.get('icn_name', icn_lookup), 
+                                    updateGUI=False)
+        elif op == 'unclassify':
+            for mapping_lookup, mapping in list(self.gd['mapped'].items()):
+                if ((mapping['ica_lookup'] == entry.get('ica')) and 
+                    (mapping['icn_lookup'] == entry.get('icn'))):
+                    self.remove_Classification(mapping_lookup)
+        elif op == 'rename':
+            list_name, lookup = entry.get('list'), entry.get('lookup')
+            if (list_name not in ['ica', 'icn']) or (lookup not in self.gd[list_name].keys()): return
+            self.gd[list_name][lookup]['display_name'] = entry['name']
+            if self.gd[list_name][lookup]['widget'] is not None:
+                self.gd[list_name][lookup]['widget'].setText(entry['name'])
+        elif op == 'remove':
+            list_name = entry.get('list')
+            if list_name not in ['ica', 'icn']: return
+            lookups = [lookup for lookup in entry.get('lookups', []) if lookup in self.gd[list_name].keys()]
+            listWidget = self.listWidget_ICAComponents if list_name == 'ica' else self.listWidget_ICNtemplates
+            for row in reversed(range(listWidget.count())):
+                if str(listWidget.item(row).data(Qt.UserRole)) in lookups:
+                    listWidget.takeItem(row)
+            self.remove_list_items(list_name, lookups)
+        elif op == 'corrs':
+            for ica_lookup, ica_corrs in entry.get('corrs', {}).items():
+                if ica_lookup not in self.corrs.keys():
+                    self.corrs.update({ica_lookup: {}})
+                self.corrs[ica_lookup].update(ica_corrs)
+                    
+    
     def run_analysis(self):
         """Run full or ongoing correlation analysis for all loaded ICs & ICNs"""
         
@@ -811,27 +1172,21 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.pushButton_runAnalysis.setText(btn_txt)
             return
         
-        ### Call GUI for progress bar ###
-        if not hasattr(self, 'mapper'):
-            self.mapper = map.Mapper(in_files=self.get_imgs('ica'), 
-                                     in_filenames=self.get_img_names('ica'),
-                                     map_files=self.get_imgs('icn'), 
-                                     map_filenames=self.get_img_names('icn'), 
-                                     corrs=self.corrs)        
-        self.prbrGUI = map.PatienceTestingGUI(map_files=self.get_imgs('icn'), 
-                                              map_filenames=self.get_img_names('icn'), 
-                                              in_files=self.get_imgs('ica'), 
-                                              in_filenames=self.get_img_names('ica'),
-                                              corrs=self.corrs, mapper=self.mapper)
-        # Update existing Correlations
-        self.pushButton_runAnalysis.setText("Updating...")
-        for ica_lookup in self.prbrGUI.mapper.corrs.keys():
-            if ica_lookup not in self.corrs.keys():
-                self.corrs.update({ica_lookup: {}})
-            self.corrs[ica_lookup].update(self.prbrGUI.mapper.corrs[ica_lookup])
-                
-        # Update GUI
-        self.pushButton_runAnalysis.setText(btn_txt)
+        ### Queue all pairs, correlated in background w/ progress in status bar ###
+        self.analysis_button_text = btn_txt
+        self.analysis_pending = True
+        n_queued = self.corr_scheduler.request_all(self.get_img_names('ica'), self.get_img_names('icn'),
+                                                   priority=map.CorrelationScheduler.PRIORITY_ANALYSIS)
+        if n_queued == 0 and not self.corr_scheduler.is_busy():
+            self.finish_analysis()
+            
+    def finish_analysis(self):
+        """Update GUI once all pairs queued by 'run_analysis()' are correlated"""
+        
+        self.analysis_pending = False
+        self.pushButton_runAnalysis.setText(getattr(self, 'analysis_button_text', 
+                                                    self.pushButton_runAnalysis.text()))
+        if len(self.gd['ica']) == 0: return
         if self.listWidget_Classifications.currentRow() != -1:
             mapping_item = self.listWidget_Classifications.currentItem()
             self.update_gui_classifications(mapping_item)
@@ -844,7 +1199,7 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             ica_lookup = str(ica_item.data(Qt.UserRole))
             top_match = self.mapper.get_top_matches(ica_lookup, 
                                                     self.corrs, num_matches=1)
-            if len(top_match) > 0:
+            if top_match:
                 icn_lookup, _ = top_match[0]
                 icn_item = self.gd['icn'][icn_lookup]['widget']
                 self.listWidget_ICNtemplates.setCurrentItem(icn_item)
@@ -903,10 +1258,18 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                                          QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
                                          QtWidgets.QMessageBox.No) == QtWidgets.QMessageBox.Yes:
             # QtWidgets.QApplication.quit()
-            if 'd_opened' in locals(): 
-                for d in d_opened:
-                    d.close()  # manually close all open nilearn plots, prevent accumulation in memory
-                    d_opened.remove(d)
+            if self.memory_report_file: # ...before displays are closed & vols. released
+                self.save_memory_report(self.memory_report_file)
+                self.memory_report_file = None
+            self.io.loader.shutdown()
+            self.corr_scheduler.stop()
+            self.prefetcher.stop()
+            self.offscreen_renderer.stop()
+            if self.journal: # keep autosave only if analysis was not saved
+                self.journal.close(discard=not self.journal.unsaved)
+            if self.io.catalog is not None:
+                self.io.catalog.close()
+            self.release_displays(close=True) # manually close all open nilearn plots
             sys.exit()
             
             
@@ -968,6 +1331,7 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                             old_item.setText(new_name)
                             self.gd[list_name][lookup]['display_name'] = new_name
                             update_display = True
+                        self.journal_log('rename', list=list_name, lookup=lookup, name=new_name)
 
         listWidget.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
         if update_display:  self.update_plots()
@@ -1035,20 +1399,14 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                     elif list_name == 'icn':
                         keep_lookups = list(self.gd['mapped_icn'].keys())
                         keep_lookups += extra_items
+                    rm_keys = []
                     for item in listWidget.selectedItems():
                         lookup = str(item.data(Qt.UserRole))
                         listWidget.takeItem(listWidget.row(item))  # remove item from qlistwidget
                         if lookup not in keep_lookups:   # remove item from gd[list], if not mapped
-                            self.gd[list_name].pop(lookup)
-                            
-                            # 6/13/2022 --kw-- new functionality, testing/debugging...
-                            if list_name == 'ica':  # remove associated corrs. 
-                                if lookup in self.corrs.keys():  
-                                    del self.corrs[lookup]
-                            elif list_name == 'icn':
-                                for ica_lookup in self.corrs.keys():
-                                    if lookup in self.corrs[ica_lookup].keys():
-                                        del self.corrs[ica_lookup][lookup]
+                            rm_keys.append(lookup)
+                    self.remove_list_items(list_name, rm_keys)
+                    if rm_keys: self.journal_log('remove', list=list_name, lookups=rm_keys)
 
                     update_display = True
         listWidget.clearSelection()                  # deselects & clears current item(s)
@@ -1071,6 +1429,36 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         # if update_display:  self.update_plots()  # 6/13/2022 --kw-- adding partial reset of display
         
         
+    def remove_list_items(self, list_name, lookups):
+        """Remove ICs or templates from analysis, w/ corrs., prepared vols. & cached views.
+        Items in list widgets are removed by caller"""
+        
+        lookups = [lookup for lookup in lookups if lookup in self.gd[list_name].keys()]
+        if len(lookups) == 0: return
+        if list_name == 'ica':  # remove associated corrs. 
+            self.corr_scheduler.discard(in_names=lookups)
+            self.corr_session.remove_in(lookups)
+            self.corrs.drop_rows(lookups)
+        else:
+            self.corr_scheduler.discard(map_names=lookups)
+            self.corr_session.remove_map(lookups)
+            self.corrs.drop_columns(lookups)
+        self.io.memory.forget([(list_name, lookup) for lookup in lookups])
+        for lookup in lookups:
+            self.io.forget_fingerprint(list_name, lookup)
+            del self.gd[list_name][lookup]
+            if list_name == 'ica':
+                self.view_cache.invalidate(ica_lookup=lookup)
+                self.prefetcher.discard(ica_lookup=lookup)
+            else:
+                self.view_cache.invalidate(icn_lookup=lookup)
+                self.prefetcher.discard(icn_lookup=lookup)
+        if list_name == 'ica':
+            ts_files = set([ic['ts_filepath'] for ic in self.gd['ica'].values()])
+            for ts_file in [f for f in self.gd['ica_ts'].keys() if f not in ts_files]:
+                self.gd['ica_ts'].pop(ts_file).release()  # drop matrices no longer used by any IC
+        
+        
     def clear_list_all(self, list_name='ica', listWidget=None):
         """Empty specified list"""
         
@@ -1101,10 +1489,9 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             elif list_name=='ica':
                 rm_keys = [ica_lookup for ica_lookup in self.gd['ica'].keys() 
                            if ica_lookup not in self.gd['mapped_ica'].keys()]
-                for ica_lookup in rm_keys:  # 5/16/2022 --kw-- tweaking, need to delete entries in self.corrs
-                    del self.gd['ica'][ica_lookup]
-                    if ica_lookup in self.corrs.keys(): del self.corrs[ica_lookup]
+                self.remove_list_items('ica', rm_keys)
                 # for ica_lookup in rm_keys: del self.gd['ica'][ica_lookup]  # 5/16/2022 --kw-- tweaking, need to delete entries in self.corrs
+                if rm_keys: self.journal_log('remove', list='ica', lookups=rm_keys)
                 self.lineEdit_ICANetwork.clear()
             elif list_name=='icn':
                 rm_keys = [icn_lookup for icn_lookup in self.gd['icn'].keys() 
@@ -1113,12 +1500,9 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                            if icn_lookup not in self.config['icn']['extra_items']]
                 rm_keys = [icn_lookup for icn_lookup in rm_keys 
                            if icn_lookup not in self.config['noise']['extra_items']]
-                for icn_lookup in rm_keys:  # 5/16/2022 --kw-- tweaking, need to delete entries in self.corrs
-                    del self.gd['icn'][icn_lookup]
-                    for ica_lookup in self.corrs.keys():
-                        if icn_lookup in self.corrs[ica_lookup].keys():
-                            del self.corrs[ica_lookup][icn_lookup]
+                self.remove_list_items('icn', rm_keys)
                 # for icn_lookup in rm_keys: del self.gd['icn'][icn_lookup]   # 5/16/2022 --kw-- tweaking, need to delete entries in self.corrs
+                if rm_keys: self.journal_log('remove', list='icn', lookups=rm_keys)
                 self.repopulate_ICNs()  # 5/16/2022 --kw-- added tweak for usability
                 self.lineEdit_mappedICANetwork.clear()
             else:
@@ -1145,16 +1529,19 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
     #------------------------------------------------------
     ### Functions to get items from GUI data containers ###
     #------------------------------------------------------
-    def get_imgs(self, list_name):
+    def get_imgs(self, list_name, load=True):
         """Select MRI/fMRI image vols. from list"""
+        if load: self.io.load_pending(list_name) # finish loading vols. still in background queue
         imgs = [img for img in self.get_item_prop(list_name, 'img') if
                 isinstance(img, (Nifti1Image, Nifti1Pair))]
         return imgs
     
-    def get_img_names(self, list_name):
-        """Get names for MRI/fMRI vols. in list"""
-        imgs = [True if isinstance(img, (Nifti1Image, Nifti1Pair)) else False 
-                for img in self.get_item_prop(list_name, 'img')]
+    def get_img_names(self, list_name, load=True):
+        """Get names for MRI/fMRI vols. in list, incl. vols. evicted from memory & reloaded when needed"""
+        if load: self.io.load_pending(list_name, queued_only=True)
+        imgs = [True if (isinstance(img, (Nifti1Image, Nifti1Pair)) or self.io.has_img(list_name, name)) else False 
+                for name, img in zip(self.get_item_prop(list_name, 'lookup_name'), 
+                                     self.get_item_prop(list_name, 'img'))]
         names_all = [name for name in self.get_item_prop(list_name, 'lookup_name')]
         names = []
         for i, name in enumerate(names_all):
@@ -1223,7 +1610,7 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             
         # Update GUI
         self.lineEdit_ICANetwork.setText(self.gd['ica'][ica_lookup]['display_name'])
-        self.update_plots()
+        self.request_plots()
         
                 
     def update_gui_icn(self, icn_item):
@@ -1289,7 +1676,7 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         
         # Update GUI
         self.lineEdit_mappedICANetwork.setText(self.gd['icn'][icn_lookup]['display_name'])
-        self.update_plots()
+        self.request_plots()
 
 
     def update_gui_classifications(self, mapping_item):
@@ -1345,13 +1732,15 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         # Update GUI
         self.lineEdit_ICANetwork.setText(self.gd['mapped'][mapping_lookup]['ica_custom_name'])
         self.lineEdit_mappedICANetwork.setText(self.gd['mapped'][mapping_lookup]['icn_custom_name'])
-        self.update_plots()
+        self.request_plots()
 
     def verify_existence(self, list_name, list_lookup=None, list_property='img'):
         """Checks for property (~spatial map/volume) in GUI data containers"""
         verdict = False
         if not list_lookup: return(verdict) #simplifies handling of None type
         if list_lookup in self.gd[list_name].keys():
+            if list_property == 'img': # loads vol. if still pending
+                return self.io.get_img(list_name, list_lookup) is not None
             if list_property in self.gd[list_name][list_lookup].keys():
                 if self.gd[list_name][list_lookup][list_property]:
                     verdict = True
@@ -1367,32 +1756,12 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         if ica_imgLoaded and (ica_lookup not in self.corrs.keys()):
             self.corrs.update({ica_lookup : {}})
         if icn_imgLoaded and ica_imgLoaded:
-            btn_txt = self.pushButton_runAnalysis.text()
-            self.pushButton_runAnalysis.setText("Correlating...")
             if (ica_lookup in self.corrs.keys()) and (icn_lookup not in self.corrs[ica_lookup].keys()):
-                reset_mapper = False
-                if not hasattr(self, 'prbrGUI'):
-                    reset_mapper = True
-                elif ica_lookup not in self.prbrGUI.mapper.in_filenames:
-                    reset_mapper = True
-                elif icn_lookup not in self.prbrGUI.mapper.map_filenames:
-                    reset_mapper = True
-                if reset_mapper:
-                    self.mapper = map.Mapper(map_files=self.get_imgs('icn'), 
-                                                     map_filenames=self.get_img_names('icn'), 
-                                                     in_files=self.get_imgs('ica'), 
-                                                     in_filenames=self.get_img_names('ica'),
-                                                     corrs=self.corrs)
-                new_corrs = self.mapper.run_one(in_img_names=ica_lookup, 
-                                                map_names=icn_lookup)
-
-                ### Update existing Correlations ###
-                for ica_lookup in new_corrs.keys():
-                    if ica_lookup not in self.corrs.keys():
-                        self.corrs.update({ica_lookup: {}})
-                    self.corrs[ica_lookup].update(new_corrs[ica_lookup])
-                    
-            self.pushButton_runAnalysis.setText(btn_txt)
+                # correlated in background, w/ vols. prepared outside GUI thread, see 'apply_scheduled_corrs()'
+                self.corr_scheduler.request([(ica_lookup, icn_lookup)],
+                                            priority=map.CorrelationScheduler.PRIORITY_VISIBLE)
+                self.corr_scheduler.request_row(ica_lookup, self.get_img_names('icn', load=False),
+                                                priority=map.CorrelationScheduler.PRIORITY_SELECTED)
                     
 
     def repopulate_ICNs(self, ica_lookup=None):
@@ -1547,6 +1916,8 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                 self.gd['mapped_icn'][icn_lookup].update({ica_lookup : map_itemWidget})
             else:
                 self.gd['mapped_icn'][icn_lookup].update({'template' : map_itemWidget})
+        self.journal_log('classify', ica=ica_lookup, icn=icn_lookup, 
+                         ica_name=ica_custom_name, icn_name=icn_custom_name)
         if updateGUI:
             self.listWidget_ICAComponents.clearSelection()
             self.listWidget_Classifications.setCurrentItem(map_itemWidget)
@@ -1560,43 +1931,53 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         for i,item in enumerate(self.listWidget_Classifications.selectedItems()):
             mapping_lookup = str(item.data(Qt.UserRole))
             ica_lookup = self.gd['mapped'][mapping_lookup]['ica_lookup']
-            icn_lookup = self.gd['mapped'][mapping_lookup]['icn_lookup']
-            
-            # Remove mapped widget item
-            self.listWidget_Classifications.takeItem(self.listWidget_Classifications.row(item))
-            self.listWidget_Classifications.clearSelection()
-            
-            # Remove data storage for mapping
-            self.gd['mapped'].pop(mapping_lookup)
-
-            # Update dict of mapped ICs/ICNs
-            if icn_lookup in self.gd['mapped_ica'][ica_lookup].keys():
-                self.gd['mapped_ica'][ica_lookup].pop(icn_lookup)
-            if len(self.gd['mapped_ica'][ica_lookup].keys()) == 0:
-                self.gd['mapped_ica'].pop(ica_lookup)
-            if ica_lookup in self.gd['mapped_icn'][icn_lookup].keys():
-                self.gd['mapped_icn'][icn_lookup].pop(ica_lookup)
-            if len(self.gd['mapped_icn'][icn_lookup].keys()) == 0:
-                self.gd['mapped_icn'].pop(icn_lookup)
-                
-            # Add ICA item back to listwidget
-            if ica_lookup in self.gd['ica'].keys():
-                ica_display_name = self.gd['ica'][ica_lookup]['display_name']
-                ica_matches = self.listWidget_ICAComponents.findItems(ica_display_name, 
-                                                                      Qt.MatchExactly)
-                if len(ica_matches) == 0:
-                    ica_item = QtWidgets.QListWidgetItem(ica_lookup)
-                    self.listWidget_ICAComponents.addItem(ica_item)
-                    ica_item.setData(Qt.UserRole, ica_lookup)
-                    ica_item.setText(self.gd['ica'][ica_lookup]['display_name'])
-                    self.gd['ica'][ica_lookup]['widget'] = ica_item
-                    
-                    if i == last_i:
-                        self.listWidget_ICAComponents.setCurrentItem(ica_item)
-                        self.update_gui_ica(ica_item)
-            elif i == last_i:
+            ica_item = self.remove_Classification(mapping_lookup)
+            if i == last_i:
+                if ica_item is not None:
+                    self.listWidget_ICAComponents.setCurrentItem(ica_item)
+                    self.update_gui_ica(ica_item)
+                elif ica_lookup not in self.gd['ica'].keys():
                     self.update_plots()
                                 
+    def remove_Classification(self, mapping_lookup):
+        """Remove single mapping from list & gd, returns ICA widget item if added back to ICA list"""
+        
+        ica_lookup = self.gd['mapped'][mapping_lookup]['ica_lookup']
+        icn_lookup = self.gd['mapped'][mapping_lookup]['icn_lookup']
+        item = self.gd['mapped'][mapping_lookup]['mapped_item']
+        
+        # Remove mapped widget item
+        self.listWidget_Classifications.takeItem(self.listWidget_Classifications.row(item))
+        self.listWidget_Classifications.clearSelection()
+        
+        # Remove data storage for mapping
+        self.gd['mapped'].pop(mapping_lookup)
+
+        # Update dict of mapped ICs/ICNs
+        if icn_lookup in self.gd['mapped_ica'][ica_lookup].keys():
+            self.gd['mapped_ica'][ica_lookup].pop(icn_lookup)
+        if len(self.gd['mapped_ica'][ica_lookup].keys()) == 0:
+            self.gd['mapped_ica'].pop(ica_lookup)
+        if ica_lookup in self.gd['mapped_icn'][icn_lookup].keys():
+            self.gd['mapped_icn'][icn_lookup].pop(ica_lookup)
+        if len(self.gd['mapped_icn'][icn_lookup].keys()) == 0:
+            self.gd['mapped_icn'].pop(icn_lookup)
+        self.journal_log('unclassify', ica=ica_lookup, icn=icn_lookup)
+            
+        # Add ICA item back to listwidget
+        ica_item = None
+        if ica_lookup in self.gd['ica'].keys():
+            ica_display_name = self.gd['ica'][ica_lookup]['display_name']
+            ica_matches = self.listWidget_ICAComponents.findItems(ica_display_name, 
+                                                                  Qt.MatchExactly)
+            if len(ica_matches) == 0:
+                ica_item = QtWidgets.QListWidgetItem(ica_lookup)
+                self.listWidget_ICAComponents.addItem(ica_item)
+                ica_item.setData(Qt.UserRole, ica_lookup)
+                ica_item.setText(self.gd['ica'][ica_lookup]['display_name'])
+                self.gd['ica'][ica_lookup]['widget'] = ica_item
+        return ica_item
+                
                 
     def find_duplicate_mappings(self, duplicated_name='ica'):
         """Find ICA comps/ICN templates, etc. in multiple mappings/classifications,
@@ -1813,28 +2194,273 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
     ### Functions used to plot spatial maps & time series ###
     #--------------------------------------------------------
     def update_plots(self):
-        """Update plots using global plotting options"""
+        """Update plots using global plotting options, w/o waiting (ex. before saving display).
+        Updates requested by GUI signals are coalesced by render scheduler instead, see 'request_plots'"""
 
+        self.render_scheduler.cancel() # ...pending requests are served by this update, & suspended while output thread calls it
+        for stage in self.render_stages(): pass
+        
+    def request_plots(self, *args):
+        """Queue update of plots, coalesced w/ other requests fired by same user action.
+        Updates for selection no longer shown are dropped, see zoo_RenderScheduler"""
+        
+        self.render_scheduler.request()
+        
+    def render_stages(self):
+        """Update of plots, as stages run w/ GUI events handled in between"""
+        
+        self.interrupt_prefetch()
         ica_lookup, icn_lookup = self.get_current_networks()
         if ica_lookup or icn_lookup:
-            options = self.get_plot_options(ica_lookup, icn_lookup, coords_from_sliders=False)
-            self.plot_vols(self.figure_x, **options)
-            self.canvas_x.draw()
-            self.plot_time(self.figure_t, **options)
-            self.canvas_t.draw()
+            options = self.draw_spatial_maps(ica_lookup, icn_lookup, coords_from_sliders=False)
+            yield
+            self.draw_time_series(ica_lookup, options)
+            yield
+            self.schedule_prefetch(ica_lookup, icn_lookup)
+            
+    def get_selected_items(self):
+        """Current items in mapping, IC & template lists, to tell if display update is stale"""
+        
+        return tuple(str(listWidget.currentItem().data(Qt.UserRole)) if listWidget.currentRow() != -1 else None
+                     for listWidget in [self.listWidget_Classifications, self.listWidget_ICAComponents, 
+                                        self.listWidget_ICNtemplates])
+            
+    def report_render_latency(self, latency, render_time):
+        """Show time from request to updated display in status bar, unless showing other messages"""
+        
+        if self.statusbar.currentMessage().startswith('Display updated') or not self.statusbar.currentMessage():
+            self.statusbar.showMessage('Display updated in %d ms (rendering %d ms)' 
+                                       %(latency * 1000, render_time * 1000), 2000)
             
     def update_plots_from_sliders(self):
         """Updates plots after change in x,y,z slider bars,
         without changing global plotting options"""
         
+        self.interrupt_prefetch()
         ica_lookup, icn_lookup = self.get_current_networks()
         
         if ica_lookup or icn_lookup:
             options = self.get_plot_options(ica_lookup, icn_lookup, coords_from_sliders=True)
-            self.plot_vols(self.figure_x, **options)
-            self.canvas_x.draw()
-            self.plot_time(self.figure_t, **options)
-            self.canvas_t.draw()
+            if self.slice_renderer and (self.slice_renderer.key == self.get_display_key(options)):
+                if self.slice_renderer.set_coords(options['coords']): # only move slices, time series unchanged
+                    self.slice_renderer.refresh() # ...changed slices redrawn, crosshairs blitted
+                    return
+            options = self.draw_spatial_maps(ica_lookup, icn_lookup, coords_from_sliders=True)
+            self.draw_time_series(ica_lookup, options)
+            
+    def draw_spatial_maps(self, ica_lookup, icn_lookup, coords_from_sliders=False):
+        """Plot spatial maps on display, or redraw cached bitmap if view was rendered before.
+        Returns plot options, or None if redrawn from cache"""
+        
+        key = self.get_view_key('x', ica_lookup, icn_lookup, coords_from_sliders=coords_from_sliders)
+        entry = self.view_cache.get(key)
+        if (entry is not None) and self.move_slices(key, entry['state']):
+            return None # ...display already drawn, w/ slices moved
+        if entry is not None:
+            self.release_displays(self.figure_x) # ...slice renderer rebuilt on next slider move
+            views.ViewCache.show(self.figure_x, self.canvas_x, entry)
+            self.view_shown['x'] = entry['state']
+            layout, coords = entry['state']['layout'], entry['state']['coords']
+            if layout == 'ortho':
+                self.get_and_set_slice_coordinates(*coords)
+            elif layout in ['x', 'y', 'z']:
+                self.get_and_set_slice_coordinates(**{layout: np.array(coords)})
+            return None
+        
+        options = self.get_plot_options(ica_lookup, icn_lookup, coords_from_sliders=coords_from_sliders)
+        self.plot_vols(self.figure_x, **options)
+        self.canvas_x.draw()
+        self.view_cache.store(key, self.canvas_x, layout=options['displayLayout'], 
+                              coords=np.array(options['coords']).tolist(), cuts=self.get_display_cuts(self.figure_x))
+        self.view_live = key if (self.slice_renderer is not None) else None
+        return options
+    
+    def move_slices(self, key, state):
+        """Move slices of ortho. display already drawn, instead of redrawing cached bitmap of same display 
+        at other slices (keeping slice renderer for slider moves). Returns False if display is not the same"""
+        
+        if (self.slice_renderer is None) or (self.view_live is None) or (state['layout'] != 'ortho'): return False
+        if not views.ViewCache.same_display(key, self.view_live): return False
+        if self.slice_renderer.set_coords(state['coords']):
+            self.slice_renderer.refresh()
+        self.get_and_set_slice_coordinates(*state['coords'])
+        return True
+        
+    def get_display_cuts(self, fig, displays=None):
+        """Axes of each cut in ortho. display drawn on fig, as (direction, pixel extent, xlim, ylim),
+        to map clicks on cached bitmap of display.
+        displays: nilearn displays drawn on fig, if not kept in 'displays_opened' (ex. offscreen figures)"""
+        
+        cuts = []
+        for d in (displays if displays is not None else self.displays_opened.get(fig, [])):
+            for direction, cut_ax in d.axes.items():
+                if direction in ['x', 'y', 'z'] and (len(d.axes) == 3):
+                    cuts.append((direction, tuple(cut_ax.ax.get_window_extent().extents), 
+                                 cut_ax.ax.get_xlim(), cut_ax.ax.get_ylim()))
+        return cuts
+        
+    def draw_time_series(self, ica_lookup, options=None):
+        """Plot time series & spectrum, or redraw cached bitmap if shown before"""
+        
+        key = self.get_view_key('t', ica_lookup)
+        entry = self.view_cache.get(key)
+        if entry is not None:
+            views.ViewCache.show(self.figure_t, self.canvas_t, entry)
+            self.view_shown['t'] = entry['state']
+            return
+        
+        self.plot_time(self.figure_t, **(options if options else {'ica_lookup': ica_lookup}))
+        self.canvas_t.draw()
+        self.view_shown.pop('t', None)
+        if len(self.figure_t.get_axes()) > 0: # ...empty display is cheap to re-plot
+            self.view_cache.store(key, self.canvas_t)
+        
+    def get_top_template(self, ica_lookup):
+        """Template w/ highest corr. to IC, as ranked in ICN list, or None if not correlated yet"""
+        
+        top = self.get_top_templates(ica_lookup, k=1)
+        return top[0] if top else None
+        
+    def get_top_templates(self, ica_lookup, k=1):
+        """Up to k templates w/ highest corrs. to IC, as ranked in ICN list"""
+        
+        if ica_lookup not in self.corrs.keys(): return []
+        top = []
+        for icn_lookup, r in sorted(self.corrs[ica_lookup].items(), key=lambda x:x[1], reverse=True):
+            if len(top) >= k: break
+            if icn_lookup and r and np.isfinite(r) and (icn_lookup in self.gd['icn'].keys()):
+                top.append(icn_lookup)
+        return top
+        
+    def get_overlay_templates(self, ica_lookup, icn_lookup=None):
+        """Top-ranked templates outlined over display of IC, other than template shown, if set in display options"""
+        
+        num_overlays = self.mp['icn'].get('overlay_top', 0)
+        if not (num_overlays and ica_lookup and self.mp['icn']['show_icn']): return []
+        top = self.get_top_templates(ica_lookup, k=num_overlays + 1)
+        return [lookup for lookup in top if lookup != icn_lookup][:num_overlays]
+        
+    def get_predicted_views(self, ica_lookup, icn_lookup):
+        """Views likely shown next: next & previous ICs in list, w/ current & top-ranked templates"""
+        
+        views = []
+        row = self.listWidget_ICAComponents.currentRow()
+        if row == -1: return views
+        for neighbor in [row + 1, row - 1]:
+            if not (0 <= neighbor < self.listWidget_ICAComponents.count()): continue
+            next_ica = str(self.listWidget_ICAComponents.item(neighbor).data(Qt.UserRole))
+            for next_icn in [icn_lookup, self.get_top_template(next_ica)]:
+                if (next_icn is not None) and ((next_ica, next_icn) not in views):
+                    views.append((next_ica, next_icn))
+        return views
+    
+    def schedule_prefetch(self, ica_lookup, icn_lookup):
+        """Prepare views likely shown next while current view is shown, see zoo_Prefetcher.
+        Cut coords. are found in background, then views are rendered offscreen & cached as bitmaps"""
+        
+        settings = self.config.get('prefetch', {})
+        if self.prefetch_held or not settings.get('enabled', True): return
+        display_mode = self.mp['global']['display_mode']
+        num_slices = self.mp['global']['num_rows'] * self.mp['global']['num_cols']
+        views = []
+        for next_ica, next_icn in self.get_predicted_views(ica_lookup, icn_lookup)[:settings.get('max_views', 4)]:
+            if not self.view_cache.has(self.get_view_key('x', next_ica, next_icn)):
+                views.append(prefetch.ViewPrefetcher.view(next_ica, next_icn, display_mode, num_slices))
+        self.prefetch_predicted = views
+        self.prefetcher.request([view for view in views if not self.prefetcher.has_coords(view)])
+        for view in views:
+            if self.prefetcher.has_coords(view):
+                self.render_prefetched_view(view)
+            
+    def sweep_cut_coords(self):
+        """Find slices for all ICs, alone & w/ top-ranked templates, in background once GUI is idle.
+        Coords. are saved w/ analysis, so 'show max overlap' & first views of ICs need not search vols."""
+        
+        settings = self.config.get('prefetch', {})
+        if not (settings.get('enabled', True) and settings.get('sweep', True)): return
+        display_modes = ['ortho']
+        if self.mp['global']['display_mode'] not in display_modes:
+            display_modes.append(self.mp['global']['display_mode'])
+        num_slices = self.mp['global']['num_rows'] * self.mp['global']['num_cols']
+        views = []
+        for row in range(self.listWidget_ICAComponents.count()):
+            ica_lookup = str(self.listWidget_ICAComponents.item(row).data(Qt.UserRole))
+            for icn_lookup in [None] + self.get_top_templates(ica_lookup, k=settings.get('top_k', 3)):
+                for display_mode in display_modes:
+                    views.append(prefetch.ViewPrefetcher.view(ica_lookup, icn_lookup, display_mode, num_slices))
+        self.prefetcher.sweep(views)
+            
+    def interrupt_prefetch(self):
+        """Hold off prefetching while GUI updates current view"""
+        
+        self.prefetcher.interrupt()
+        self.offscreen_renderer.interrupt()
+        self.prefetch_predicted = []
+        
+    def queue_prefetched_view(self, view):
+        """Render view w/ cut coords. found in background offscreen, if still predicted"""
+        
+        if (view in self.prefetch_predicted) and not self.prefetch_held:
+            self.render_prefetched_view(view)
+        
+    def render_prefetched_view(self, view):
+        """Queue offscreen renders of predicted view (spatial maps & time series), drawn in background
+        once GUI is idle & cached as bitmaps (see zoo_OffscreenRenderer).
+        Only options & vols. already in memory are gathered here, in GUI thread"""
+        
+        ica_lookup, icn_lookup, display_mode, num_slices = view
+        cut_coords = self.prefetcher.get_coords(view)
+        if (display_mode != self.mp['global']['display_mode']) or (cut_coords is None): return
+        key = self.get_view_key('x', ica_lookup, icn_lookup)
+        if not self.view_cache.has(key):
+            slice_view = (prefetch.ViewPrefetcher.LAYOUTS[display_mode], cut_coords)
+            options = self.get_plot_options(ica_lookup, icn_lookup, slice_view=slice_view)
+            vols = self.prepare_vols(self.figure_x, offscreen=True, **options)
+            if vols is not None:
+                self.offscreen_renderer.submit(key, partial(self.draw_offscreen_vols, vols, self.view_cache.epoch),
+                                               self.figure_x.get_size_inches(), self.figure_x.dpi)
+        key = self.get_view_key('t', ica_lookup)
+        if not self.view_cache.has(key):
+            time_options = {'show_time_series': self.tp['items']['show_time_series'],
+                            'show_spectrum': self.tp['items']['show_spectrum'],
+                            'sampling_rate': self.tp['global']['sampling_rate']}
+            self.offscreen_renderer.submit(key, partial(self.draw_offscreen_time, ica_lookup, self.view_cache.epoch,
+                                                        **time_options),
+                                           self.figure_t.get_size_inches(), self.figure_t.dpi)
+            
+    def draw_offscreen_vols(self, vols, epoch, fig, canvas):
+        """Draw spatial maps on offscreen figure, outside GUI thread. 
+        Returns state kept w/ bitmap, or None if vols. are not available"""
+        
+        if not self.load_offscreen_vols(vols): return None
+        displays = self.draw_vols(fig, vols)
+        canvas.draw()
+        return {'epoch': epoch, 'layout': vols['displayLayout'], 'coords': np.array(vols['coords']).tolist(), 
+                'cuts': self.get_display_cuts(fig, displays)}
+        
+    def draw_offscreen_time(self, ica_lookup, epoch, fig, canvas, **kwargs):
+        """Draw time series & spectrum on offscreen figure, outside GUI thread.
+        Returns state kept w/ bitmap, or None if IC has no time series"""
+        
+        if ica_lookup not in self.gd['ica'].keys(): return None
+        self.plot_time(fig, ica_lookup=ica_lookup, **kwargs)
+        if len(fig.get_axes()) == 0: return None
+        canvas.draw()
+        return {'epoch': epoch}
+        
+    def store_prefetched_view(self, key, rgba, state):
+        """Cache bitmap rendered offscreen, unless cached views were invalidated since render was queued"""
+        self.view_cache.store_bitmap(key, rgba, **state)
+            
+    def redraw_cached_views(self):
+        """Re-plot displays shown as cached bitmaps, since bitmaps do not scale w/ resized canvas"""
+        
+        if (not self.view_shown) or self.render_scheduler.suspended: return # ...or drawn by output thread
+        ica_lookup, icn_lookup = self.get_current_networks()
+        if 'x' in self.view_shown.keys():
+            self.draw_spatial_maps(ica_lookup, icn_lookup, coords_from_sliders=True)
+        if 't' in self.view_shown.keys():
+            self.draw_time_series(ica_lookup)
             
     def get_current_networks(self):
         """Determine which ICs & ICN templates, or mappings are currently selected"""
@@ -1860,20 +2486,60 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.reset_display()
         return ica_lookup, icn_lookup
             
-    def get_plot_options(self, ica_lookup, icn_lookup, coords_from_sliders=False):
-        """Get all plot options"""
+    def get_display_key(self, options):
+        """Key for what is shown on spatial map display, other than slice coords."""
+        
+        return (options['ica_lookup'], options['icn_lookup'], options['displayLayout'], options['show_icn'],
+                tuple(options.get('overlay_icns', [])), json.dumps(self.mp, sort_keys=True, default=str))
+            
+    def get_view_key(self, figure, ica_lookup, icn_lookup=None, coords_from_sliders=False):
+        """Key for view rendered on figure ('x' spatial maps, 't' time series), see zoo_ViewCache"""
+        
+        if figure == 'x':
+            canvas = self.canvas_x
+            layout = self.mp['global']['display_mode']
+            coords = 'auto'  # ...found from overlap of IC & template
+            if coords_from_sliders and (layout == 'ortho'):
+                coords = (self.horizontalSlider_Xslice.value(), self.horizontalSlider_Yslice.value(), 
+                          self.horizontalSlider_Zslice.value())
+            text = self.get_display_text(ica_lookup, icn_lookup)
+            overlays = self.get_overlay_templates(ica_lookup, icn_lookup)
+        else: # time series, same for all templates & slices
+            canvas = self.canvas_t
+            icn_lookup, layout, coords, text, overlays = None, None, None, None, None
+        return views.ViewCache.key(figure, ica_lookup, icn_lookup, layout, coords, 
+                                   size=canvas.get_width_height(), text=text, 
+                                   options=self.get_view_options(figure), overlays=overlays)
+    
+    def get_view_options(self, figure):
+        """Hash of options used to render figure ('x' spatial maps, 't' time series)"""
         
-        displayLayout, coords = self.apply_slice_views(ica_lookup, icn_lookup, coords_from_sliders)
+        if figure == 'x':
+            return views.ViewCache.options_hash(self.mp, self.config.get('smri_file'))
+        return views.ViewCache.options_hash(self.tp)
+            
+    def get_plot_options(self, ica_lookup, icn_lookup, coords_from_sliders=False, slice_view=None):
+        """Get all plot options.
+        slice_view: (layout, coords) found beforehand, ex. for offscreen renders, w/o updating sliders"""
+        
+        if slice_view is None:
+            displayLayout, coords = self.apply_slice_views(ica_lookup, icn_lookup, coords_from_sliders)
+        else:
+            displayLayout, coords = slice_view
         options = {'ica_lookup': ica_lookup, 
                    'icn_lookup': icn_lookup, 
                    'displayLayout': displayLayout, 
                    'coords': coords}
         options.update({'show_icn': self.mp['icn']['show_icn']})
-        if icn_lookup in self.gd['icn'].keys():
-            if not isinstance(self.gd['icn'][icn_lookup]['img'], (Nifti1Image, Nifti1Pair)):
+        if (icn_lookup in self.gd['icn'].keys()) and (slice_view is not None):
+            if not self.io.has_img('icn', icn_lookup): # ...offscreen renders read vols. outside GUI thread
+                options.update({'show_icn': False})
+        elif icn_lookup in self.gd['icn'].keys():
+            if not isinstance(self.io.get_img('icn', icn_lookup), (Nifti1Image, Nifti1Pair)):
                 options.update({'show_icn': False})
         else:
             options.update({'show_icn': False})
+        options.update({'overlay_icns': self.get_overlay_templates(ica_lookup, icn_lookup)})
         options.update({'show_time_series': self.tp['items']['show_time_series']})
         options.update({'show_spectrum': self.tp['items']['show_spectrum']})
         
@@ -1886,23 +2552,6 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         if coords_from_sliders:
             x, y, z = self.get_and_set_slice_coordinates()
         else: x, y, z = (0, 0, 0)
-        if ica_lookup in self.gd['ica'].keys():
-            ica_img = self.gd['ica'][ica_lookup]['img']
-        else: ica_img = None
-        if (icn_lookup in self.gd['icn'].keys()) and self.gd['icn'][icn_lookup]['img']:
-            map_img = self.gd['icn'][icn_lookup]['img']
-        else: map_img = None
-            
-        if (map_img is not None) and (ica_img is not None):
-            map_img = image.resample_to_img(source_img=map_img, target_img=ica_img)
-            map_img = image.math_img('img > img.mean()', img=map_img)
-            masked_img = masking.apply_mask(ica_img, map_img)
-            masked_img = masking.unmask(masked_img, map_img)
-        elif ica_img is not None:
-            masked_img = ica_img
-        elif map_img is not None:
-            masked_img = map_img
-        else: masked_img = None
         
         # default options
         layout = 'ortho' #default to 3 orthogonal slices
@@ -1914,14 +2563,20 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         num_slices = num_rows * num_cols
         layout = self.mp['global']['display_mode']
         
+        # Slices at overlap of IC & template, found beforehand if prefetched. Not needed to navigate ortho. slices w/ sliders
+        if (layout == 'ortho') and coords_from_sliders:
+            cut_coords = None
+        else:
+            cut_coords = self.get_cut_coords(ica_lookup, icn_lookup, layout, num_slices)
+        
         if layout == 'ortho':
             self.pushButton_showMaxOverlap.setEnabled(True)
             self.horizontalSlider_Xslice.setEnabled(True)
             self.horizontalSlider_Yslice.setEnabled(True)
             self.horizontalSlider_Zslice.setEnabled(True)
             displayLayout = 'ortho'
-            if masked_img and not coords_from_sliders:
-                x, y, z = plotting.find_xyz_cut_coords(masked_img, activation_threshold=None)
+            if (cut_coords is not None) and not coords_from_sliders:
+                x, y, z = cut_coords
                 self.get_and_set_slice_coordinates(x, y, z)
             coords = (x, y, z)
         elif layout == 'axial':
@@ -1930,8 +2585,8 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.horizontalSlider_Yslice.setEnabled(False)
             self.horizontalSlider_Zslice.setEnabled(False)
             displayLayout = 'z'
-            if masked_img:
-                coords = plotting.find_cut_slices(masked_img, direction='z', n_cuts=num_slices)
+            if cut_coords is not None:
+                coords = cut_coords
                 self.get_and_set_slice_coordinates(x=None, y=None, z=coords)
         elif layout == 'coronal':
             self.pushButton_showMaxOverlap.setEnabled(False)
@@ -1939,8 +2594,8 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.horizontalSlider_Yslice.setEnabled(False)
             self.horizontalSlider_Zslice.setEnabled(False)
             displayLayout = 'y'
-            if masked_img:
-                coords = plotting.find_cut_slices(masked_img, direction='y', n_cuts=num_slices)
+            if cut_coords is not None:
+                coords = cut_coords
                 self.get_and_set_slice_coordinates(x=None, y=coords, z=None)
         elif layout == 'sagittal':
             self.pushButton_showMaxOverlap.setEnabled(False)
@@ -1948,12 +2603,28 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             self.horizontalSlider_Yslice.setEnabled(False)
             self.horizontalSlider_Zslice.setEnabled(False)
             displayLayout = 'x'
-            if masked_img:
-                coords = plotting.find_cut_slices(masked_img, direction='x', n_cuts=num_slices)
+            if cut_coords is not None:
+                coords = cut_coords
                 self.get_and_set_slice_coordinates(x=coords, y=None, z=None)
         return displayLayout, coords
         
 
+    def get_cut_coords(self, ica_lookup, icn_lookup, display_mode, num_slices):
+        """Slices at overlap of IC & template, kept for views already shown, prefetched or swept"""
+        
+        view = prefetch.ViewPrefetcher.view(ica_lookup, icn_lookup, display_mode, num_slices)
+        cut_coords = self.prefetcher.get_coords(view)
+        if cut_coords is None:
+            ica_img = self.io.get_img('ica', ica_lookup) # loads vol. if still pending
+            map_img = self.io.get_img('icn', icn_lookup)
+            if not isinstance(map_img, (Nifti1Image, Nifti1Pair)): map_img = None
+            cut_coords = self.prefetcher.engine.find(ica_img, map_img, display_mode, num_slices,
+                                                     ica_lookup=ica_lookup, icn_lookup=icn_lookup)
+            if cut_coords is not None:
+                self.prefetcher.set_coords(view, cut_coords)
+                cut_coords = self.prefetcher.get_coords(view)
+        return cut_coords
+
     def get_and_set_slice_coordinates(self, x=None, y=None, z=None):
         """Determine slice of vol. to plot"""
         x_update, y_update, z_update = True, True, True
@@ -2036,20 +2707,26 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
         """Click to change MNI coords on spatial map display"""
         
         if self.buttonGroup_xview.checkedButton() == self.radioButton_ortho:
-            if event.inaxes is None:
+            if (event.inaxes is not None) and (self.slice_renderer is not None):
+                # get cut shown in axes from display, axes coords ~ MNI coords
+                direction = self.slice_renderer.direction_of(event.inaxes)
+                xdata, ydata = event.xdata, event.ydata
+            elif 'x' in self.view_shown.keys():
+                # ...display is cached bitmap, get cut from axes stored w/ bitmap
+                direction, xdata, ydata = views.ViewCache.locate(self.view_shown['x'], event.x, event.y)
+            else:
                 return
-            # get axes indices based on subplot handles, axes coords ~ MNI coords
-            elif event.inaxes == self.figure_x.axes[1]: #coronal section
-                x = event.xdata
+            if direction == 'y': #coronal section
+                x = xdata
                 y = self.horizontalSlider_Yslice.value()
-                z = event.ydata
-            elif event.inaxes == self.figure_x.axes[2]: #sagittal section
+                z = ydata
+            elif direction == 'x': #sagittal section
                 x = self.horizontalSlider_Xslice.value()
-                y = event.xdata
-                z = event.ydata
-            elif event.inaxes == self.figure_x.axes[3]: #axial section
-                x = event.xdata
-                y = event.ydata
+                y = xdata
+                z = ydata
+            elif direction == 'z': #axial section
+                x = xdata
+                y = ydata
                 z = self.horizontalSlider_Zslice.value()
             else:
                 return
@@ -2071,6 +2748,38 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
                   *args, **kwargs):
         """Default spatial map plotting"""
         
+        if fig is self.figure_x:
+            self.io.memory.pin('display', [('ica', ica_lookup), ('icn', icn_lookup)] + 
+                               [('icn', lookup) for lookup in kwargs.get('overlay_icns', [])]) # vols. shown are not evicted
+        vols = self.prepare_vols(fig, ica_lookup, icn_lookup, displayLayout, coords, **kwargs)
+        if vols is None:
+            return    #nothing to plot
+        
+        # Prepare figure space & clear old plots from mem.
+        self.release_displays(fig)
+        displays = self.draw_vols(fig, vols)
+        
+        # nilearn fine print: plots accumulate in memory, not automatically cleared...
+        self.displays_opened.setdefault(fig, []).extend(displays) # ...store running list of plots in use 
+        if (fig is self.figure_x) and (vols['displayLayout'] == 'ortho') and (len(displays) == 1):
+            # ...keep prepared vols. to move slices w/o re-plotting, see 'update_plots_from_sliders'
+            display_options = {'ica_lookup': ica_lookup, 'icn_lookup': icn_lookup, 
+                               'displayLayout': vols['displayLayout'], 
+                               'show_icn': kwargs.get('show_icn', vols['show_icn']),
+                               'overlay_icns': kwargs.get('overlay_icns', [])}
+            self.slice_renderer = render.SliceRenderer(displays[0], key=self.get_display_key(display_options), 
+                                                       bg=vols['anat_slices'], 
+                                                       stat=self.slice_cache.get(vols['stat_key'], vols['stat_img']),
+                                                       threshold=vols['thresh'], outlines=vols['outlines'])
+            self.slice_renderer.animate(self.canvas_x) # ...crosshairs blitted on clicks
+            
+    def prepare_vols(self, fig, ica_lookup, icn_lookup, displayLayout='ortho', coords=(0,0,0), 
+                     offscreen=False, **kwargs):
+        """Options, vols. & underlay for spatial map display on fig, passed to 'draw_vols()'.
+        Returns None if nothing to plot.
+        offscreen: vols. read later outside GUI thread (see 'load_offscreen_vols()'), 
+                   w/o loading, resampling or preparing vols. kept by GUI"""
+        
         # Required parameters
         if 'show_colorbar' in kwargs.keys():
             show_colorbar = kwargs['show_colorbar']
@@ -2110,85 +2819,166 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             show_icn_name = self.mp['global']['show_icn_name']
         
         # Get required vols.
-        anat_img = None
-        if self.mp['anat']['file']: # temporarily load sMRI vol for display
-            anat_img = self.io.load_single_file(self.mp['anat']['file'], 
-                                                file_type='smri', temporary=True)
-        if not anat_img:
-            anat_img = self.gd['smri']['img']
+        anat_file = self.mp['anat']['file']
+        anat_img, anat_shared = None, False
+        if anat_file and not self.slice_cache.has_underlay(anat_file): # temporarily load sMRI vol for display
+            if offscreen: return None # ...loaded once shown on display
+            anat_img = self.io.load_single_file(anat_file, file_type='smri', temporary=True)
+            if not anat_img: anat_file = None
+        if not anat_file:
+            anat_file = self.config.get('smri_file', 'smri')
+            anat_img, anat_shared = self.gd['smri'].get('img'), True
         if ica_lookup:
-            stat_img = self.gd['ica'][ica_lookup]['img']
+            stat_key = ('ica', ica_lookup)
         elif icn_lookup:
-            stat_img = self.gd['icn'][icn_lookup]['img']
+            stat_key = ('icn', icn_lookup)
             show_icn = False
         else:
-            return    #nothing to plot
-        if stat_img is None:
-            return    #nothing to plot
-        
-        # Prepare vols. for display
-        if self.reference_img: # one-time reshape & downsample vols. to speed display
-            ref_img = self.reference_img
-            if ica_lookup:
-                if ref_img.shape < stat_img.shape:
-                    self.gd['ica'][ica_lookup]['img'] = image.resample_to_img(source_img=stat_img,
-                                                                              target_img=ref_img)
-                elif ref_img.shape > stat_img.shape:
-                    self.reference_img = ref_img
-            if show_icn and isinstance(self.gd['icn'][icn_lookup]['img'], 
-                                       (Nifti1Image, Nifti1Pair)):
-                templ_img = self.gd['icn'][icn_lookup]['img']
-                if ref_img.shape < templ_img.shape:
-                    self.gd['icn'][icn_lookup]['img'] = image.resample_to_img(source_img=templ_img,
-                                                                              target_img=ref_img)
-                elif ref_img.shape > templ_img.shape:
-                    self.reference_img = templ_img
+            return None    #nothing to plot
+        if offscreen:
+            stat_img, templ_img, overlay_imgs = None, None, []
         else:
-            self.reference_img = stat_img
-
-        thresh = None
-        if thresh_ica_vol and ica_vol_thresh:
-            if 1e-06 < ica_vol_thresh < 1:
-                thresh = np.nanmax(np.absolute(stat_img.get_fdata())) * ica_vol_thresh
-            else: thresh = thresh_ica_vol
-        if not thresh or not isinstance(thresh, Number):
-            thresh = 1e-06 # NOTE: thresh = None prevents plotting of anatomical background
-            
-        # Prepare figure space & clear old plots from mem.
-        fig.clear()
-        if 'd_opened' not in locals():
-            d_opened = [] # store list of open plots, in need of closing...
-        else:             # manually close all open nilearn plots, prevent accumulation in memory
-            for d in d_opened:
-                d.close()  
-                d_opened.remove(d)
+            stat_img = self.io.get_img(*stat_key)
+            if stat_img is None:
+                return None    #nothing to plot
+            templ_img = self.io.get_img('icn', icn_lookup) if show_icn else None
+            overlay_imgs = [(lookup, self.io.get_img('icn', lookup)) for lookup in kwargs.get('overlay_icns', [])]
+            overlay_imgs = [(lookup, img) for lookup, img in overlay_imgs if isinstance(img, (Nifti1Image, Nifti1Pair))]
+        
+            # Prepare vols. for display
+            if self.reference_img: # one-time reshape & downsample vols. to speed display
+                ref_img = self.reference_img
+                if ica_lookup:
+                    if ref_img.shape < stat_img.shape:
+                        self.gd['ica'][ica_lookup]['img'] = image.resample_to_img(source_img=stat_img,
+                                                                                  target_img=ref_img)
+                        self.io.track_img('ica', ica_lookup)
+                    elif ref_img.shape > stat_img.shape:
+                        self.reference_img = ref_img
+                if show_icn and isinstance(templ_img, (Nifti1Image, Nifti1Pair)):
+                    if ref_img.shape < templ_img.shape:
+                        templ_img = image.resample_to_img(source_img=templ_img, target_img=ref_img)
+                        self.gd['icn'][icn_lookup]['img'] = templ_img
+                        self.io.track_img('icn', icn_lookup)
+                    elif ref_img.shape > templ_img.shape:
+                        self.reference_img = templ_img
+            else:
+                self.reference_img = stat_img
                 
         # Arrage layout of slices
         displayLayout, coords_byRow = self.arrange_slices(displayLayout, coords,
                                                           grid=self.mp['global']['grid_layout'])
         num_rows = len(coords_byRow)        
+        mosaic = ((displayLayout != 'ortho') and isinstance(fig, Figure) and 
+                  self.mp['global'].get('mosaic_compositor', True))
         
-        # Multi-row plotting
-        for row in range(num_rows):
-            ax1 = fig.add_subplot(num_rows,1,row+1) if isinstance(fig, Figure) else fig
-
-            d = plotting.plot_stat_map(stat_map_img=stat_img, bg_img=anat_img, 
-                                       axes=ax1, cut_coords=coords_byRow[row], 
-                                       display_mode=displayLayout, 
-                                       threshold=thresh,
-                                       draw_cross=show_crosshairs, 
-                                       annotate=show_LR_annotations, 
-                                       colorbar=show_colorbar)
-            if show_icn and isinstance(self.gd['icn'][icn_lookup]['img'], 
-                                       (Nifti1Image, Nifti1Pair)):
-                d.add_contours(self.gd['icn'][icn_lookup]['img'], 
-                               filled=self.mp['icn']['filled'], 
-                               alpha=self.mp['icn']['alpha'], 
-                               levels=[self.mp['icn']['levels']], colors=self.mp['icn']['colors'])
-            ax1.set_axis_off()
-           
-            # nilearn fine print: plots accumulate in memory, not automatically cleared...
-            d_opened.append(d) # ...store running list of plots in use 
+        # Underlay at resolution of display, w/ ~1 voxel per pixel
+        pixels = None
+        if isinstance(fig, Figure):
+            width, height = fig.get_size_inches() * fig.dpi
+            num_cuts = 3 if displayLayout == 'ortho' else max(np.size(coords_byRow[0]), 1)
+            pixels = max(width / num_cuts, height / num_rows)
+        anat_img, anat_slices = self.slice_cache.get_underlay(anat_file, anat_img, pixels=pixels,
+                                                              shared=anat_shared)
+        if offscreen and mosaic and (anat_slices is not None):
+            anat_slices.stack(displayLayout) # ...shared w/ GUI, so stacked here instead of by compositor
+        
+        display_text = None
+        if show_mapping_name or show_ica_name or show_icn_name:
+            display_text = self.get_display_text(ica_lookup, icn_lookup, show_mapping_name=show_mapping_name,
+                                                 show_ica_name=show_ica_name, show_icn_name=show_icn_name)
+        return {'ica_lookup': ica_lookup, 'icn_lookup': icn_lookup, 
+                'displayLayout': displayLayout, 'coords': coords, 'coords_byRow': coords_byRow, 'mosaic': mosaic,
+                'show_colorbar': show_colorbar, 'show_LR_annotations': show_LR_annotations, 
+                'show_crosshairs': show_crosshairs, 'thresh_ica_vol': thresh_ica_vol, 
+                'ica_vol_thresh': ica_vol_thresh, 'show_icn': show_icn, 
+                'display_text': display_text, 'text_size': self.mp['global']['display_text_size'],
+                'anat_img': anat_img, 'anat_slices': anat_slices, 
+                'stat_key': stat_key, 'stat_img': stat_img, 'templ_img': templ_img, 
+                'overlay_icns': kwargs.get('overlay_icns', []), 'overlay_imgs': overlay_imgs,
+                'contour_kwargs': {'filled': self.mp['icn']['filled'], 'alpha': self.mp['icn']['alpha'],
+                                   'levels': [self.mp['icn']['levels']], 'colors': self.mp['icn']['colors']},
+                'overlay_colors': self.mp['icn'].get('overlay_colors', ['#ff7f0e', '#2ca02c', '#9467bd']),
+                'reference_img': self.reference_img if offscreen else None,
+                'slice_cache': slices.SliceCache() if offscreen else self.slice_cache} # ...private, dropped w/ render
+    
+    def load_offscreen_vols(self, vols):
+        """Read vols. for offscreen display from 'prepare_vols()', outside GUI thread.
+        Vols. are resampled as on display, w/o replacing vols. kept by GUI. Returns False if vols. are not available"""
+        
+        stat_img = self.io.peek_img(*vols['stat_key'])
+        if stat_img is None: return False
+        templ_img = self.io.peek_img('icn', vols['icn_lookup']) if vols['show_icn'] else None
+        overlay_imgs = [(lookup, self.io.peek_img('icn', lookup)) for lookup in vols['overlay_icns']]
+        ref_img = vols['reference_img']
+        if ref_img is not None:
+            if (vols['stat_key'][0] == 'ica') and (ref_img.shape < stat_img.shape):
+                stat_img = image.resample_to_img(source_img=stat_img, target_img=ref_img)
+            if isinstance(templ_img, (Nifti1Image, Nifti1Pair)) and (ref_img.shape < templ_img.shape):
+                templ_img = image.resample_to_img(source_img=templ_img, target_img=ref_img)
+        vols.update({'stat_img': stat_img, 'templ_img': templ_img, 
+                     'overlay_imgs': [(lookup, img) for lookup, img in overlay_imgs 
+                                      if isinstance(img, (Nifti1Image, Nifti1Pair))]})
+        return True
+    
+    def draw_vols(self, fig, vols):
+        """Draw spatial maps prepared by 'prepare_vols()' on fig, returns nilearn displays drawn.
+        Reads only prepared vols. & options, so offscreen figures can be drawn outside GUI thread"""
+        
+        stat_img, templ_img, show_icn = vols['stat_img'], vols['templ_img'], vols['show_icn']
+        thresh = None
+        if vols['thresh_ica_vol'] and vols['ica_vol_thresh']:
+            if 1e-06 < vols['ica_vol_thresh'] < 1:
+                thresh = vstats.StatsCache.get(stat_img).absmax * vols['ica_vol_thresh']
+            else: thresh = vols['thresh_ica_vol']
+        if not thresh or not isinstance(thresh, Number):
+            thresh = 1e-06 # NOTE: thresh = None prevents plotting of anatomical background
+        fig.clear()
+        
+        displayLayout, coords_byRow = vols['displayLayout'], vols['coords_byRow']
+        anat_img, anat_slices = vols['anat_img'], vols['anat_slices']
+        get_slices = vols['slice_cache'].get
+        contour_kwargs, overlay_colors = vols['contour_kwargs'], vols['overlay_colors']
+        overlays = [(get_slices(('icn', lookup), img), overlay_colors[i % len(overlay_colors)]) 
+                    for i, (lookup, img) in enumerate(vols['overlay_imgs'])] # ...outlined w/o filling
+        outlines = []  # template outlines as cached paths, see zoo_ContourPaths
+        if show_icn and isinstance(templ_img, (Nifti1Image, Nifti1Pair)):
+            outlines.append((get_slices(('icn', vols['icn_lookup']), templ_img).outlines(), contour_kwargs))
+        for vol, color in overlays:
+            outlines.append((vol.outlines(), dict(contour_kwargs, filled=False, colors=color)))
+        
+        displays = []
+        if vols['mosaic']:
+            # Mosaic of slices composited as single RGBA image, w/o nilearn axes per cut
+            ax1 = fig.add_subplot(111)
+            contour_opts = contour_kwargs.copy()
+            contour_opts['levels'] = contour_kwargs['levels'][0]
+            self.compositor.draw(ax1, displayLayout, coords_byRow, 
+                                 show_LR_annotations=vols['show_LR_annotations'], 
+                                 show_colorbar=vols['show_colorbar'], 
+                                 text_size=vols['text_size'],
+                                 bg=anat_slices, 
+                                 stat=get_slices(vols['stat_key'], stat_img),
+                                 contour=(get_slices(('icn', vols['icn_lookup']), templ_img) 
+                                          if show_icn and isinstance(templ_img, (Nifti1Image, Nifti1Pair)) 
+                                          else None),
+                                 threshold=thresh, contour_opts=contour_opts, overlays=overlays)
+        else: # Multi-row plotting
+            for row in range(len(coords_byRow)):
+                ax1 = fig.add_subplot(len(coords_byRow),1,row+1) if isinstance(fig, Figure) else fig
+
+                d = plotting.plot_stat_map(stat_map_img=stat_img, bg_img=anat_img, 
+                                           axes=ax1, cut_coords=coords_byRow[row], 
+                                           display_mode=displayLayout, 
+                                           threshold=thresh,
+                                           draw_cross=vols['show_crosshairs'], 
+                                           annotate=vols['show_LR_annotations'], 
+                                           colorbar=vols['show_colorbar'])
+                for cut_ax in d.axes.values(): # ...traced once per slice, instead of 'add_contours()' per plot
+                    if outlines and (cut_ax.direction in 'xyz'):
+                        contours.ContourPaths.draw(cut_ax, outlines)
+                ax1.set_axis_off()
+                displays.append(d)
             
 #         ### Single row plotting ###
 #         fig.clear()
@@ -2209,39 +2999,50 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
 #                            colors=self.mp['icn']['colors'])
 #         ax1.set_axis_off()
         
-        if show_mapping_name or show_ica_name or show_icn_name:
-            display_text = ''
-            ica_custom_name = None
-            icn_custom_name = None
-            if ica_lookup in self.gd['ica'].keys():
-                ica_custom_name = self.gd['ica'][ica_lookup]['display_name']
-            if icn_lookup in self.gd['icn'].keys():
-                icn_custom_name = self.gd['icn'][icn_lookup]['display_name']
-            if show_mapping_name:
-                if ((ica_lookup in self.gd['mapped_ica'].keys()) and
-                      (icn_lookup in self.gd['mapped_ica'][ica_lookup].keys())):
-                    map_item = self.gd['mapped_ica'][ica_lookup][icn_lookup]
-                    mapping_lookup = str(map_item.data(Qt.UserRole))
-                    display_text = self.gd['mapped'][mapping_lookup]['icn_custom_name']
-                elif icn_custom_name:
-                    display_text = icn_custom_name
-                elif ica_custom_name:
-                    display_text = ica_custom_name
-            if show_ica_name and ica_custom_name:
-                display_text += '\n   ICA component:   %s' % ica_custom_name
-            if show_icn_name and icn_custom_name:
-                display_text += '\n   ICN template:   %s' % icn_custom_name
+        if vols['display_text'] is not None:
             if isinstance(fig, Figure):
                 x_pos, y_pos = (0.07, 0.99)
             else:
                 _, y_pos = fig.get_ylim()
                 y_pos = y_pos - 0.01
                 x_pos, _ = fig.get_xlim()
-            fig.text(x_pos,y_pos, display_text, 
-                     color='white', size=self.mp['global']['display_text_size'],
+            fig.text(x_pos,y_pos, vols['display_text'], 
+                     color='white', size=vols['text_size'],
                      horizontalalignment='left', verticalalignment='top')
         if isinstance(fig, Figure):
             fig.tight_layout(pad=0)
+        vols.update({'thresh': thresh, 'outlines': outlines}) # ...kept by slice renderer
+        return displays
+            
+    def get_display_text(self, ica_lookup, icn_lookup, show_mapping_name=None, 
+                         show_ica_name=None, show_icn_name=None):
+        """Names of mapping, IC & template printed on spatial map display"""
+        
+        if show_mapping_name is None: show_mapping_name = self.mp['global']['show_mapping_name']
+        if show_ica_name is None: show_ica_name = self.mp['global']['show_ica_name']
+        if show_icn_name is None: show_icn_name = self.mp['global']['show_icn_name']
+        display_text = ''
+        ica_custom_name = None
+        icn_custom_name = None
+        if ica_lookup in self.gd['ica'].keys():
+            ica_custom_name = self.gd['ica'][ica_lookup]['display_name']
+        if icn_lookup in self.gd['icn'].keys():
+            icn_custom_name = self.gd['icn'][icn_lookup]['display_name']
+        if show_mapping_name:
+            if ((ica_lookup in self.gd['mapped_ica'].keys()) and
+                  (icn_lookup in self.gd['mapped_ica'][ica_lookup].keys())):
+                map_item = self.gd['mapped_ica'][ica_lookup][icn_lookup]
+                mapping_lookup = str(map_item.data(Qt.UserRole))
+                display_text = self.gd['mapped'][mapping_lookup]['icn_custom_name']
+            elif icn_custom_name:
+                display_text = icn_custom_name
+            elif ica_custom_name:
+                display_text = ica_custom_name
+        if show_ica_name and ica_custom_name:
+            display_text += '\n   ICA component:   %s' % ica_custom_name
+        if show_icn_name and icn_custom_name:
+            display_text += '\n   ICN template:   %s' % icn_custom_name
+        return display_text
             
     def plot_time(self, fig=None, ica_lookup=None, coords=(0,0,0), *args, **kwargs):
         """Default time series plotting"""
@@ -2305,9 +3106,13 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
             axts.set_ylabel('fMRI signal')
             axts.set_facecolor('White')
         if show_spectrum:
-            n = len(self.gd['ica'][ica_lookup]['timeseries'])
-            ps = np.fft.rfft(self.gd['ica'][ica_lookup]['timeseries'], norm='ortho')
-            freq_range = np.fft.rfftfreq(n, Fs)
+            ts_filepath = self.gd['ica'][ica_lookup]['ts_filepath']
+            if ts_filepath in self.gd['ica_ts'].keys(): # spectra computed once for all ICs in file
+                freq_range, ps = self.gd['ica_ts'][ts_filepath].spectrum(self.gd['ica'][ica_lookup]['vol_ind'], Fs)
+            else:
+                n = len(self.gd['ica'][ica_lookup]['timeseries'])
+                ps = np.fft.rfft(self.gd['ica'][ica_lookup]['timeseries'], norm='ortho')
+                freq_range = np.fft.rfftfreq(n, Fs)
             axps.plot(freq_range, abs(ps))
             axps.fill_between(freq_range, [0]*len(freq_range), abs(ps))
             axps.spines['right'].set_visible(False)
@@ -2323,6 +3128,17 @@ class NetworkZooGUI(QtWidgets.QMainWindow, zoo_MainWin.Ui_MainWindow):
     
 def main(argv):
     config_file = None
+    memory_report = None # JSON file w/ memory usage, written when GUI is closed
+    try:
+        opts, args = getopt.getopt(argv, "m:", ["memory_report="])
+    except getopt.GetoptError:
+        print('networkZoo.py -m <memory_report.json>')
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ("-m", "--memory_report"):
+            memory_report = arg
+    if memory_report:
+        tracemalloc.start()
 #    try:
 #        opts, args = getopt.getopt(argv, "hi:", ["config_file="])
 #    except getopt.GetoptError:
@@ -2337,8 +3153,11 @@ def main(argv):
 
     app = QtWidgets.QApplication(sys.argv)
     form = NetworkZooGUI(configuration_file=config_file)
+    form.memory_report_file = memory_report
     form.show()  # Show the form
     app.exec()  # and execute the app
+    if form.memory_report_file: # ...if window was closed w/o 'quit_gui()'
+        form.save_memory_report(form.memory_report_file)
 
 
 if __name__ == '__main__': 